@@ -5,15 +5,48 @@ from sklearn.svm import SVC
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import groupby
+import os
+import copy
+import atexit
+import click
+import joblib
 import pytz
 import logging
+import threading
 
-from app import db
-from models import OrderHistory, User
+from sqlalchemy import func, select
+
+from app import app, db
+from models import AI_PREDICTION_MIN_ORDERS, OrderCounter, OrderHistory, User
+from order_import import DELIVERY_SPEEDS, WINDOW_TIMES
+from order_patterns import (
+    PATTERN_COLUMNS, backfill_order_patterns, customer_patterns, pattern_rows, record_history, vendor_usage
+)
 
 # Indian Standard Time
 IST = pytz.timezone('Asia/Kolkata')
 
+# Trained customer models each process keeps in memory
+AI_MODEL_CACHE_SIZE = int(os.environ.get('AI_MODEL_CACHE_SIZE', 256))
+
+# Which predictor backs AI predictions: 'svc' (RBF SVMs) or 'counts' (smoothed frequency tables)
+AI_PREDICTOR = os.environ.get('AI_PREDICTOR', 'svc')
+# Dirichlet prior added to every count of the 'counts' predictor
+AI_COUNT_SMOOTHING = float(os.environ.get('AI_COUNT_SMOOTHING', 1.0))
+
+# Where trained models are persisted, shared by every web worker
+AI_MODEL_DIR = os.environ.get('AI_MODEL_DIR', 'ai_models')
+# Processes used by the batch training job (0 uses one per CPU)
+AI_TRAINING_WORKERS = int(os.environ.get('AI_TRAINING_WORKERS', 0))
+# Processes each web worker uses to retrain models whose history changed
+AI_MODEL_TRAINERS = int(os.environ.get('AI_MODEL_TRAINERS', 1))
+
+# Most training rows the SVC backend expands one order pattern into
+SVC_PATTERN_ROWS = 5
+
 class OrderPredictor:
     def __init__(self):
         self.window_time_encoder = LabelEncoder()
@@ -26,26 +59,16 @@ class OrderPredictor:
     
     def prepare_features(self, customer_id):
         """Prepare features for prediction"""
+        records, _ = customer_patterns(customer_id)
+        return self.encode(records)
+    
+    def encode(self, records):
+        """Fit the encoders on order patterns and return the training arrays"""
         try:
-            # Get customer's order history
-            history = OrderHistory.query.filter_by(customer_id=customer_id, was_successful=True).all()
-            
-            if len(history) < 5:
+            if not records:
                 return None
             
-            # Convert to DataFrame
-            data = []
-            for record in history:
-                data.append({
-                    'customer_id': record.customer_id,
-                    'vendor_id': record.vendor_id,
-                    'window_time': record.window_time,
-                    'delivery_speed': record.delivery_speed,
-                    'order_day': record.order_day,
-                    'order_hour': record.order_hour
-                })
-            
-            df = pd.DataFrame(data)
+            df = pd.DataFrame(records, columns=PATTERN_COLUMNS)
             
             # Get current time features
             now = datetime.now(IST)
@@ -75,34 +98,51 @@ class OrderPredictor:
     
     def train_models(self, customer_id):
         """Train SVM models for window time and delivery speed prediction"""
+        return self.fit(*customer_patterns(customer_id))
+    
+    def fit(self, records, counts=None):
+        """Train the models on order patterns, each weighted by its count (default 1)"""
         try:
-            data = self.prepare_features(customer_id)
+            weights = np.ones(len(records)) if counts is None else np.asarray(counts, dtype=float)
+            if weights.sum() < 5:
+                return False
+            
+            data = self.encode(records)
             if data is None:
                 return False
             
             X, y_window, y_speed, _, _ = data
             
-            if len(X) < 5:
+            # probability=True cross-validates inside libsvm, which needs rows rather
+            # than weight: spread each pattern over up to SVC_PATTERN_ROWS rows that
+            # share its weight, so a few heavy patterns still give enough rows per class
+            repeats = np.clip(weights, 1, SVC_PATTERN_ROWS).astype(int)
+            X = np.repeat(X, repeats, axis=0)
+            y_window = np.repeat(y_window, repeats)
+            y_speed = np.repeat(y_speed, repeats)
+            weights = np.repeat(weights / repeats, repeats)
+            
+            # Each model needs at least two classes to choose between
+            if len(np.unique(y_window)) < 2 or len(np.unique(y_speed)) < 2:
                 return False
             
             # Train SVM models
             self.model_window = SVC(kernel='rbf', probability=True, random_state=42)
             self.model_speed = SVC(kernel='rbf', probability=True, random_state=42)
             
-            # If we have enough data, split for validation
-            if len(X) > 10:
-                X_train, X_test, y_window_train, y_window_test = train_test_split(
-                    X, y_window, test_size=0.2, random_state=42
+            # If we have enough orders, split for validation
+            X_train, y_window_train, y_speed_train, w_train = X, y_window, y_speed, weights
+            if weights.sum() > 10:
+                X_split, _, y_window_split, _, y_speed_split, _, w_split, _ = (
+                    train_test_split(X, y_window, y_speed, weights, test_size=0.2, random_state=42)
                 )
-                _, _, y_speed_train, y_speed_test = train_test_split(
-                    X, y_speed, test_size=0.2, random_state=42
-                )
-                
-                self.model_window.fit(X_train, y_window_train)
-                self.model_speed.fit(X_train, y_speed_train)
-            else:
-                self.model_window.fit(X, y_window)
-                self.model_speed.fit(X, y_speed)
+                # Keep the split only if it left every class in the training rows
+                if (len(np.unique(y_window_split)) == len(np.unique(y_window))
+                        and len(np.unique(y_speed_split)) == len(np.unique(y_speed))):
+                    X_train, y_window_train, y_speed_train, w_train = X_split, y_window_split, y_speed_split, w_split
+            
+            self.model_window.fit(X_train, y_window_train, sample_weight=w_train)
+            self.model_speed.fit(X_train, y_speed_train, sample_weight=w_train)
             
             self.is_trained = True
             return True
@@ -120,76 +160,507 @@ class OrderPredictor:
             
             # Get current time features
             now = datetime.now(IST)
-            current_day = now.strftime('%A').lower()
-            current_hour = now.hour
-            
-            # Encode current features
-            try:
-                day_encoded = self.day_encoder.transform([current_day])[0]
-            except ValueError:
-                # If day not seen before, use most common day
-                day_encoded = 0
-            
-            try:
-                vendor_encoded = self.vendor_encoder.transform([str(vendor_id)])[0]
-            except ValueError:
-                # If vendor not seen before, use most common vendor
-                vendor_encoded = 0
-            
-            # Prepare feature vector
-            features = np.array([[vendor_encoded, day_encoded, current_hour]])
-            
-            # Make predictions
-            window_pred = self.model_window.predict(features)[0]
-            speed_pred = self.model_speed.predict(features)[0]
-            
-            # Get prediction probabilities
-            window_proba = self.model_window.predict_proba(features)[0]
-            speed_proba = self.model_speed.predict_proba(features)[0]
+            return self.predict_for(vendor_id, now.strftime('%A').lower(), now.hour)
             
-            # Decode predictions
-            window_time = self.window_time_encoder.inverse_transform([window_pred])[0]
-            delivery_speed = self.delivery_speed_encoder.inverse_transform([speed_pred])[0]
-            
-            # Get confidence scores
-            window_confidence = float(np.max(window_proba))
-            speed_confidence = float(np.max(speed_proba))
+        except Exception as e:
+            logging.error(f"Error making predictions: {str(e)}")
+            return None
+    
+    def predict_for(self, vendor_id, order_day, order_hour):
+        """Predict window time and delivery speed for an order placed at the given day and hour"""
+        predictions = self.predict_many([vendor_id], order_day, order_hour)
+        return {key: values[0] for key, values in predictions.items()}
+    
+    def predict_many(self, vendor_ids, order_day, order_hour):
+        """Predict for several vendors at once with one predict_proba call per model.
+
+        Returns a dict of lists parallel to ``vendor_ids``, with the same keys
+        as predict_for.
+        """
+        # Encode current features
+        try:
+            day_encoded = self.day_encoder.transform([order_day])[0]
+        except ValueError:
+            # If day not seen before, use most common day
+            day_encoded = 0
+        
+        # Vendors not seen before use the first vendor's code, as day does above
+        known = self.vendor_encoder.classes_
+        keys = np.array([str(vendor_id) for vendor_id in vendor_ids])
+        positions = np.minimum(np.searchsorted(known, keys), len(known) - 1)
+        vendor_encoded = np.where(known[positions] == keys, positions, 0)
+        
+        # Prepare feature matrix, one row per vendor
+        features = np.column_stack([
+            vendor_encoded,
+            np.full(len(vendor_ids), day_encoded),
+            np.full(len(vendor_ids), order_hour)
+        ])
+        
+        # Predict from the class probabilities alone, so the pick matches its confidence
+        window_proba = self.model_window.predict_proba(features)
+        speed_proba = self.model_speed.predict_proba(features)
+        window_pred = self.model_window.classes_[np.argmax(window_proba, axis=1)]
+        speed_pred = self.model_speed.classes_[np.argmax(speed_proba, axis=1)]
+        
+        return {
+            'window_time': self.window_time_encoder.inverse_transform(window_pred).tolist(),
+            'delivery_speed': self.delivery_speed_encoder.inverse_transform(speed_pred).tolist(),
+            'window_confidence': window_proba.max(axis=1).tolist(),
+            'speed_confidence': speed_proba.max(axis=1).tolist()
+        }
+
+class CountPredictor:
+    """Naive Bayes over smoothed per-customer frequency tables.
+
+    For each target (delivery window and speed) it counts how often the
+    customer chose each class, and how often each class went with a vendor,
+    an order day and an order hour. Every count gets a Dirichlet prior of
+    ``alpha``, so rarely chosen classes keep some probability and
+    confidences stay sensible on short histories. Recording an order is
+    O(1) and a prediction reads a few dozen counters.
+    """
+
+    TARGETS = {'window_time': WINDOW_TIMES, 'delivery_speed': DELIVERY_SPEEDS}
+    DAYS = 7
+    HOURS = 24
+
+    def __init__(self, alpha=AI_COUNT_SMOOTHING):
+        self.alpha = alpha
+        self.orders = 0
+        self.vendors = set()
+        self.class_counts = {target: dict.fromkeys(classes, 0) for target, classes in self.TARGETS.items()}
+        self.feature_counts = {target: {} for target in self.TARGETS}  # (feature, value) -> {class: count}
+        self.is_trained = False
+
+    def observe(self, vendor_id, window_time, delivery_speed, order_day, order_hour, count=1):
+        """Add ``count`` successful orders with the same pattern to the tables"""
+        self.orders += count
+        self.vendors.add(vendor_id)
+        features = (('vendor', vendor_id), ('day', order_day), ('hour', order_hour))
+        for target, label in (('window_time', window_time), ('delivery_speed', delivery_speed)):
+            counts = self.class_counts[target]
+            counts[label] = counts.get(label, 0) + count
+            table = self.feature_counts[target]
+            for feature in features:
+                row = table.setdefault(feature, {})
+                row[label] = row.get(label, 0) + count
+        self.is_trained = self.orders >= AI_PREDICTION_MIN_ORDERS
+
+    def fit(self, records, counts=None):
+        """Rebuild the tables from order patterns, each with its count (default 1)"""
+        self.__init__(self.alpha)
+        for i, record in enumerate(records):
+            self.observe(*record, count=1 if counts is None else counts[i])
+        return self.is_trained
+
+    def train_models(self, customer_id):
+        return self.fit(*customer_patterns(customer_id))
+
+    def distribution(self, target, vendor_id, order_day, order_hour):
+        """Posterior ``{class: probability}`` of a target for an order's features"""
+        alpha = self.alpha
+        counts = self.class_counts[target]
+        table = self.feature_counts[target]
+        features = (
+            ('vendor', vendor_id, len(self.vendors) + 1),  # one slot for vendors not seen yet
+            ('day', order_day, self.DAYS),
+            ('hour', order_hour, self.HOURS)
+        )
+        scores = {}
+        for label, count in counts.items():
+            score = (count + alpha) / (self.orders + alpha * len(counts))
+            for feature, value, cardinality in features:
+                seen = table.get((feature, value))
+                score *= ((seen.get(label, 0) if seen else 0) + alpha) / (count + alpha * cardinality)
+            scores[label] = score
+        total = sum(scores.values())
+        return {label: score / total for label, score in scores.items()}
+
+    def distributions(self, target, vendor_ids, order_day, order_hour):
+        """``(classes, probabilities)`` of a target for several vendors, one row per vendor"""
+        alpha = self.alpha
+        counts = self.class_counts[target]
+        table = self.feature_counts[target]
+        labels = list(counts)
+        totals = np.array([counts[label] for label in labels], dtype=float)
+        
+        # Prior and day and hour likelihoods are the same for every vendor
+        shared = (totals + alpha) / (self.orders + alpha * len(labels))
+        for feature, value, cardinality in (('day', order_day, self.DAYS), ('hour', order_hour, self.HOURS)):
+            seen = table.get((feature, value)) or {}
+            shared *= (np.array([seen.get(label, 0) for label in labels]) + alpha) / (totals + alpha * cardinality)
+        
+        empty = {}
+        vendor_counts = np.array([
+            [(table.get(('vendor', vendor_id)) or empty).get(label, 0) for label in labels]
+            for vendor_id in vendor_ids
+        ], dtype=float).reshape(len(vendor_ids), len(labels))
+        scores = shared * (vendor_counts + alpha) / (totals + alpha * (len(self.vendors) + 1))
+        return labels, scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, customer_id, vendor_id):
+        """Make predictions for window time and delivery speed"""
+        try:
+            if not self.is_trained:
+                if not self.train_models(customer_id):
+                    return None
             
-            return {
-                'window_time': window_time,
-                'delivery_speed': delivery_speed,
-                'window_confidence': window_confidence,
-                'speed_confidence': speed_confidence
-            }
+            now = datetime.now(IST)
+            return self.predict_for(vendor_id, now.strftime('%A').lower(), now.hour)
             
         except Exception as e:
             logging.error(f"Error making predictions: {str(e)}")
             return None
 
-# Global predictor instance
-predictor = OrderPredictor()
+    def predict_for(self, vendor_id, order_day, order_hour):
+        """Predict window time and delivery speed for an order placed at the given day and hour"""
+        window_proba = self.distribution('window_time', vendor_id, order_day, order_hour)
+        speed_proba = self.distribution('delivery_speed', vendor_id, order_day, order_hour)
+        window_time = max(window_proba, key=window_proba.get)
+        delivery_speed = max(speed_proba, key=speed_proba.get)
+        return {
+            'window_time': window_time,
+            'delivery_speed': delivery_speed,
+            'window_confidence': window_proba[window_time],
+            'speed_confidence': speed_proba[delivery_speed]
+        }
+
+    def predict_many(self, vendor_ids, order_day, order_hour):
+        """Predict for several vendors at once; a dict of lists with the keys of predict_for"""
+        predictions = {}
+        for target, prefix in (('window_time', 'window'), ('delivery_speed', 'speed')):
+            labels, proba = self.distributions(target, vendor_ids, order_day, order_hour)
+            picks = np.argmax(proba, axis=1)
+            predictions[target] = [labels[pick] for pick in picks]
+            predictions[f'{prefix}_confidence'] = proba.max(axis=1).tolist()
+        return predictions
+
+# Predictor backends selectable with AI_PREDICTOR
+PREDICTORS = {'svc': OrderPredictor, 'counts': CountPredictor}
+
+def new_predictor():
+    return PREDICTORS[AI_PREDICTOR]()
+
+def history_version(customer_id):
+    """Id of the customer's latest successful order history row, or 0 if there is none"""
+    return db.session.scalar(
+        select(func.max(OrderHistory.id))
+        .where(OrderHistory.customer_id == customer_id, OrderHistory.was_successful.is_(True))
+    ) or 0
+
+def model_path(customer_id):
+    return os.path.join(AI_MODEL_DIR, f'customer_{customer_id}.joblib')
+
+def save_model(customer_id, version, model):
+    """Persist a customer's model (None if they lack history) with its history version"""
+    os.makedirs(AI_MODEL_DIR, exist_ok=True)
+    path = model_path(customer_id)
+    # Write then rename, so a worker never loads a half-written file
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump({'backend': AI_PREDICTOR, 'version': version, 'model': model}, temp_path)
+    os.replace(temp_path, path)
+
+def load_model(customer_id):
+    """The persisted ``(version, model)`` for a customer, or None.
+
+    The model's arrays are memory-mapped copy-on-write (libsvm rejects
+    read-only buffers but never writes to them), so the page cache holds one
+    copy shared by every worker process.
+    """
+    try:
+        saved = joblib.load(model_path(customer_id), mmap_mode='c')
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.error(f"Error loading AI model for customer {customer_id}: {str(e)}")
+        return None
+    if saved.get('backend', 'svc') != AI_PREDICTOR:
+        return None
+    return saved['version'], saved['model']
+
+class ModelCache:
+    """Bounded LRU of trained predictors, one per customer.
+
+    Each entry is tagged with the history version it was trained on. A
+    lookup that finds no model, or one trained on older history, first
+    tries the model persisted by the batch job or another worker; failing
+    that it schedules training in a process pool and meanwhile returns
+    the older model or None, so a request never trains inline. Customers
+    with too little history are cached as None until their history changes,
+    and a missing model file is only looked for once per history version.
+    """
+
+    def __init__(self, size=AI_MODEL_CACHE_SIZE, workers=AI_MODEL_TRAINERS):
+        self.size = size
+        self.workers = max(1, workers)
+        self._executor = None
+        self._models = OrderedDict()  # customer_id -> (history version, OrderPredictor or None)
+        self._missing = OrderedDict()  # customer_id -> history version with no model file
+        self._training = set()
+        self._lock = threading.Lock()
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'trained': 0,
+            'evicted': 0,
+        }
+
+    def __len__(self):
+        return len(self._models)
+
+    def get(self, customer_id, version):
+        """The customer's model, scheduling a retrain if it is missing or older than ``version``"""
+        with self._lock:
+            entry = self._models.get(customer_id)
+            if entry is not None:
+                self._models.move_to_end(customer_id)
+            training = customer_id in self._training
+            missing = self._missing.get(customer_id) == version
+        if (entry is None or entry[0] < version) and not training and not missing:
+            saved = load_model(customer_id)
+            if saved is None:
+                self._not_saved(customer_id, version)
+            elif entry is None or saved[0] > entry[0]:
+                self.put(customer_id, *saved)
+                entry = saved
+        if entry is not None and entry[0] >= version:
+            self.metrics['hits'] += 1
+            return entry[1]
+        self.metrics['stale' if entry is not None else 'misses'] += 1
+        self.schedule(customer_id)
+        return entry[1] if entry is not None else None
+
+    def _not_saved(self, customer_id, version):
+        with self._lock:
+            self._missing[customer_id] = version
+            self._missing.move_to_end(customer_id)
+            while len(self._missing) > self.size:
+                self._missing.popitem(last=False)
+
+    def put(self, customer_id, version, model):
+        with self._lock:
+            current = self._models.get(customer_id)
+            if current is not None and current[0] > version:
+                return
+            self._models[customer_id] = (version, model)
+            self._models.move_to_end(customer_id)
+            while len(self._models) > self.size:
+                self._models.popitem(last=False)
+                self.metrics['evicted'] += 1
+
+    def record(self, customer_id, previous_version, history):
+        """Account for a new successful history row of a customer.
+
+        A cached model that learns incrementally and was current up to
+        ``previous_version`` absorbs the row in place and is persisted by
+        the training pool; anything else is retrained in the background.
+        """
+        with self._lock:
+            entry = self._models.get(customer_id)
+        if entry is None or entry[0] != previous_version or not hasattr(entry[1], 'observe'):
+            self.schedule(customer_id)
+            return
+        model = entry[1]
+        model.observe(*(getattr(history, column) for column in PATTERN_COLUMNS))
+        self.put(customer_id, history.id, model)
+        try:
+            # A snapshot, since later rows update the cached model in place
+            future = self._get_executor().submit(save_model, customer_id, history.id, copy.deepcopy(model))
+        except Exception as e:
+            logging.error(f"Error scheduling AI model save for customer {customer_id}: {str(e)}")
+            return
+        future.add_done_callback(lambda future: self._saved(customer_id, future))
+
+    def _saved(self, customer_id, future):
+        try:
+            future.result()
+        except Exception as e:
+            logging.error(f"Error saving AI model for customer {customer_id}: {str(e)}")
+
+    def invalidate(self, customer_id):
+        with self._lock:
+            self._models.pop(customer_id, None)
+            self._missing.pop(customer_id, None)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    logging.info(f"AI training pool started with {self.workers} workers")
+        return self._executor
+
+    def schedule(self, customer_id):
+        """Train the customer's model in the training pool, unless it is already being trained.
+
+        The web worker only reads the customer's patterns; the pool process
+        fits and saves the model, and the next lookup loads it from disk.
+        """
+        with self._lock:
+            if customer_id in self._training:
+                return
+            self._training.add(customer_id)
+        try:
+            # Read the version first: history added meanwhile only causes one more retrain
+            version = history_version(customer_id)
+            # No backfill during a page render: history that predates the pattern
+            # table is picked up by train_all_models or `flask rebuild-order-patterns`
+            records, counts = customer_patterns(customer_id)
+            future = self._get_executor().submit(train_and_save, customer_id, version, records, counts)
+        except Exception as e:
+            with self._lock:
+                self._training.discard(customer_id)
+            logging.error(f"Error scheduling AI model training for customer {customer_id}: {str(e)}")
+            return
+        future.add_done_callback(lambda future: self._trained(customer_id, future))
+
+    def _trained(self, customer_id, future):
+        with self._lock:
+            self._training.discard(customer_id)
+            self._missing.pop(customer_id, None)
+        try:
+            future.result()
+            self.metrics['trained'] += 1
+        except Exception as e:
+            logging.error(f"Error training AI model for customer {customer_id}: {str(e)}")
+
+    def shutdown(self):
+        """Stop the training processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# Global model cache
+model_cache = ModelCache()
+atexit.register(model_cache.shutdown)
+
+def train_and_save(customer_id, version, records, counts):
+    """Train one customer's model from order patterns and persist it (runs in a pool process)"""
+    model = new_predictor()
+    trained = model.fit(records, counts)
+    save_model(customer_id, version, model if trained else None)
+    return trained
+
+def train_all_models(workers=AI_TRAINING_WORKERS, force=False, chunk_size=500):
+    """Train and persist models for every customer eligible for AI predictions.
+
+    Customers whose persisted model already covers their latest history are
+    skipped unless ``force`` is set. Order patterns are read here, in one
+    query per chunk of customers, and the training itself runs in a process
+    pool.
+    """
+    eligible = select(OrderCounter.user_id).where(
+        OrderCounter.role == 'customer', OrderCounter.delivered >= AI_PREDICTION_MIN_ORDERS
+    )
+    versions = dict(db.session.execute(
+        select(OrderHistory.customer_id, func.max(OrderHistory.id))
+        .where(OrderHistory.customer_id.in_(eligible), OrderHistory.was_successful.is_(True))
+        .group_by(OrderHistory.customer_id)
+    ).all())
+    
+    stats = {'customers': len(versions), 'trained': 0, 'insufficient': 0, 'skipped': 0, 'failed': 0}
+    if not force:
+        for customer_id in list(versions):
+            saved = load_model(customer_id)
+            if saved is not None and saved[0] >= versions[customer_id]:
+                del versions[customer_id]
+                stats['skipped'] += 1
+    if not versions:
+        return stats
+    
+    customer_ids = sorted(versions)
+    batches = []
+    for i in range(0, len(customer_ids), chunk_size):
+        chunk = customer_ids[i:i + chunk_size]
+        # History recorded before the pattern table existed is folded in first
+        backfill_order_patterns(chunk)
+        for customer_id, group in groupby(pattern_rows(chunk), key=lambda row: row[0]):
+            group = list(group)
+            batches.append((customer_id, [tuple(row[1:-1]) for row in group], [row[-1] for row in group]))
+    # Pool processes must not inherit the parent's open database connections
+    db.session.remove()
+    db.engine.dispose()
+    
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        futures = {
+            pool.submit(train_and_save, customer_id, versions[customer_id], records, counts): customer_id
+            for customer_id, records, counts in batches
+        }
+        for future in as_completed(futures):
+            try:
+                stats['trained' if future.result() else 'insufficient'] += 1
+            except Exception as e:
+                stats['failed'] += 1
+                logging.error(f"Error training AI model for customer {futures[future]}: {str(e)}")
+    
+    logging.info(f"Trained AI models for {stats['trained']} of {stats['customers']} customers")
+    return stats
+
+@app.cli.command('train-ai-models')
+@click.option('--workers', type=int, default=AI_TRAINING_WORKERS, help='training processes (0 uses one per CPU)')
+@click.option('--force', is_flag=True, help='retrain models that are already up to date')
+def train_ai_models_command(workers, force):
+    """Train and persist AI prediction models for every eligible customer"""
+    stats = train_all_models(workers, force)
+    print(f"Trained {stats['trained']} models ({stats['skipped']} up to date, "
+          f"{stats['insufficient']} without enough history, {stats['failed']} failed)")
+
+def rank_vendors(customer_id, vendor_ids=None):
+    """Rank vendors for a customer's next order, with the predicted window and speed for each.
+
+    Scores every vendor the customer has ordered from, or ``vendor_ids``
+    (e.g. the whole active vendor set), with one batched prediction. Vendors
+    the customer orders from most come first, then the most confident
+    predictions. Returns None if no model is ready for the customer.
+    """
+    usage = vendor_usage(customer_id)
+    if vendor_ids is None:
+        vendor_ids = list(usage)
+    if not vendor_ids:
+        return None
+    
+    model = model_cache.get(customer_id, history_version(customer_id))
+    if model is None:
+        return None
+    
+    now = datetime.now(IST)
+    predictions = model.predict_many(vendor_ids, now.strftime('%A').lower(), now.hour)
+    
+    ranking = []
+    for i, vendor_id in enumerate(vendor_ids):
+        window_confidence = float(predictions['window_confidence'][i])
+        speed_confidence = float(predictions['speed_confidence'][i])
+        ranking.append({
+            'vendor_id': vendor_id,
+            'window_time': str(predictions['window_time'][i]),
+            'delivery_speed': str(predictions['delivery_speed'][i]),
+            'window_confidence': window_confidence,
+            'speed_confidence': speed_confidence,
+            'confidence': window_confidence * speed_confidence,
+            'orders': usage.get(vendor_id, 0)
+        })
+    ranking.sort(key=lambda entry: (-entry['orders'], -entry['confidence']))
+    return ranking
 
 def get_ai_predictions(customer_id, vendor_id=None):
-    """Get AI predictions for a customer"""
+    """Get AI predictions for a customer.
+
+    Predicts for ``vendor_id``, or else for the customer's top ranked vendor;
+    the full vendor ranking is included under ``ranking``.
+    """
     try:
         user = User.query.get(customer_id)
         if not user or not user.can_use_ai_predictions():
             return None
         
-        # If no vendor specified, use the most common vendor from history
-        if vendor_id is None:
-            history = OrderHistory.query.filter_by(customer_id=customer_id).all()
-            if not history:
-                return None
-            
-            # Get most frequent vendor
-            vendor_counts = {}
-            for record in history:
-                vendor_counts[record.vendor_id] = vendor_counts.get(record.vendor_id, 0) + 1
-            
-            vendor_id = max(vendor_counts, key=vendor_counts.get)
+        ranking = rank_vendors(customer_id, None if vendor_id is None else [vendor_id])
+        if not ranking:
+            return None
         
-        predictions = predictor.predict(customer_id, vendor_id)
+        predictions = dict(ranking[0], ranking=ranking)
         
         if predictions:
             # Add user-friendly descriptions
@@ -226,6 +697,7 @@ def update_order_history(order):
     """Update order history for AI training"""
     try:
         now = datetime.now(IST)
+        previous_version = history_version(order.customer_id)
         
         # Create order history record
         history = OrderHistory(
@@ -238,18 +710,14 @@ def update_order_history(order):
             was_successful=(order.status == 'delivered')
         )
         
+        # Successful order counts live in order_counters, updated with the transition itself
         db.session.add(history)
-        
-        # Update customer's successful order count if delivered
-        if order.status == 'delivered':
-            customer = User.query.get(order.customer_id)
-            customer.successful_orders += 1
-        
+        record_history(history)
         db.session.commit()
         
-        # Reset predictor to retrain with new data
-        global predictor
-        predictor.is_trained = False
+        # Update or retrain this customer's model only; other customers keep theirs
+        if history.was_successful:
+            model_cache.record(order.customer_id, previous_version, history)
         
         logging.info(f"Updated order history for order {order.id}")
         
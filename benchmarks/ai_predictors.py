@@ -0,0 +1,160 @@
+"""AI predictor comparison: accuracy, calibration and speed of each backend.
+
+Generates seeded order histories for a set of customers, each with a few
+favourite vendors and habits (a usual delivery window for the time of day
+and a usual speed per vendor, broken by some noise). Every backend in
+ai_predictions.PREDICTORS is trained on the first part of each customer's
+history and asked to predict the rest in order. Reports how often the
+predicted window and speed were right, how far the mean confidence is from
+that accuracy, and the fit and predict times.
+
+Usage (from the repository root):
+
+    python -m benchmarks.ai_predictors --output predictors.json
+    python -m benchmarks.ai_predictors --baseline predictors.json
+"""
+import argparse
+import json
+import platform
+import random
+import time
+
+from ai_predictions import PREDICTORS
+from order_import import DELIVERY_SPEEDS, WINDOW_TIMES
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+def usual_window(hour):
+    if 9 <= hour < 12:
+        return '9am-12pm'
+    if 12 <= hour < 16:
+        return '12pm-4pm'
+    if 16 <= hour < 21:
+        return '4pm-9pm'
+    return '9pm-9am'
+
+def build_histories(customers, orders_per_customer, noise, seed):
+    """Return ``{customer_id: [history row]}`` in order, rows as in PATTERN_COLUMNS"""
+    rng = random.Random(seed)
+    histories = {}
+    for customer_id in range(customers):
+        vendors = rng.sample(range(1000), rng.randint(1, 4))
+        speeds = {vendor_id: rng.choice(DELIVERY_SPEEDS) for vendor_id in vendors}
+        # Customers order at a few habitual hours
+        hours = rng.sample(range(24), rng.randint(2, 5))
+        rows = []
+        for _ in range(orders_per_customer):
+            vendor_id = rng.choice(vendors)
+            hour = rng.choice(hours)
+            window_time = usual_window(hour) if rng.random() > noise else rng.choice(WINDOW_TIMES)
+            delivery_speed = speeds[vendor_id] if rng.random() > noise else rng.choice(DELIVERY_SPEEDS)
+            rows.append((vendor_id, window_time, delivery_speed, rng.choice(DAYS), hour))
+        histories[customer_id] = rows
+    return histories
+
+def run_backend(name, histories, train_fraction):
+    predicted = 0
+    correct = {'window_time': 0, 'delivery_speed': 0}
+    confidence = {'window_time': 0.0, 'delivery_speed': 0.0}
+    untrained = 0
+    fit_seconds = 0.0
+    predict_seconds = 0.0
+
+    for rows in histories.values():
+        split = int(len(rows) * train_fraction)
+        model = PREDICTORS[name]()
+        start = time.perf_counter()
+        trained = model.fit(rows[:split])
+        fit_seconds += time.perf_counter() - start
+        if not trained:
+            untrained += 1
+            continue
+
+        for vendor_id, window_time, delivery_speed, order_day, order_hour in rows[split:]:
+            start = time.perf_counter()
+            prediction = model.predict_for(vendor_id, order_day, order_hour)
+            predict_seconds += time.perf_counter() - start
+            predicted += 1
+            correct['window_time'] += prediction['window_time'] == window_time
+            correct['delivery_speed'] += prediction['delivery_speed'] == delivery_speed
+            confidence['window_time'] += prediction['window_confidence']
+            confidence['delivery_speed'] += prediction['speed_confidence']
+
+    metrics = {
+        'untrained_customers': untrained,
+        'predictions': predicted,
+        'fit_ms_per_customer': round(fit_seconds * 1000 / len(histories), 3),
+        'predict_us': round(predict_seconds * 1e6 / predicted, 2) if predicted else 0.0
+    }
+    for target, prefix in (('window_time', 'window'), ('delivery_speed', 'speed')):
+        accuracy = correct[target] / predicted if predicted else 0.0
+        mean_confidence = confidence[target] / predicted if predicted else 0.0
+        metrics[f'{prefix}_accuracy'] = round(accuracy, 4)
+        # Positive when the backend is overconfident
+        metrics[f'{prefix}_calibration_gap'] = round(mean_confidence - accuracy, 4)
+    return metrics
+
+def run(customers=200, orders_per_customer=40, noise=0.2, train_fraction=0.8, seed=42, backends=None):
+    histories = build_histories(customers, orders_per_customer, noise, seed)
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine()
+        },
+        'settings': {
+            'customers': customers,
+            'orders_per_customer': orders_per_customer,
+            'noise': noise,
+            'train_fraction': train_fraction,
+            'seed': seed
+        },
+        'backends': {
+            name: run_backend(name, histories, train_fraction)
+            for name in (backends or PREDICTORS)
+        }
+    }
+
+def compare(report, baseline):
+    """Print the change in accuracy and predict time for each backend against a previous report"""
+    for name, metrics in report['backends'].items():
+        old = baseline.get('backends', {}).get(name)
+        if not old:
+            print(f"{name:>8s} (new)")
+            continue
+        print(f"{name:>8s} window_accuracy {old['window_accuracy']} -> {metrics['window_accuracy']}, "
+              f"speed_accuracy {old['speed_accuracy']} -> {metrics['speed_accuracy']}, "
+              f"predict_us {old['predict_us']} -> {metrics['predict_us']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the TrackIt AI predictor backends')
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--orders-per-customer', type=int, default=40)
+    parser.add_argument('--noise', type=float, default=0.2, help='share of orders that break the habit')
+    parser.add_argument('--train-fraction', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backends', nargs='+', choices=sorted(PREDICTORS), help='backends to compare')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='compare against a previous JSON report')
+    args = parser.parse_args()
+
+    report = run(args.customers, args.orders_per_customer, args.noise, args.train_fraction,
+                 args.seed, args.backends)
+
+    print(f"{'backend':>8s} {'window':>7s} {'gap':>7s} {'speed':>7s} {'gap':>7s} "
+          f"{'fit ms':>8s} {'pred us':>9s} {'untrained':>9s}")
+    for name, metrics in report['backends'].items():
+        print(f"{name:>8s} {metrics['window_accuracy']:7.3f} {metrics['window_calibration_gap']:7.3f} "
+              f"{metrics['speed_accuracy']:7.3f} {metrics['speed_calibration_gap']:7.3f} "
+              f"{metrics['fit_ms_per_customer']:8.2f} {metrics['predict_us']:9.2f} "
+              f"{metrics['untrained_customers']:9d}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
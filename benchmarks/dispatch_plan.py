@@ -0,0 +1,130 @@
+"""Dispatch planner benchmark: plan time against batch size.
+
+Generates a seeded batch of accepted orders spread over the delivery windows
+and speeds, plus a partner pool with existing loads, and times
+plan_assignments at several order counts. Reports plan time, orders planned
+per second and how evenly the load ended up spread.
+
+Usage (from the repository root):
+
+    python -m benchmarks.dispatch_plan --output plan.json
+    python -m benchmarks.dispatch_plan --baseline plan.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from dispatch_plan import SPEED_ORDER, WINDOW_ORDER, plan_assignments
+
+ORDER_COUNTS = [1000, 10000, 100000]
+
+# Fixed base time so the generated batch is identical between runs
+BASE_TIME = datetime(2025, 1, 1, 8, 0)
+
+def build_batch(order_count, orders_per_partner, capacity, seed):
+    """Return (orders, partner_loads, window_loads) for one benchmark case"""
+    rng = random.Random(seed)
+    partner_count = max(order_count // orders_per_partner, 1)
+
+    orders = [
+        (order_id, rng.choice(WINDOW_ORDER), rng.choice(SPEED_ORDER),
+         BASE_TIME + timedelta(seconds=rng.randint(0, 86400)))
+        for order_id in range(order_count)
+    ]
+    partner_loads = {}
+    window_loads = {}
+    for partner_id in range(partner_count):
+        load = rng.randint(0, capacity // 2)
+        partner_loads[partner_id] = load
+        for _ in range(load):
+            key = (partner_id, rng.choice(WINDOW_ORDER))
+            window_loads[key] = window_loads.get(key, 0) + 1
+    return orders, partner_loads, window_loads
+
+def run_case(order_count, orders_per_partner, capacity, seed, repeats):
+    orders, partner_loads, window_loads = build_batch(order_count, orders_per_partner, capacity, seed)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        plan = plan_assignments(orders, partner_loads, capacity, window_loads)
+        timings.append(time.perf_counter() - start)
+
+    final_loads = dict(partner_loads)
+    for partner_id in plan.values():
+        final_loads[partner_id] += 1
+    loads = list(final_loads.values())
+    best = min(timings)
+
+    return {
+        'orders': order_count,
+        'partners': len(partner_loads),
+        'assigned': len(plan),
+        'plan_ms': round(best * 1000, 3),
+        'orders_per_sec': round(order_count / best, 1) if best else 0.0,
+        'max_load': max(loads),
+        'load_stdev': round(statistics.pstdev(loads), 3),
+        'over_capacity': sum(1 for load in loads if load > capacity)
+    }
+
+def run(order_counts=ORDER_COUNTS, orders_per_partner=5, capacity=10, seed=42, repeats=3):
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine()
+        },
+        'settings': {
+            'orders_per_partner': orders_per_partner,
+            'capacity': capacity,
+            'seed': seed,
+            'repeats': repeats
+        },
+        'cases': {
+            str(order_count): run_case(order_count, orders_per_partner, capacity, seed, repeats)
+            for order_count in order_counts
+        }
+    }
+
+def compare(report, baseline):
+    """Print the change in plan time for each order count against a previous report"""
+    for order_count, metrics in report['cases'].items():
+        old = baseline.get('cases', {}).get(order_count)
+        if not old:
+            print(f"{order_count:>8s} (new)")
+            continue
+        print(f"{order_count:>8s} plan_ms {old['plan_ms']} -> {metrics['plan_ms']}, "
+              f"load_stdev {old['load_stdev']} -> {metrics['load_stdev']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the TrackIt dispatch planner')
+    parser.add_argument('--orders', type=int, nargs='+', default=ORDER_COUNTS, help='batch sizes to plan')
+    parser.add_argument('--orders-per-partner', type=int, default=5)
+    parser.add_argument('--capacity', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='compare against a previous JSON report')
+    args = parser.parse_args()
+
+    report = run(args.orders, args.orders_per_partner, args.capacity, args.seed, args.repeats)
+
+    print(f"{'orders':>8s} {'partners':>9s} {'assigned':>9s} {'plan ms':>9s} {'orders/s':>11s} {'max':>4s} {'stdev':>6s}")
+    for metrics in report['cases'].values():
+        print(f"{metrics['orders']:8d} {metrics['partners']:9d} {metrics['assigned']:9d} "
+              f"{metrics['plan_ms']:9.1f} {metrics['orders_per_sec']:11.0f} "
+              f"{metrics['max_load']:4d} {metrics['load_stdev']:6.2f}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""QR decode benchmark over a synthetic TRACKIT image corpus.
+
+Renders signed and legacy package and customer delivery payloads, styled as
+the app renders them, with controlled blur, noise, rotation, perspective and
+JPEG quality at several resolutions, then runs each detector/preprocessing
+pipeline over the corpus and reports decode rate, p50/p99 latency and frames
+per second, overall and by resolution and payload.
+
+Usage (from the repository root):
+
+    python -m benchmarks.qr_decode --output bench.json
+    python -m benchmarks.qr_decode --baseline bench.json
+"""
+import argparse
+import json
+import platform
+import random
+import time
+
+import cv2
+import numpy as np
+
+from qr_decoder import PYZBAR_AVAILABLE, QR_PREFIX, create_clahe, decode_image_bytes
+from qr_images import render_qr_png
+from qr_payloads import package_payload, delivery_payload, signed_payload
+
+if PYZBAR_AVAILABLE:
+    from pyzbar import pyzbar
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+BLUR_SIGMAS = [0, 1.5]
+NOISE_STDS = [0, 12]
+ROTATIONS = [0, 25]
+PERSPECTIVE = [0, 0.08]
+JPEG_QUALITIES = [80, 50]
+
+# Fixed issue times so the corpus is identical between runs
+CORPUS_TIMESTAMP = "20250101120000"
+CORPUS_ISSUED_AT = 1735713000
+
+# Payload formats in the corpus: signed is what the app issues by default,
+# legacy is what codes printed before signing carry
+PAYLOADS = ('signed_package', 'signed_delivery', 'legacy_package', 'legacy_delivery')
+
+def make_payload(name, order_id, customer_id, unique_id):
+    if name == 'signed_package':
+        return signed_payload('package', order_id, CORPUS_ISSUED_AT)
+    if name == 'signed_delivery':
+        return signed_payload('delivery', order_id, CORPUS_ISSUED_AT)
+    if name == 'legacy_package':
+        return package_payload(order_id, CORPUS_TIMESTAMP, unique_id)
+    return delivery_payload(order_id, customer_id, CORPUS_TIMESTAMP, unique_id)
+
+def render_qr(payload, kind):
+    """Rasterize a payload exactly as the app does for ``kind``, as a grayscale image"""
+    return decode_image_bytes(render_qr_png(payload, kind))
+
+def place_qr(matrix, resolution, rng, rotation, perspective):
+    """Place a QR module matrix in a camera-sized frame"""
+    width, height = resolution
+    frame = np.full((height, width), 170, dtype=np.uint8)
+
+    # QR covers 25-45% of the shorter frame side
+    side = int(min(width, height) * rng.uniform(0.25, 0.45))
+    qr_img = cv2.resize(matrix, (side, side), interpolation=cv2.INTER_NEAREST)
+
+    cx = rng.uniform(side * 0.8, width - side * 0.8)
+    cy = rng.uniform(side * 0.8, height - side * 0.8)
+    half = side / 2
+    corners = np.array([[-half, -half], [half, -half], [half, half], [-half, half]], dtype=np.float32)
+
+    angle = np.deg2rad(rng.uniform(-rotation, rotation))
+    rot = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]], dtype=np.float32)
+    corners = corners @ rot.T
+    corners += np.array([[rng.uniform(-1, 1), rng.uniform(-1, 1)] for _ in range(4)],
+                        dtype=np.float32) * perspective * side
+    corners += np.array([cx, cy], dtype=np.float32)
+
+    src = np.array([[0, 0], [side, 0], [side, side], [0, side]], dtype=np.float32)
+    transform = cv2.getPerspectiveTransform(src, corners)
+    warped = cv2.warpPerspective(qr_img, transform, (width, height),
+                                 flags=cv2.INTER_LINEAR, borderValue=0)
+    mask = cv2.warpPerspective(np.full_like(qr_img, 255), transform, (width, height),
+                               flags=cv2.INTER_NEAREST, borderValue=0)
+    frame[mask > 0] = warped[mask > 0]
+    return frame
+
+def degrade(frame, rng, blur, noise):
+    if blur:
+        frame = cv2.GaussianBlur(frame, (0, 0), blur)
+    if noise:
+        noisy = frame.astype(np.float32) + rng.normal(0, noise, frame.shape)
+        frame = np.clip(noisy, 0, 255).astype(np.uint8)
+    return frame
+
+def build_corpus(samples_per_case, seed):
+    """Return a list of (case, payload name, payload, jpeg_bytes) covering every distortion combination"""
+    rng = np.random.default_rng(seed)
+    py_rng = random.Random(seed)
+    corpus = []
+    for resolution in RESOLUTIONS:
+        for blur in BLUR_SIGMAS:
+            for noise in NOISE_STDS:
+                for rotation in ROTATIONS:
+                    for perspective in PERSPECTIVE:
+                        for quality in JPEG_QUALITIES:
+                            case = {
+                                'resolution': f"{resolution[0]}x{resolution[1]}",
+                                'blur': blur,
+                                'noise': noise,
+                                'rotation': rotation,
+                                'perspective': perspective,
+                                'jpeg_quality': quality
+                            }
+                            for _ in range(samples_per_case):
+                                order_id = py_rng.randint(1, 999999)
+                                unique_id = f"{py_rng.getrandbits(32):08x}"
+                                name = py_rng.choice(PAYLOADS)
+                                payload = make_payload(name, order_id, py_rng.randint(1, 99999), unique_id)
+                                kind = 'delivery' if name.endswith('delivery') else 'package'
+                                frame = place_qr(render_qr(payload, kind), resolution, rng, rotation, perspective)
+                                frame = degrade(frame, rng, blur, noise)
+                                ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                                corpus.append((case, name, payload, encoded.tobytes()))
+    return corpus
+
+def _zbar(image):
+    for code in pyzbar.decode(image):
+        data = code.data.decode('utf-8')
+        if data.startswith(QR_PREFIX):
+            return data
+    return None
+
+def _opencv(detector):
+    def detect(image):
+        data, _, _ = detector.detectAndDecode(image)
+        return data if data and data.startswith(QR_PREFIX) else None
+    return detect
+
+def build_pipelines():
+    """Detector x preprocessing combinations, each taking grayscale -> payload or None"""
+    clahe = create_clahe()
+    opencv = _opencv(cv2.QRCodeDetector())
+
+    preprocess = {
+        'raw': lambda gray: gray,
+        'clahe': clahe.apply,
+    }
+    detectors = {'opencv': opencv}
+    if PYZBAR_AVAILABLE:
+        detectors['zbar'] = _zbar
+
+    pipelines = {}
+    for prep_name, prep in preprocess.items():
+        for det_name, det in detectors.items():
+            pipelines[f"{det_name}+{prep_name}"] = (lambda p, d: lambda gray: d(p(gray)))(prep, det)
+
+    # The production chain: CLAHE, then ZBar, then OpenCV as a fallback
+    if PYZBAR_AVAILABLE:
+        def production(gray):
+            enhanced = clahe.apply(gray)
+            return _zbar(enhanced) or opencv(enhanced)
+        pipelines['production'] = production
+    return pipelines
+
+def summarize(latencies, hits):
+    latencies = np.array(latencies) * 1000
+    total = float(latencies.sum())
+    return {
+        'frames': int(len(latencies)),
+        'decode_rate': round(hits / len(latencies), 4) if len(latencies) else 0.0,
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else 0.0,
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else 0.0,
+        'fps': round(len(latencies) / (total / 1000), 2) if total else 0.0
+    }
+
+def run(samples_per_case=2, seed=42):
+    corpus = build_corpus(samples_per_case, seed)
+    results = {}
+    for name, pipeline in build_pipelines().items():
+        latencies = {}
+        hits = {}
+        payload_latencies = {}
+        payload_hits = {}
+        for case, payload_name, payload, encoded in corpus:
+            start = time.perf_counter()
+            decoded = pipeline(decode_image_bytes(encoded))
+            elapsed = time.perf_counter() - start
+
+            resolution = case['resolution']
+            latencies.setdefault(resolution, []).append(elapsed)
+            hits[resolution] = hits.get(resolution, 0) + (decoded == payload)
+            payload_latencies.setdefault(payload_name, []).append(elapsed)
+            payload_hits[payload_name] = payload_hits.get(payload_name, 0) + (decoded == payload)
+
+        all_latencies = [value for values in latencies.values() for value in values]
+        results[name] = summarize(all_latencies, sum(hits.values()))
+        results[name]['by_resolution'] = {
+            resolution: summarize(latencies[resolution], hits[resolution])
+            for resolution in sorted(latencies)
+        }
+        results[name]['by_payload'] = {
+            payload_name: summarize(payload_latencies[payload_name], payload_hits[payload_name])
+            for payload_name in sorted(payload_latencies)
+        }
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'pyzbar': PYZBAR_AVAILABLE,
+            'machine': platform.machine()
+        },
+        'corpus': {'frames': len(corpus), 'samples_per_case': samples_per_case, 'seed': seed},
+        'pipelines': results
+    }
+
+def compare(report, baseline):
+    """Print the change of each headline metric against a previous report"""
+    for name, metrics in report['pipelines'].items():
+        old = baseline.get('pipelines', {}).get(name)
+        if not old:
+            print(f"{name:20s} (new)")
+            continue
+        deltas = ', '.join(
+            f"{key} {old[key]} -> {metrics[key]}"
+            for key in ('decode_rate', 'p50_ms', 'p99_ms', 'fps')
+        )
+        print(f"{name:20s} {deltas}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TrackIt QR decode pipelines')
+    parser.add_argument('--samples', type=int, default=2, help='frames per distortion case')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='compare against a previous JSON report')
+    args = parser.parse_args()
+
+    report = run(args.samples, args.seed)
+
+    print(f"{'pipeline':20s} {'rate':>7s} {'p50 ms':>8s} {'p99 ms':>8s} {'fps':>8s}")
+    for name, metrics in report['pipelines'].items():
+        print(f"{name:20s} {metrics['decode_rate']:7.3f} {metrics['p50_ms']:8.2f} "
+              f"{metrics['p99_ms']:8.2f} {metrics['fps']:8.1f}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import heapq
+from collections import defaultdict
+
+# Delivery windows in the order they come up during the day
+WINDOW_ORDER = ['9am-12pm', '12pm-4pm', '4pm-9pm', '9pm-9am']
+
+# Express orders get first pick of partners within a window
+SPEED_ORDER = ['express', 'regular']
+
+def plan_assignments(orders, partner_loads, capacity, window_loads=None):
+    """Assign a batch of orders to partners without exceeding ``capacity``.
+
+    ``orders`` is an iterable of ``(order_id, window_time, delivery_speed,
+    created_at)``, ``partner_loads`` maps partner id -> active order count
+    and ``window_loads`` maps ``(partner_id, window_time)`` -> active orders
+    in that window. Each window is planned with its own min-heap keyed by
+    (orders in this window, total orders), so work is spread within every
+    window as well as overall; express orders, then older orders, are
+    assigned first. Each window costs O(n + m log n) for m orders and n
+    partners.
+
+    Returns ``{order_id: partner_id}``; orders left out found no capacity.
+    """
+    totals = dict(partner_loads)
+    window_loads = defaultdict(int, window_loads or {})
+
+    by_window = defaultdict(list)
+    for order_id, window_time, delivery_speed, created_at in orders:
+        speed_rank = SPEED_ORDER.index(delivery_speed) if delivery_speed in SPEED_ORDER else len(SPEED_ORDER)
+        by_window[window_time].append((speed_rank, created_at, order_id))
+
+    windows = [window for window in WINDOW_ORDER if window in by_window]
+    windows += sorted(window for window in by_window if window not in WINDOW_ORDER)
+
+    plan = {}
+    for window in windows:
+        heap = [
+            (window_loads[(partner_id, window)], load, partner_id)
+            for partner_id, load in totals.items()
+            if load < capacity
+        ]
+        heapq.heapify(heap)
+
+        for _, _, order_id in sorted(by_window[window]):
+            if not heap:
+                break
+            window_load, load, partner_id = heapq.heappop(heap)
+            plan[order_id] = partner_id
+            totals[partner_id] = load + 1
+            window_loads[(partner_id, window)] = window_load + 1
+            if load + 1 < capacity:
+                heapq.heappush(heap, (window_load + 1, load + 1, partner_id))
+    return plan
@@ -0,0 +1,149 @@
+import os
+import time
+import logging
+import threading
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+
+from app import app, db, socketio
+from models import Order, User
+from dispatch_plan import plan_assignments
+from order_counters import apply_counter_deltas, order_parties, transition_deltas
+from order_queries import ACTIVE_STATUSES
+from partner_index import PARTNER_CAPACITY, partner_index
+
+# 'immediate' assigns a partner when the order is accepted; 'batched' leaves
+# accepted orders for the periodic dispatch planner
+DISPATCH_MODE = os.environ.get('DISPATCH_MODE', 'immediate')
+DISPATCH_PLAN_INTERVAL = float(os.environ.get('DISPATCH_PLAN_INTERVAL', 60))
+DISPATCH_BATCH_SIZE = int(os.environ.get('DISPATCH_BATCH_SIZE', 5000))
+
+class DispatchPlanner:
+    """Periodically assigns accepted, unassigned orders to delivery partners in batches.
+
+    Also picks up orders accepted in immediate mode while no partner was
+    available. On PostgreSQL the orders are claimed with SKIP LOCKED, so
+    several processes can run the planner without assigning an order twice.
+    """
+
+    def __init__(self, interval=DISPATCH_PLAN_INTERVAL, batch_size=DISPATCH_BATCH_SIZE,
+                 capacity=PARTNER_CAPACITY):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._started = False
+        self.metrics = {
+            'runs': 0,
+            'assigned': 0,
+            'unassigned': 0,
+            'last_plan_ms': 0.0,
+        }
+
+    def start(self):
+        """Start the periodic planner (idempotent)"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started or not self.interval:
+                return
+            self._started = True
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                with app.app_context():
+                    self.run_once()
+            except Exception as e:
+                with app.app_context():
+                    db.session.rollback()
+                logging.error(f"Error running dispatch plan: {str(e)}")
+
+    def _window_loads(self, partner_loads):
+        """Active orders per (partner, window) for the partners in this plan"""
+        rows = db.session.execute(
+            select(Order.delivery_partner_id, Order.window_time, func.count())
+            .where(Order.delivery_partner_id.isnot(None), Order.status.in_(ACTIVE_STATUSES))
+            .group_by(Order.delivery_partner_id, Order.window_time)
+        ).all()
+        return {
+            (partner_id, window_time): count
+            for partner_id, window_time, count in rows
+            if partner_id in partner_loads
+        }
+
+    def run_once(self):
+        """Plan and commit one batch; returns ``{order_id: partner_id}``"""
+        # Select-in rather than joined loads, so the row lock applies to orders alone
+        query = Order.query.options(
+            selectinload(Order.customer).load_only(User.full_name),
+            selectinload(Order.vendor).load_only(User.full_name)
+        ).filter(
+            Order.status == 'accepted',
+            Order.delivery_partner_id.is_(None)
+        ).order_by(Order.created_at).limit(self.batch_size)
+        if db.engine.dialect.name == 'postgresql':
+            query = query.with_for_update(of=Order, skip_locked=True)
+        orders = query.all()
+        if not orders:
+            db.session.rollback()
+            return {}
+
+        partner_index.start()
+        loads = {partner_id: load for partner_id, load in partner_index.loads().items() if load < self.capacity}
+        window_loads = self._window_loads(loads) if loads else {}
+
+        start = time.perf_counter()
+        plan = plan_assignments(
+            [(order.id, order.window_time, order.delivery_speed, order.created_at) for order in orders],
+            loads, self.capacity, window_loads
+        )
+        plan_ms = (time.perf_counter() - start) * 1000
+
+        deltas = {}
+        assignments = []
+        for order in orders:
+            partner_id = plan.get(order.id)
+            if partner_id is None:
+                continue
+            parties = order_parties(order)
+            order.delivery_partner_id = partner_id
+            transition_deltas(parties, 'accepted', order_parties(order), 'accepted', deltas,
+                              amount=order.estimated_amount)
+            assignments.append((partner_id, {
+                'order_id': order.id,
+                'customer_name': order.customer.full_name,
+                'vendor_name': order.vendor.full_name,
+                'description': order.order_description
+            }))
+
+        apply_counter_deltas(deltas)
+        db.session.commit()
+
+        for partner_id, assignment in assignments:
+            socketio.emit('new_assignment', assignment, room=f'delivery_{partner_id}')
+
+        self.metrics['runs'] += 1
+        self.metrics['assigned'] += len(assignments)
+        self.metrics['unassigned'] = len(orders) - len(assignments)
+        self.metrics['last_plan_ms'] = round(plan_ms, 3)
+        logging.info(f"Dispatch plan assigned {len(assignments)} of {len(orders)} orders in {plan_ms:.1f} ms")
+        return plan
+
+# Global dispatch planner
+dispatch_planner = DispatchPlanner()
+
+@app.before_request
+def start_dispatch_planner():
+    # Runs in both dispatch modes: immediate mode relies on the planner for
+    # orders accepted while every partner was busy or none was registered
+    dispatch_planner.start()
+
+@app.cli.command('plan-dispatch')
+def plan_dispatch_command():
+    """Assign accepted, unassigned orders to delivery partners once"""
+    plan = dispatch_planner.run_once()
+    print(f"Assigned {len(plan)} orders")
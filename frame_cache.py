@@ -0,0 +1,63 @@
+import os
+import time
+import cv2
+import numpy as np
+
+from qr_decoder import NO_QR_ERROR
+
+# Near-duplicate frame cache configuration
+FRAME_CACHE_SIZE = int(os.environ.get('FRAME_CACHE_SIZE', 8))
+FRAME_CACHE_TTL = float(os.environ.get('FRAME_CACHE_TTL', 1.0))
+FRAME_HASH_SIZE = 16                # dHash grid is FRAME_HASH_SIZE x FRAME_HASH_SIZE bits
+FRAME_HASH_MAX_DISTANCE = int(os.environ.get('FRAME_HASH_MAX_DISTANCE', 8))
+
+def frame_hash(image_bytes):
+    """Compute a difference hash of an encoded frame, or None if it cannot be read.
+
+    The JPEG is decoded at 1/8 scale, which is far cheaper than the full
+    decode the QR detector needs.
+    """
+    image_array = np.frombuffer(image_bytes, dtype=np.uint8)
+    small = cv2.imdecode(image_array, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if small is None:
+        return None
+
+    tiny = cv2.resize(small, (FRAME_HASH_SIZE + 1, FRAME_HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = tiny[:, 1:] > tiny[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def is_cacheable(result):
+    """Only definitive results are cached: a QR hit or a clean "no QR" miss"""
+    return result.get('qr_detected') or result.get('error') == NO_QR_ERROR
+
+class FrameCache:
+    """Small per-session cache of recent decode results keyed by frame hash.
+
+    Entries are never refreshed on a hit, so a slowly changing scene is
+    decoded for real at least once every ``ttl`` seconds.
+    """
+
+    def __init__(self, size=FRAME_CACHE_SIZE, ttl=FRAME_CACHE_TTL,
+                 max_distance=FRAME_HASH_MAX_DISTANCE):
+        self.size = size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._entries = []  # (stored_at, region, fingerprint, result)
+
+    def lookup(self, fingerprint, region):
+        """Return the cached result for a near-identical frame, or None"""
+        now = time.monotonic()
+        self._entries = [entry for entry in self._entries if now - entry[0] <= self.ttl]
+
+        for _, entry_region, entry_fingerprint, result in reversed(self._entries):
+            if entry_region == region and (entry_fingerprint ^ fingerprint).bit_count() <= self.max_distance:
+                return dict(result, cached=True)
+        return None
+
+    def store(self, fingerprint, region, result):
+        """Remember a decode result for this frame"""
+        if not is_cacheable(result):
+            return
+        self._entries.append((time.monotonic(), region, fingerprint, dict(result)))
+        if len(self._entries) > self.size:
+            del self._entries[0]
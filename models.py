@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 import pytz
 from flask_sqlalchemy import SQLAlchemy
@@ -8,6 +9,14 @@ from app import db
 # Indian Standard Time
 IST = pytz.timezone('Asia/Kolkata')
 
+# Delivered orders a customer needs before AI predictions are offered
+AI_PREDICTION_MIN_ORDERS = 5
+
+# Users allowed to read operational metrics, besides those with the 'admin' role
+OPERATOR_USERNAMES = frozenset(
+    name.strip() for name in os.environ.get('OPERATOR_USERNAMES', '').split(',') if name.strip()
+)
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     
@@ -35,8 +44,21 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
-    def can_use_ai_predictions(self):
-        return self.role == 'customer' and self.successful_orders >= 5
+    def order_counts(self):
+        """Materialized order counters for this user's role (all zero if none yet)"""
+        counts = db.session.get(OrderCounter, (self.id, self.role))
+        if counts is None:
+            counts = OrderCounter(user_id=self.id, role=self.role, pending=0, active=0, delivered=0, rejected=0,
+                                  pending_amount=0, active_amount=0, delivered_amount=0, rejected_amount=0)
+        return counts
+    
+    def is_operator(self):
+        return self.role == 'admin' or self.username in OPERATOR_USERNAMES
+    
+    def can_use_ai_predictions(self, counts=None):
+        if counts is None:
+            counts = self.order_counts()
+        return self.role == 'customer' and counts.delivered >= AI_PREDICTION_MIN_ORDERS
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -51,13 +73,17 @@ class Vendor(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(IST))
     
-    user = db.relationship('User', backref='vendor_profile')
+    user = db.relationship('User', backref=db.backref('vendor_profile', uselist=False))
     
     def __repr__(self):
         return f'<Vendor {self.business_name}>'
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Serves the vendor dashboard buckets and their keyset pages
+        db.Index('ix_orders_vendor_status_created', 'vendor_id', 'status', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -131,8 +157,56 @@ class OrderHistory(db.Model):
     was_successful = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(IST))
     
+    __table_args__ = (
+        # Serves training reads and the history version behind the AI model cache
+        db.Index('ix_order_history_customer_successful', 'customer_id', 'was_successful', 'id'),
+    )
+    
     customer = db.relationship('User', foreign_keys=[customer_id], backref='order_patterns')
     vendor_user = db.relationship('User', foreign_keys=[vendor_id])
     
     def __repr__(self):
         return f'<OrderHistory {self.id} - {self.customer_id}>'
+
+class OrderCounter(db.Model):
+    """Per-user order counts by status bucket, kept in step with every order transition"""
+    __tablename__ = 'order_counters'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    role = db.Column(db.String(20), primary_key=True)  # the user's side of the order
+    pending = db.Column(db.Integer, nullable=False, default=0)
+    active = db.Column(db.Integer, nullable=False, default=0)
+    delivered = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    # Total estimated amount of the orders in each count
+    pending_amount = db.Column(db.Float, nullable=False, default=0)
+    active_amount = db.Column(db.Float, nullable=False, default=0)
+    delivered_amount = db.Column(db.Float, nullable=False, default=0)
+    rejected_amount = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(IST), onupdate=lambda: datetime.now(IST))
+    
+    @property
+    def total(self):
+        return self.pending + self.active + self.delivered + self.rejected
+    
+    def __repr__(self):
+        return f'<OrderCounter {self.user_id} {self.role}>'
+
+class CustomerOrderPattern(db.Model):
+    """How many successful orders a customer placed with each combination of
+    vendor, delivery window, speed, order day and order hour, kept in step
+    with order_history
+    """
+    __tablename__ = 'customer_order_patterns'
+    
+    customer_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    window_time = db.Column(db.String(20), primary_key=True)
+    delivery_speed = db.Column(db.String(20), primary_key=True)
+    order_day = db.Column(db.String(10), primary_key=True)
+    order_hour = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(IST), onupdate=lambda: datetime.now(IST))
+    
+    def __repr__(self):
+        return f'<CustomerOrderPattern {self.customer_id} {self.vendor_id} {self.count}>'
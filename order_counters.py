@@ -0,0 +1,171 @@
+import logging
+from datetime import datetime
+
+import pytz
+from sqlalchemy import case, delete, func, insert, literal, select, text, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import app, db
+from models import Order, OrderCounter
+from partner_index import stage_load_deltas
+
+# Indian Standard Time
+IST = pytz.timezone('Asia/Kolkata')
+
+# Counter column each order status is counted under
+COUNTER_STATUSES = {
+    'pending': ['pending'],
+    'active': ['accepted', 'dispatched', 'in_transit', 'out_for_delivery'],
+    'delivered': ['delivered'],
+    'rejected': ['rejected'],
+}
+STATUS_COUNTER = {status: column for column, statuses in COUNTER_STATUSES.items() for status in statuses}
+
+# Column totalling the estimated amount of the orders in each count
+AMOUNT_COLUMNS = {column: f'{column}_amount' for column in COUNTER_STATUSES}
+COUNTER_COLUMNS = list(COUNTER_STATUSES) + list(AMOUNT_COLUMNS.values())
+
+# Each side of an order that keeps its own counters
+PARTY_COLUMNS = {
+    'customer': Order.customer_id,
+    'vendor': Order.vendor_id,
+    'delivery_partner': Order.delivery_partner_id,
+}
+
+def order_parties(order):
+    """``(user_id, role)`` of everyone an order counts towards"""
+    return [
+        (getattr(order, column.key), role)
+        for role, column in PARTY_COLUMNS.items()
+        if getattr(order, column.key) is not None
+    ]
+
+def transition_deltas(before_parties, before_status, after_parties, after_status, deltas=None, amount=None):
+    """Add the counter changes of one order transition to ``deltas``.
+
+    ``before_status`` is None for a new order. The parties may differ on the
+    two sides, e.g. when accepting an order assigns a delivery partner.
+    ``amount`` is the order's estimated amount, moved along with the count.
+    """
+    deltas = {} if deltas is None else deltas
+    for parties, status, step in ((before_parties, before_status, -1), (after_parties, after_status, 1)):
+        if status is None:
+            continue
+        column = STATUS_COUNTER[status]
+        for party in parties:
+            counts = deltas.setdefault(party, {})
+            counts[column] = counts.get(column, 0) + step
+            if amount:
+                counts[AMOUNT_COLUMNS[column]] = counts.get(AMOUNT_COLUMNS[column], 0) + step * amount
+
+    for party in list(deltas):
+        deltas[party] = {column: delta for column, delta in deltas[party].items() if delta}
+        if not deltas[party]:
+            del deltas[party]
+    return deltas
+
+def apply_counter_deltas(deltas):
+    """Add ``{(user_id, role): {column: delta}}`` to the counters in the current transaction"""
+    if not deltas:
+        return
+    stage_load_deltas(deltas)
+
+    table = OrderCounter.__table__
+    now = datetime.now(IST)
+    rows = [
+        dict({column: counts.get(column, 0) for column in COUNTER_COLUMNS},
+             user_id=user_id, role=role, updated_at=now)
+        for (user_id, role), counts in deltas.items()
+    ]
+
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        # One upsert for all rows: a missing counter starts at the delta
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.role],
+            set_=dict({column: table.c[column] + stmt.excluded[column] for column in COUNTER_COLUMNS},
+                      updated_at=stmt.excluded.updated_at)
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = db.session.execute(
+            update(table)
+            .where(table.c.user_id == row['user_id'], table.c.role == row['role'])
+            .values(updated_at=now, **{column: table.c[column] + row[column] for column in COUNTER_COLUMNS})
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table), row)
+
+def record_transition(order, before_status, before_parties=None):
+    """Move an order's counters from ``before_status`` to its current status.
+
+    Call before committing the transition so both land in one transaction.
+    ``before_parties`` defaults to the order's current parties.
+    """
+    after_parties = order_parties(order)
+    apply_counter_deltas(transition_deltas(
+        after_parties if before_parties is None else before_parties, before_status,
+        after_parties, order.status, amount=order.estimated_amount
+    ))
+
+def counter_query():
+    """Counters of every user computed from the orders table"""
+    return union_all(*[
+        select(
+            column.label('user_id'),
+            literal(role).label('role'),
+            *[
+                func.sum(case((Order.status.in_(statuses), 1), else_=0)).label(name)
+                for name, statuses in COUNTER_STATUSES.items()
+            ],
+            *[
+                func.coalesce(func.sum(case((Order.status.in_(statuses), Order.estimated_amount), else_=0)), 0)
+                .label(AMOUNT_COLUMNS[name])
+                for name, statuses in COUNTER_STATUSES.items()
+            ]
+        ).where(column.isnot(None)).group_by(column)
+        for role, column in PARTY_COLUMNS.items()
+    ])
+
+def counter_values(counter):
+    """A counter's columns in COUNTER_COLUMNS order, amounts rounded to the paisa"""
+    return (
+        tuple(int(getattr(counter, column)) for column in COUNTER_STATUSES)
+        + tuple(round(float(getattr(counter, column)), 2) for column in AMOUNT_COLUMNS.values())
+    )
+
+def rebuild_order_counters():
+    """Recompute every counter from orders; returns how many had drifted"""
+    if db.engine.dialect.name == 'postgresql':
+        # Block concurrent counter updates until the rebuilt counters are committed
+        db.session.execute(text('LOCK TABLE order_counters IN SHARE ROW EXCLUSIVE MODE'))
+
+    zero = (0,) * len(COUNTER_COLUMNS)
+    fresh = {(row.user_id, row.role): counter_values(row) for row in db.session.execute(counter_query())}
+    current = {
+        (counter.user_id, counter.role): counter_values(counter)
+        for counter in OrderCounter.query.all()
+    }
+    drifted = sum(1 for key in fresh.keys() | current.keys() if fresh.get(key, zero) != current.get(key, zero))
+
+    now = datetime.now(IST)
+    db.session.execute(delete(OrderCounter))
+    if fresh:
+        db.session.execute(insert(OrderCounter.__table__), [
+            dict(zip(COUNTER_COLUMNS, counts), user_id=user_id, role=role, updated_at=now)
+            for (user_id, role), counts in fresh.items()
+        ])
+    db.session.commit()
+    db.session.expire_all()
+
+    logging.info(f"Rebuilt {len(fresh)} order counters, {drifted} had drifted")
+    return drifted
+
+@app.cli.command('rebuild-order-counters')
+def rebuild_order_counters_command():
+    """Reconcile the order counters with the orders table"""
+    drifted = rebuild_order_counters()
+    print(f"Rebuilt order counters ({drifted} drifted)")
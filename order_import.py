@@ -0,0 +1,178 @@
+import os
+import csv
+import json
+import logging
+
+from sqlalchemy import insert
+
+from app import db
+from models import Order, User
+from order_counters import apply_counter_deltas, transition_deltas
+from vendor_directory import eligible_vendors
+
+# Order form rules, shared with create_order
+WINDOW_TIMES = ['9am-12pm', '12pm-4pm', '4pm-9pm', '9pm-9am']
+DELIVERY_SPEEDS = ['express', 'regular']
+BASE_AMOUNT = 100
+EXPRESS_SURCHARGE = 50
+
+# Bulk import limits
+ORDER_IMPORT_CHUNK_SIZE = int(os.environ.get('ORDER_IMPORT_CHUNK_SIZE', 500))
+ORDER_IMPORT_MAX_ROWS = int(os.environ.get('ORDER_IMPORT_MAX_ROWS', 10000))
+
+IMPORT_FIELDS = ('vendor_id', 'order_description', 'window_time', 'delivery_speed')
+
+def estimate_amount(delivery_speed):
+    return BASE_AMOUNT + (EXPRESS_SURCHARGE if delivery_speed == 'express' else 0)
+
+def validate_order_fields(vendor_id, order_description, window_time, delivery_speed):
+    """Return the error message for an order form, or None if it is valid"""
+    if not vendor_id:
+        return 'Please select a vendor.'
+    if not order_description:
+        return 'Please provide order description.'
+    if not window_time or window_time not in WINDOW_TIMES:
+        return 'Please select a valid delivery window.'
+    if not delivery_speed or delivery_speed not in DELIVERY_SPEEDS:
+        return 'Please select a valid delivery speed.'
+    return None
+
+def read_rows(stream, fmt):
+    """Yield ``(row_number, fields or None, error or None)`` from a CSV or NDJSON body.
+
+    Reads the stream a line at a time; a malformed row is reported and
+    skipped. A CSV body that is not UTF-8 ends the import at that row.
+    """
+    if fmt == 'ndjson':
+        for row_number, line in enumerate(stream, 1):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError:
+                yield row_number, None, 'Row is not valid UTF-8.'
+                continue
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield row_number, None, 'Invalid JSON.'
+                continue
+            if not isinstance(row, dict):
+                yield row_number, None, 'Each line must be a JSON object.'
+                continue
+            yield row_number, row, None
+        return
+
+    row_number = 0
+    try:
+        reader = csv.DictReader(line.decode('utf-8') for line in stream)
+        missing = [field for field in IMPORT_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            yield 0, None, f"Missing CSV columns: {', '.join(missing)}"
+            return
+        for row_number, row in enumerate(reader, 1):
+            yield row_number, row, None
+    except (UnicodeDecodeError, csv.Error) as e:
+        yield row_number + 1, None, f"Unreadable CSV: {str(e)}"
+
+def clean_row(row):
+    """Normalize one imported row to order values, or return an error message"""
+    values = {field: str(row.get(field) or '').strip() for field in IMPORT_FIELDS}
+    error = validate_order_fields(**values)
+    if error:
+        return None, error
+    if not values['vendor_id'].isdigit():
+        return None, 'Invalid vendor.'
+    values['vendor_id'] = int(values['vendor_id'])
+    return values, None
+
+class OrderImport:
+    """Creates a customer's orders from imported rows in chunked bulk inserts.
+
+    Each chunk is inserted and committed together with its counter updates;
+    a chunk that fails to commit marks only its own rows as failed.
+    """
+
+    def __init__(self, customer, chunk_size=ORDER_IMPORT_CHUNK_SIZE, max_rows=ORDER_IMPORT_MAX_ROWS):
+        self.customer_id = customer.id
+        self.customer_name = customer.full_name
+        self.chunk_size = chunk_size
+        self.max_rows = max_rows
+        self.created = []  # (row_number, order_id)
+        self.errors = []  # (row_number, error)
+        self.new_orders = {}  # vendor_id -> new_order payloads
+        self._vendor_ids = {}  # vendor_id -> whether it is an active vendor
+        self._chunk = []
+
+    def _check_vendors(self, vendor_ids):
+        unknown = [vendor_id for vendor_id in vendor_ids if vendor_id not in self._vendor_ids]
+        if unknown:
+            active = set(db.session.scalars(
+                eligible_vendors(User.id).where(User.id.in_(unknown))
+            ))
+            for vendor_id in unknown:
+                self._vendor_ids[vendor_id] = vendor_id in active
+
+    def _flush(self):
+        chunk, self._chunk = self._chunk, []
+        self._check_vendors({values['vendor_id'] for _, values in chunk})
+
+        rows = []
+        numbers = []
+        for row_number, values in chunk:
+            if not self._vendor_ids[values['vendor_id']]:
+                self.errors.append((row_number, 'Invalid vendor.'))
+                continue
+            rows.append(dict(values, customer_id=self.customer_id, status='pending',
+                             estimated_amount=estimate_amount(values['delivery_speed'])))
+            numbers.append(row_number)
+        if not rows:
+            return
+
+        try:
+            order_ids = db.session.scalars(
+                insert(Order).returning(Order.id, sort_by_parameter_order=True), rows
+            ).all()
+            deltas = {}
+            for row in rows:
+                parties = [(self.customer_id, 'customer'), (row['vendor_id'], 'vendor')]
+                transition_deltas([], None, parties, 'pending', deltas, amount=row['estimated_amount'])
+            apply_counter_deltas(deltas)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error importing orders: {str(e)}")
+            self.errors.extend((row_number, 'Error creating order.') for row_number in numbers)
+            return
+
+        for row_number, order_id, row in zip(numbers, order_ids, rows):
+            self.created.append((row_number, order_id))
+            self.new_orders.setdefault(row['vendor_id'], []).append({
+                'order_id': order_id,
+                'customer_name': self.customer_name,
+                'vendor_id': row['vendor_id'],
+                'description': row['order_description'],
+                'window_time': row['window_time'],
+                'delivery_speed': row['delivery_speed']
+            })
+
+    def run(self, rows):
+        """Import ``(row_number, fields, error)`` tuples as produced by read_rows"""
+        seen = 0
+        for row_number, row, error in rows:
+            seen += 1
+            if seen > self.max_rows:
+                self.errors.append((row_number, f'At most {self.max_rows} rows per import'))
+                break
+            if error is None:
+                row, error = clean_row(row)
+            if error:
+                self.errors.append((row_number, error))
+                continue
+            self._chunk.append((row_number, row))
+            if len(self._chunk) >= self.chunk_size:
+                self._flush()
+        if self._chunk:
+            self._flush()
+        self.errors.sort()
+        return self
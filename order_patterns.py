@@ -0,0 +1,150 @@
+import logging
+from datetime import datetime
+
+import pytz
+from sqlalchemy import delete, func, insert, literal, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import app, db
+from models import CustomerOrderPattern, OrderHistory
+
+# Indian Standard Time
+IST = pytz.timezone('Asia/Kolkata')
+
+# Columns that identify a pattern, in the order predictors take them
+PATTERN_COLUMNS = ('vendor_id', 'window_time', 'delivery_speed', 'order_day', 'order_hour')
+
+def add_patterns(customer_id, patterns):
+    """Add ``{pattern tuple: count}`` to a customer's patterns in the current transaction"""
+    if not patterns:
+        return
+
+    table = CustomerOrderPattern.__table__
+    now = datetime.now(IST)
+    rows = [
+        dict(zip(PATTERN_COLUMNS, pattern), customer_id=customer_id, count=count, updated_at=now)
+        for pattern, count in patterns.items()
+    ]
+
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        # One upsert for all rows: a new pattern starts at its count
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.customer_id, *(table.c[column] for column in PATTERN_COLUMNS)],
+            set_={'count': table.c.count + stmt.excluded['count'], 'updated_at': stmt.excluded.updated_at}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = db.session.execute(
+            update(table)
+            .where(table.c.customer_id == customer_id,
+                   *(table.c[column] == row[column] for column in PATTERN_COLUMNS))
+            .values(count=table.c.count + row['count'], updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table), row)
+
+def record_history(history):
+    """Count a successful order history row in its customer's patterns.
+
+    Call before committing the row so both land in one transaction.
+    """
+    if history.was_successful:
+        add_patterns(history.customer_id, {tuple(getattr(history, column) for column in PATTERN_COLUMNS): 1})
+
+def pattern_rows(customer_ids):
+    """``(customer_id, *pattern, count)`` rows for the given customers, grouped by customer"""
+    return db.session.execute(
+        select(CustomerOrderPattern.customer_id,
+               *(getattr(CustomerOrderPattern, column) for column in PATTERN_COLUMNS),
+               CustomerOrderPattern.count)
+        .where(CustomerOrderPattern.customer_id.in_(customer_ids), CustomerOrderPattern.count > 0)
+        .order_by(CustomerOrderPattern.customer_id)
+    ).all()
+
+def customer_patterns(customer_id):
+    """A customer's patterns as ``(pattern tuples, counts)``"""
+    rows = pattern_rows([customer_id])
+    return [tuple(row[1:-1]) for row in rows], [row[-1] for row in rows]
+
+def vendor_usage(customer_id):
+    """``{vendor_id: successful orders}`` for a customer"""
+    return dict(db.session.execute(
+        select(CustomerOrderPattern.vendor_id, func.sum(CustomerOrderPattern.count))
+        .where(CustomerOrderPattern.customer_id == customer_id)
+        .group_by(CustomerOrderPattern.vendor_id)
+    ).all())
+
+def pattern_query():
+    """Every customer's patterns, computed from order_history"""
+    columns = [getattr(OrderHistory, column) for column in PATTERN_COLUMNS]
+    return (
+        select(OrderHistory.customer_id, *columns, func.count().label('count'))
+        .where(OrderHistory.was_successful.is_(True))
+        .group_by(OrderHistory.customer_id, *columns)
+    )
+
+def backfill_order_patterns(customer_ids=None):
+    """Recompute the patterns of customers whose patterns do not add up to their history.
+
+    Catches history recorded before the pattern table existed. Limited to
+    ``customer_ids`` if given; returns the number of customers backfilled.
+    """
+    history = select(OrderHistory.customer_id, func.count()).where(OrderHistory.was_successful.is_(True))
+    patterns = select(CustomerOrderPattern.customer_id, func.sum(CustomerOrderPattern.count))
+    if customer_ids is not None:
+        history = history.where(OrderHistory.customer_id.in_(customer_ids))
+        patterns = patterns.where(CustomerOrderPattern.customer_id.in_(customer_ids))
+    history_counts = dict(db.session.execute(history.group_by(OrderHistory.customer_id)).all())
+    pattern_counts = dict(db.session.execute(patterns.group_by(CustomerOrderPattern.customer_id)).all())
+    stale = [
+        customer_id for customer_id, count in history_counts.items()
+        if pattern_counts.get(customer_id) != count
+    ]
+    if not stale:
+        return 0
+
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE customer_order_patterns IN SHARE ROW EXCLUSIVE MODE'))
+
+    table = CustomerOrderPattern.__table__
+    query = (
+        pattern_query()
+        .where(OrderHistory.customer_id.in_(stale))
+        .add_columns(literal(datetime.now(IST)).label('updated_at'))
+    )
+    db.session.execute(delete(table).where(table.c.customer_id.in_(stale)))
+    db.session.execute(insert(table).from_select(
+        ['customer_id', *PATTERN_COLUMNS, 'count', 'updated_at'], query
+    ))
+    db.session.commit()
+
+    logging.info(f"Backfilled order patterns for {len(stale)} customers")
+    return len(stale)
+
+def rebuild_order_patterns():
+    """Recompute every customer's patterns from order_history; returns the number of patterns"""
+    if db.engine.dialect.name == 'postgresql':
+        # Block concurrent pattern updates until the rebuilt patterns are committed
+        db.session.execute(text('LOCK TABLE customer_order_patterns IN SHARE ROW EXCLUSIVE MODE'))
+
+    table = CustomerOrderPattern.__table__
+    query = pattern_query().add_columns(literal(datetime.now(IST)).label('updated_at'))
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(
+        ['customer_id', *PATTERN_COLUMNS, 'count', 'updated_at'], query
+    ))
+    patterns = db.session.scalar(select(func.count()).select_from(table))
+    db.session.commit()
+
+    logging.info(f"Rebuilt {patterns} customer order patterns")
+    return patterns
+
+@app.cli.command('rebuild-order-patterns')
+def rebuild_order_patterns_command():
+    """Recompute the customer order patterns behind AI predictions from order_history"""
+    patterns = rebuild_order_patterns()
+    print(f"Rebuilt {patterns} customer order patterns")
@@ -0,0 +1,139 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import select, tuple_, union_all
+from sqlalchemy.orm import aliased, joinedload, load_only, selectinload
+
+from app import db
+from models import Order, OrderCounter, User, Vendor
+from order_counters import AMOUNT_COLUMNS, STATUS_COUNTER
+
+# Dashboard status buckets
+ACTIVE_STATUSES = ['accepted', 'dispatched', 'in_transit', 'out_for_delivery']
+COMPLETED_STATUSES = ['delivered', 'rejected']
+BUCKET_STATUSES = {
+    'pending': ['pending'],
+    'active': ACTIVE_STATUSES,
+    'completed': COMPLETED_STATUSES,
+}
+
+# Page sizes
+DASHBOARD_PAGE_SIZE = 25
+COMPLETED_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# Newest first; id breaks ties between orders created in the same instant
+ORDER_KEY = (Order.created_at.desc(), Order.id.desc())
+
+# Relationship loaders: each pulls only the contact columns the dashboards
+# and event payloads show, so rendering a list of orders never lazy loads
+# a user per row.
+def load_customer(entity=Order):
+    return joinedload(entity.customer).load_only(User.full_name, User.phone, User.address)
+
+def load_delivery_partner(entity=Order):
+    return joinedload(entity.delivery_partner).load_only(User.full_name, User.phone)
+
+def load_vendor(entity=Order):
+    return joinedload(entity.vendor).options(
+        load_only(User.full_name, User.phone),
+        selectinload(User.vendor_profile).load_only(Vendor.business_name)
+    )
+
+def encode_cursor(order):
+    """Opaque keyset cursor pointing just after ``order``"""
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` from a cursor, or None if it is malformed"""
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeError):
+        return None
+
+def newest_orders(vendor_id, statuses, limit, after=None):
+    """Select branches for a vendor's ``limit`` newest orders in each of ``statuses``.
+
+    Each branch is one ``ix_orders_vendor_status_created`` range read in key
+    order that stops after ``limit`` rows, so its cost depends on the page
+    size rather than on how many orders the vendor has ever had. ``after``
+    is a ``(created_at, id)`` pair from decode_cursor.
+    """
+    branches = []
+    for status in statuses:
+        query = select(Order).where(Order.vendor_id == vendor_id, Order.status == status)
+        if after is not None:
+            query = query.where(tuple_(Order.created_at, Order.id) < tuple_(*after))
+        branches.append(select(query.order_by(*ORDER_KEY).limit(limit).subquery()))
+    return branches
+
+def merged_orders(branches):
+    """Run newest_orders branches as one UNION ALL, newest first, with the dashboard loaders"""
+    merged = aliased(Order, union_all(*branches).subquery())
+    return db.session.scalars(
+        select(merged)
+        .options(load_customer(merged), load_delivery_partner(merged))
+        .order_by(merged.created_at.desc(), merged.id.desc())
+    ).all()
+
+def vendor_dashboard_orders(vendor_id, page_size=DASHBOARD_PAGE_SIZE, completed_size=COMPLETED_PAGE_SIZE):
+    """Load the first page of every dashboard bucket for a vendor.
+
+    One UNION ALL reads at most a page and one more row per status; the
+    bucket counts and amounts come from the vendor's order counters.
+    Returns ``(pages, stats)``: ``pages`` maps bucket -> list of orders
+    (newest first) and ``stats`` maps bucket -> ``{'count', 'amount',
+    'next_cursor'}``.
+    """
+    limits = {'pending': page_size, 'active': page_size, 'completed': completed_size}
+    branches = []
+    for name, statuses in BUCKET_STATUSES.items():
+        branches.extend(newest_orders(vendor_id, statuses, limits[name] + 1))
+
+    buckets = {status: name for name, statuses in BUCKET_STATUSES.items() for status in statuses}
+    pages = {name: [] for name in BUCKET_STATUSES}
+    for order in merged_orders(branches):
+        pages[buckets[order.status]].append(order)
+
+    counts = db.session.get(OrderCounter, (vendor_id, 'vendor'))
+    stats = {}
+    for name, statuses in BUCKET_STATUSES.items():
+        columns = {STATUS_COUNTER[status] for status in statuses}
+        stats[name] = {
+            'count': sum(getattr(counts, column) for column in columns) if counts else 0,
+            'amount': float(sum(getattr(counts, AMOUNT_COLUMNS[column]) for column in columns)) if counts else 0.0,
+            'next_cursor': None
+        }
+        orders = pages[name]
+        if len(orders) > limits[name]:
+            pages[name] = orders[:limits[name]]
+            stats[name]['next_cursor'] = encode_cursor(pages[name][-1])
+    return pages, stats
+
+def vendor_orders_page(vendor_id, bucket, after=None, limit=DASHBOARD_PAGE_SIZE):
+    """One keyset page of a vendor's orders in ``bucket``.
+
+    ``after`` is a ``(created_at, id)`` pair from decode_cursor. Returns
+    ``(orders, next_cursor)``; the cost does not depend on how deep the page is.
+    """
+    orders = merged_orders(newest_orders(vendor_id, BUCKET_STATUSES[bucket], limit + 1, after))
+    next_cursor = encode_cursor(orders[limit - 1]) if len(orders) > limit else None
+    return orders[:limit], next_cursor
+
+def customer_dashboard_orders(customer_id):
+    """All of a customer's orders, newest first, with their vendors loaded"""
+    return Order.query.options(load_vendor()).filter_by(customer_id=customer_id).order_by(*ORDER_KEY).all()
+
+def delivery_dashboard_orders(partner_id, completed_size=COMPLETED_PAGE_SIZE):
+    """A delivery partner's open orders and most recent deliveries"""
+    assigned = Order.query.options(load_customer(), load_vendor()).filter(
+        Order.delivery_partner_id == partner_id,
+        Order.status.in_(ACTIVE_STATUSES)
+    ).order_by(*ORDER_KEY).all()
+
+    completed = Order.query.options(load_customer(), load_vendor()).filter_by(
+        delivery_partner_id=partner_id, status='delivered'
+    ).order_by(*ORDER_KEY).limit(completed_size).all()
+    return assigned, completed
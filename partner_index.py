@@ -0,0 +1,160 @@
+import os
+import heapq
+import logging
+import itertools
+import threading
+from collections import Counter
+
+from sqlalchemy import and_, event, func, select
+
+from app import app, db, socketio
+from models import User, OrderCounter
+
+# How often each process re-reads partner loads from order_counters (0 disables)
+PARTNER_INDEX_REFRESH_INTERVAL = float(os.environ.get('PARTNER_INDEX_REFRESH_INTERVAL', 300))
+# Most active orders a delivery partner is given, on accept or by the dispatch planner
+PARTNER_CAPACITY = int(os.environ.get('PARTNER_CAPACITY', 10))
+
+class PartnerLoadIndex:
+    """Min-heap of active delivery partners keyed by their active order count.
+
+    ``acquire`` picks the least-loaded partner in O(log n) (amortized, with
+    lazy deletion of stale heap entries); partners with equal load are picked
+    in the order they were last charged. Loads follow committed order
+    transitions through the session hooks below and are periodically
+    reloaded from order_counters to pick up changes made by other processes.
+    """
+
+    def __init__(self, refresh_interval=PARTNER_INDEX_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._heap = []
+        self._entries = {}  # partner_id -> its current (load, seq, partner_id) heap entry
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._started = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _push(self, partner_id, load):
+        entry = (load, next(self._seq), partner_id)
+        self._entries[partner_id] = entry
+        heapq.heappush(self._heap, entry)
+
+        # Drop stale entries once they outnumber live ones
+        if len(self._heap) > 2 * len(self._entries) + 1024:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+
+    def rebuild(self, loads):
+        """Replace the index with ``{partner_id: active order count}``"""
+        entries = {partner_id: (load, next(self._seq), partner_id) for partner_id, load in loads.items()}
+        heap = list(entries.values())
+        heapq.heapify(heap)
+        with self._lock:
+            self._entries = entries
+            self._heap = heap
+            self._loaded = True
+
+    def refresh(self):
+        """Reload active partners and their loads from the database"""
+        rows = db.session.execute(
+            select(User.id, func.coalesce(OrderCounter.active, 0))
+            .outerjoin(OrderCounter, and_(OrderCounter.user_id == User.id, OrderCounter.role == 'delivery_partner'))
+            .where(User.role == 'delivery_partner', User.is_active.is_(True))
+        ).all()
+        self.rebuild({partner_id: load for partner_id, load in rows})
+        logging.info(f"Loaded {len(rows)} delivery partners into the assignment index")
+
+    def start(self):
+        """Load the index and start the periodic refresh (idempotent)"""
+        if not self._loaded:
+            self.refresh()
+        with self._lock:
+            if self._started or not self.refresh_interval:
+                return
+            self._started = True
+        socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.refresh_interval)
+            try:
+                with app.app_context():
+                    self.refresh()
+            except Exception as e:
+                logging.error(f"Error refreshing delivery partner index: {str(e)}")
+
+    def acquire(self, capacity=PARTNER_CAPACITY):
+        """Charge and return the least-loaded partner id, or None if every partner is at capacity"""
+        with self._lock:
+            while self._heap:
+                load, seq, partner_id = self._heap[0]
+                if self._entries.get(partner_id) != (load, seq, partner_id):
+                    heapq.heappop(self._heap)
+                    continue
+                if load >= capacity:
+                    return None
+                self._push(partner_id, load + 1)
+                return partner_id
+        return None
+
+    def adjust(self, partner_id, delta):
+        """Change a partner's load, ignoring partners not in the index"""
+        with self._lock:
+            entry = self._entries.get(partner_id)
+            if entry is not None and delta:
+                self._push(partner_id, max(entry[0] + delta, 0))
+
+    def add_partner(self, partner_id, load=0):
+        with self._lock:
+            if self._loaded and partner_id not in self._entries:
+                self._push(partner_id, load)
+
+    def remove_partner(self, partner_id):
+        with self._lock:
+            self._entries.pop(partner_id, None)
+
+    def loads(self):
+        """Snapshot of ``{partner_id: active order count}``"""
+        with self._lock:
+            return {partner_id: entry[0] for partner_id, entry in self._entries.items()}
+
+    def load_of(self, partner_id):
+        entry = self._entries.get(partner_id)
+        return entry[0] if entry else None
+
+# Global delivery partner index
+partner_index = PartnerLoadIndex()
+
+# Loads change only once the transaction that changed them commits: counter
+# deltas are staged on the session, partners picked by acquire() are refunded
+# if the transaction rolls back.
+def stage_load_deltas(deltas):
+    """Queue delivery partner active-order deltas from order_counters for the next commit"""
+    staged = db.session.info.setdefault('partner_load_deltas', Counter())
+    for (user_id, role), counts in deltas.items():
+        if role == 'delivery_partner' and counts.get('active'):
+            staged[user_id] += counts['active']
+
+def assign_partner(capacity=PARTNER_CAPACITY):
+    """Pick the least-loaded partner with room for an order being accepted in this transaction"""
+    partner_index.start()
+    partner_id = partner_index.acquire(capacity)
+    if partner_id is not None:
+        db.session.info.setdefault('partner_reservations', Counter())[partner_id] += 1
+    return partner_id
+
+@event.listens_for(db.session, 'after_commit')
+def apply_partner_loads(session):
+    staged = session.info.pop('partner_load_deltas', Counter())
+    staged.subtract(session.info.pop('partner_reservations', Counter()))
+    for partner_id, delta in staged.items():
+        partner_index.adjust(partner_id, delta)
+
+@event.listens_for(db.session, 'after_rollback')
+def refund_partner_loads(session):
+    session.info.pop('partner_load_deltas', None)
+    for partner_id, count in session.info.pop('partner_reservations', Counter()).items():
+        partner_index.adjust(partner_id, -count)
@@ -0,0 +1,120 @@
+import base64
+import logging
+import cv2
+import numpy as np
+
+# Try to import pyzbar, but make it optional
+try:
+    from pyzbar import pyzbar
+    PYZBAR_AVAILABLE = True
+except ImportError:
+    PYZBAR_AVAILABLE = False
+    logging.warning("pyzbar not available - QR scanning will use fallback method")
+
+# Every TrackIt QR payload starts with this prefix
+QR_PREFIX = 'TRACKIT_'
+
+NO_QR_ERROR = 'No valid QR code found'
+
+def create_clahe():
+    """Create the contrast enhancer used before QR detection"""
+    return cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+
+def decode_base64_image(image_data):
+    """Decode a base64 encoded frame into raw image bytes"""
+    return base64.b64decode(image_data)
+
+def decode_image_bytes(image_bytes):
+    """Decode encoded image bytes (JPEG/PNG) straight to a grayscale frame"""
+    image_array = np.frombuffer(image_bytes, dtype=np.uint8)
+    return cv2.imdecode(image_array, cv2.IMREAD_GRAYSCALE)
+
+def detect_qr(gray, clahe=None, qr_detector=None):
+    """Detect a TrackIt QR code in a grayscale frame.
+
+    ``clahe`` and ``qr_detector`` can be passed in so long-lived callers
+    (such as the decode engine workers) do not rebuild them per frame.
+    """
+    if clahe is None:
+        clahe = create_clahe()
+    if qr_detector is None:
+        qr_detector = cv2.QRCodeDetector()
+
+    # Enhance contrast for better QR detection
+    enhanced = clahe.apply(gray)
+
+    # Use ZBar to detect QR codes if available
+    if PYZBAR_AVAILABLE:
+        qr_codes = pyzbar.decode(enhanced)
+    else:
+        qr_codes = []
+
+    if qr_codes:
+        # Get the first QR code found
+        qr_code = qr_codes[0]
+        qr_data = qr_code.data.decode('utf-8')
+
+        # Validate QR format
+        if qr_data.startswith(QR_PREFIX):
+            logging.info(f"QR code detected: {qr_data}")
+            return {
+                'qr_detected': True,
+                'qr_data': qr_data,
+                'detection_method': 'OpenCV+ZBar',
+                'bbox': list(qr_code.rect)
+            }
+
+    # Use OpenCV's QR detector as backup if ZBar fails
+    data, vertices_array, binary_qrcode = qr_detector.detectAndDecode(enhanced)
+
+    if data and data.startswith(QR_PREFIX):
+        logging.info(f"QR code detected with OpenCV: {data}")
+        bbox = None
+        if vertices_array is not None:
+            bbox = list(cv2.boundingRect(vertices_array.reshape(-1, 2).astype(np.float32)))
+        return {
+            'qr_detected': True,
+            'qr_data': data,
+            'detection_method': 'OpenCV',
+            'bbox': bbox
+        }
+
+    return {'qr_detected': False, 'error': NO_QR_ERROR}
+
+def decode_frame(image_bytes, clahe=None, qr_detector=None, roi=None):
+    """Decode encoded image bytes and look for a TrackIt QR code.
+
+    ``roi`` is an optional ``(x, y, w, h)`` box in fractions of the image.
+    It is decoded first and the full frame is only decoded on a miss. The
+    returned ``bbox`` is in the same fractional coordinates.
+    """
+    gray = decode_image_bytes(image_bytes)
+    if gray is None:
+        return {'qr_detected': False, 'error': 'Invalid image data'}
+
+    height, width = gray.shape[:2]
+    result = None
+
+    if roi:
+        x0 = max(0, int(roi[0] * width))
+        y0 = max(0, int(roi[1] * height))
+        x1 = min(width, int((roi[0] + roi[2]) * width))
+        y1 = min(height, int((roi[1] + roi[3]) * height))
+        if x1 - x0 > 0 and y1 - y0 > 0:
+            result = detect_qr(gray[y0:y1, x0:x1], clahe, qr_detector)
+            if result['qr_detected']:
+                result['roi_hit'] = True
+                if result.get('bbox'):
+                    result['bbox'][0] += x0
+                    result['bbox'][1] += y0
+            else:
+                result = None
+
+    if result is None:
+        result = detect_qr(gray, clahe, qr_detector)
+
+    if result.get('bbox'):
+        x, y, w, h = result['bbox']
+        result['bbox'] = [x / width, y / height, w / width, h / height]
+    result['image_size'] = [width, height]
+    return result
@@ -0,0 +1,110 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from qr_decoder import create_clahe, decode_frame
+
+# Decode engine configuration
+QR_ENGINE_WORKERS = int(os.environ.get('QR_ENGINE_WORKERS', os.cpu_count() or 1))
+QR_ENGINE_QUEUE_SIZE = int(os.environ.get('QR_ENGINE_QUEUE_SIZE', QR_ENGINE_WORKERS * 4))
+QR_ENGINE_JOB_TIMEOUT = float(os.environ.get('QR_ENGINE_JOB_TIMEOUT', 2.0))
+QR_ENGINE_POLL_INTERVAL = 0.005
+
+# Per-process decoder state, created once by _init_worker
+_worker_clahe = None
+_worker_detector = None
+
+def _init_worker():
+    """Build long-lived CLAHE and QRCodeDetector instances in each worker"""
+    global _worker_clahe, _worker_detector
+    # One OpenCV thread per worker; parallelism comes from the pool itself
+    cv2.setNumThreads(1)
+    _worker_clahe = create_clahe()
+    _worker_detector = cv2.QRCodeDetector()
+
+def _decode_job(image_bytes, roi=None):
+    """Run a single decode inside a worker process"""
+    try:
+        return decode_frame(image_bytes, _worker_clahe, _worker_detector, roi)
+    except Exception as e:
+        logging.error(f"Error decoding frame in QR engine worker: {str(e)}")
+        return {'qr_detected': False, 'error': f'Processing error: {str(e)}'}
+
+class QRDecodeEngine:
+    """Process pool that decodes QR frames off the web worker.
+
+    Submissions are bounded by ``queue_size`` jobs (queued plus running);
+    when the engine is saturated ``submit`` returns None instead of queueing.
+    """
+
+    def __init__(self, workers=QR_ENGINE_WORKERS, queue_size=QR_ENGINE_QUEUE_SIZE,
+                 job_timeout=QR_ENGINE_JOB_TIMEOUT):
+        self.workers = max(1, workers)
+        self.queue_size = max(self.workers, queue_size)
+        self.job_timeout = job_timeout
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=_init_worker
+                    )
+                    logging.info(f"QR decode engine started with {self.workers} workers")
+        return self._executor
+
+    def submit(self, image_bytes, roi=None):
+        """Queue a frame for decoding, or return None if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._get_executor().submit(_decode_job, image_bytes, roi)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def decode(self, image_bytes, wait=time.sleep, roi=None):
+        """Decode a frame in the pool and return the detection result.
+
+        ``wait`` is called between polls of the job so a cooperative sleep
+        (e.g. ``socketio.sleep``) keeps the web worker serving other clients.
+        """
+        future = self.submit(image_bytes, roi)
+        if future is None:
+            return {'qr_detected': False, 'busy': True, 'error': 'Scanner busy, please retry'}
+
+        deadline = time.monotonic() + self.job_timeout
+        while not future.done():
+            if time.monotonic() >= deadline:
+                future.cancel()
+                logging.warning("QR decode job timed out")
+                return {'qr_detected': False, 'error': 'Image processing timed out'}
+            wait(QR_ENGINE_POLL_INTERVAL)
+
+        try:
+            return future.result()
+        except Exception as e:
+            logging.error(f"QR decode job failed: {str(e)}")
+            return {'qr_detected': False, 'error': 'Image processing failed'}
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# Global decode engine instance
+engine = QRDecodeEngine()
+atexit.register(engine.shutdown)
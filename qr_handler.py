@@ -1,50 +1,37 @@
 
-import qrcode
 import base64
-import uuid
 import hashlib
-import cv2
-import numpy as np
-from io import BytesIO
 from datetime import datetime
 import pytz
 import logging
-from PIL import Image
 
-# Try to import pyzbar, but make it optional
-try:
-    from pyzbar import pyzbar
-    PYZBAR_AVAILABLE = True
-except ImportError:
-    PYZBAR_AVAILABLE = False
-    logging.warning("pyzbar not available - QR scanning will use fallback method")
+from sqlalchemy import String, and_, case, cast, insert, literal, or_, select, update
+from sqlalchemy.orm import aliased
 
 from app import db
 from models import Order, QRScan
+from scan_audit import scan_audit
+from order_counters import record_transition, order_parties, transition_deltas, apply_counter_deltas
+from qr_images import qr_image_cache
+from qr_payloads import (
+    QR_SIGNED_PAYLOADS, SIGNED_PREFIX, package_payload, delivery_payload,
+    signed_payload, verify_signed_payload
+)
 
 # Indian Standard Time
 IST = pytz.timezone('Asia/Kolkata')
 
 def generate_package_qr(order_id):
-    """Generate QR code for package tracking by vendor"""
+    """Generate QR code for package tracking by vendor.
+
+    Only the payload is built here; images are rendered lazily on demand
+    through qr_images.
+    """
     try:
-        # Create unique, secure QR data
-        timestamp = datetime.now(IST).strftime("%Y%m%d%H%M%S")
-        unique_id = uuid.uuid4().hex[:8]
-        qr_data = f"TRACKIT_PACKAGE_{order_id}_{timestamp}_{unique_id}"
-        
-        # Generate QR code with high error correction for better scanning
-        qr = qrcode.QRCode(
-            version=2,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        img = qr.make_image(fill_color="black", back_color="white")
+        if QR_SIGNED_PAYLOADS:
+            qr_data = signed_payload('package', order_id)
+        else:
+            qr_data = package_payload(order_id)
         
         logging.info(f"Generated package QR code for order {order_id}: {qr_data}")
         return qr_data
@@ -56,23 +43,10 @@ def generate_package_qr(order_id):
 def generate_customer_delivery_qr(order_id, customer_id):
     """Generate final delivery QR code for customer after 3rd package scan"""
     try:
-        # Create unique customer delivery QR
-        timestamp = datetime.now(IST).strftime("%Y%m%d%H%M%S")
-        unique_id = uuid.uuid4().hex[:8]
-        qr_data = f"TRACKIT_CUSTOMER_DELIVERY_{order_id}_{customer_id}_{timestamp}_{unique_id}"
-        
-        # Generate QR code with highest error correction
-        qr = qrcode.QRCode(
-            version=2,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=12,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        img = qr.make_image(fill_color="darkblue", back_color="white")
+        if QR_SIGNED_PAYLOADS:
+            qr_data = signed_payload('delivery', order_id)
+        else:
+            qr_data = delivery_payload(order_id, customer_id)
         
         logging.info(f"Generated customer delivery QR code for order {order_id}: {qr_data}")
         return qr_data
@@ -81,81 +55,11 @@ def generate_customer_delivery_qr(order_id, customer_id):
         logging.error(f"Error generating customer delivery QR code: {str(e)}")
         return None
 
-def process_image_for_qr(image_data):
-    """Process image using OpenCV and ZBar for real QR detection"""
-    try:
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        image_array = np.frombuffer(image_bytes, dtype=np.uint8)
-        image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            return {'qr_detected': False, 'error': 'Invalid image data'}
-        
-        # Convert to grayscale for better QR detection
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply image preprocessing for better QR detection
-        # Enhance contrast
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(gray)
-        
-        # Use ZBar to detect QR codes if available
-        if PYZBAR_AVAILABLE:
-            qr_codes = pyzbar.decode(enhanced)
-        else:
-            qr_codes = []
-        
-        if qr_codes:
-            # Get the first QR code found
-            qr_code = qr_codes[0]
-            qr_data = qr_code.data.decode('utf-8')
-            
-            # Validate QR format
-            if qr_data.startswith('TRACKIT_'):
-                logging.info(f"QR code detected: {qr_data}")
-                return {
-                    'qr_detected': True, 
-                    'qr_data': qr_data,
-                    'detection_method': 'OpenCV+ZBar'
-                }
-        
-        # Try additional detection methods if ZBar fails
-        # Use OpenCV's QR detector as backup
-        qr_detector = cv2.QRCodeDetector()
-        data, vertices_array, binary_qrcode = qr_detector.detectAndDecode(enhanced)
-        
-        if data and data.startswith('TRACKIT_'):
-            logging.info(f"QR code detected with OpenCV: {data}")
-            return {
-                'qr_detected': True, 
-                'qr_data': data,
-                'detection_method': 'OpenCV'
-            }
-        
-        return {'qr_detected': False, 'error': 'No valid QR code found'}
-        
-    except Exception as e:
-        logging.error(f"Error processing image for QR: {str(e)}")
-        return {'qr_detected': False, 'error': f'Processing error: {str(e)}'}
-
-def get_qr_image_data(qr_data):
+def get_qr_image_data(qr_data, kind='package'):
     """Convert QR data to base64 image for display"""
     try:
-        qr = qrcode.QRCode(
-            version=2,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        _, png = qr_image_cache.get(qr_data, kind)
+        img_str = base64.b64encode(png).decode()
         
         return f"data:image/png;base64,{img_str}"
         
@@ -163,145 +67,272 @@ def get_qr_image_data(qr_data):
         logging.error(f"Error creating QR image: {str(e)}")
         return None
 
-def validate_qr_code(qr_data, scanned_by_user_id):
-    """Validate and process QR code scan with enhanced logic"""
+def parse_qr_code(qr_data):
+    """Work out which order and QR kind a payload refers to, without the DB.
+
+    Returns ``{'valid': True, 'kind': 'package' | 'delivery', 'order_id': ...}``
+    or ``{'valid': False, 'error': ...}``.
+    """
+    if not qr_data.startswith('TRACKIT_'):
+        return {'valid': False, 'error': 'Invalid QR code format.'}
+    
+    # Signed codes are checked in memory; forged or expired ones never reach the DB
+    if qr_data.startswith(SIGNED_PREFIX):
+        return verify_signed_payload(qr_data)
+    
+    parts = qr_data.split('_')
+    if len(parts) < 4:
+        return {'valid': False, 'error': 'Invalid QR code format.'}
+    
     try:
-        # Parse QR data
-        if not qr_data.startswith('TRACKIT_'):
-            return {'success': False, 'error': 'Invalid QR code format.'}
-        
-        parts = qr_data.split('_')
-        if len(parts) < 4:
-            return {'success': False, 'error': 'Invalid QR code format.'}
-        
         if parts[1] == 'PACKAGE':
             # Package QR: TRACKIT_PACKAGE_{order_id}_{timestamp}_{unique_id}
-            order_id = int(parts[2])
-            return process_package_qr_scan(qr_data, order_id, scanned_by_user_id)
-            
+            return {'valid': True, 'kind': 'package', 'order_id': int(parts[2])}
+        
         elif parts[1] == 'CUSTOMER' and parts[2] == 'DELIVERY':
             # Customer delivery QR: TRACKIT_CUSTOMER_DELIVERY_{order_id}_{customer_id}_{timestamp}_{unique_id}
-            order_id = int(parts[3])
-            return process_customer_delivery_qr_scan(qr_data, order_id, scanned_by_user_id)
-            
-        else:
-            return {'success': False, 'error': 'Unknown QR type.'}
+            return {'valid': True, 'kind': 'delivery', 'order_id': int(parts[3])}
+    except ValueError:
+        return {'valid': False, 'error': 'Invalid QR code format.'}
+    
+    return {'valid': False, 'error': 'Unknown QR type.'}
+
+# Rejections a retry of the same scan would get again. Only these, and
+# successes, may be replayed from the scan dedup cache
+DEFINITIVE_SCAN_ERRORS = frozenset({
+    'Invalid QR code format.',
+    'Unknown QR type.',
+    'Unknown QR signing key.',
+    'Invalid QR code signature.',
+    'QR code has expired.',
+    'Order not found.',
+    'Wrong package QR code.',
+    'Wrong customer delivery QR code.',
+    'Unauthorized scan.',
+    'Package QR already scanned maximum times.',
+    'Package is not in a scannable state.',
+    'Order not ready for final delivery.',
+})
+
+def is_definitive(result):
+    """Whether a scan result can be replayed to retries instead of scanning again"""
+    return result['success'] or result.get('error') in DEFINITIVE_SCAN_ERRORS
+
+def validate_qr_code(qr_data, scanned_by_user_id):
+    """Validate and process QR code scan with enhanced logic"""
+    try:
+        parsed = parse_qr_code(qr_data)
+        if not parsed['valid']:
+            return {'success': False, 'error': parsed['error']}
+        
+        if parsed['kind'] == 'package':
+            return process_package_qr_scan(qr_data, parsed['order_id'], scanned_by_user_id)
+        return process_customer_delivery_qr_scan(qr_data, parsed['order_id'], scanned_by_user_id)
             
     except Exception as e:
         logging.error(f"Error validating QR code: {str(e)}")
         return {'success': False, 'error': 'Error processing QR code.'}
 
+# Package scan transitions: scan count before the scan -> (status before, status after, timestamp column)
+PACKAGE_TRANSITIONS = {
+    0: ('accepted', 'dispatched', 'dispatched_at'),
+    1: ('dispatched', 'in_transit', 'in_transit_at'),
+    2: ('in_transit', 'out_for_delivery', 'out_for_delivery_at'),
+}
+
+PACKAGE_STATUS_MESSAGES = {
+    'dispatched': 'Package dispatched from vendor.',
+    'in_transit': 'Package is now in transit.',
+    'out_for_delivery': 'Package is out for delivery. Customer QR generated for final confirmation.',
+}
+
+def transition_order(order_id, conditions, values, scan_record, from_status=None):
+    """Compare-and-set an order and record the scan in one round trip.
+
+    Runs ``UPDATE orders SET values WHERE id = order_id AND conditions
+    RETURNING *`` and inserts ``scan_record`` (QRScan column values) only if
+    a row matched. On PostgreSQL both happen in a single statement through a
+    data-modifying CTE; in write-behind mode the scan goes to scan_audit
+    instead. ``from_status``, when given, moves the order counters in the
+    same transaction. Returns the updated Order, or None if the expected
+    state did not match (another scan won the race, wrong code, etc.).
+    """
+    update_stmt = update(Order).where(Order.id == order_id, *conditions).values(**values)
+    
+    if scan_audit.enabled:
+        # Write-behind: the commit only touches orders, the audit row is buffered
+        order = db.session.execute(
+            update_stmt.returning(Order),
+            execution_options={'populate_existing': True}
+        ).scalar_one_or_none()
+        if order is not None and from_status:
+            record_transition(order, from_status)
+        db.session.commit()
+        if order is not None:
+            scan_audit.record(dict(scan_record, order_id=order.id))
+        return order
+    
+    if db.engine.dialect.name != 'postgresql':
+        # No DML in CTEs: conditional UPDATE ... RETURNING, then the insert, one commit
+        order = db.session.execute(
+            update_stmt.returning(Order),
+            execution_options={'populate_existing': True}
+        ).scalar_one_or_none()
+        if order is not None:
+            db.session.add(QRScan(order_id=order.id, **scan_record))
+            if from_status:
+                record_transition(order, from_status)
+        db.session.commit()
+        return order
+    
+    updated = update_stmt.returning(*Order.__table__.c).cte('updated_order')
+    scan_columns = ['order_id'] + list(scan_record)
+    scan_values = [updated.c.id] + [
+        cast(literal(value), QRScan.__table__.c[column].type)
+        for column, value in scan_record.items()
+    ]
+    inserted = insert(QRScan).from_select(scan_columns, select(*scan_values)).cte('inserted_scan')
+    
+    order = db.session.execute(
+        select(aliased(Order, updated)).add_cte(inserted),
+        execution_options={'populate_existing': True}
+    ).scalar_one_or_none()
+    if order is not None and from_status:
+        record_transition(order, from_status)
+    db.session.commit()
+    return order
+
+def package_scan_failure(qr_data, order_id, scanned_by_user_id):
+    """Explain why a package scan's conditional update matched no row"""
+    order = db.session.get(Order, order_id)
+    if not order:
+        return {'success': False, 'error': 'Order not found.'}
+    
+    # Verify this is the correct package QR for the order
+    if order.package_qr_code != qr_data:
+        return {'success': False, 'error': 'Wrong package QR code.'}
+    
+    # Verify scanner is the assigned delivery partner
+    if order.delivery_partner_id != scanned_by_user_id:
+        return {'success': False, 'error': 'Unauthorized scan.'}
+    
+    if order.qr_scan_count >= len(PACKAGE_TRANSITIONS):
+        return {'success': False, 'error': 'Package QR already scanned maximum times.'}
+    
+    return {'success': False, 'error': 'Package is not in a scannable state.'}
+
 def process_package_qr_scan(qr_data, order_id, scanned_by_user_id):
-    """Process package QR code scan by delivery partner"""
+    """Process package QR code scan by delivery partner.
+
+    The next status is chosen in SQL from the current scan count, so two
+    concurrent scans of the same package cannot both apply the same step.
+    """
     try:
-        # Get order
-        order = Order.query.get(order_id)
-        if not order:
-            return {'success': False, 'error': 'Order not found.'}
-        
-        # Verify this is the correct package QR for the order
-        if order.package_qr_code != qr_data:
-            return {'success': False, 'error': 'Wrong package QR code.'}
+        now = datetime.now(IST)
         
-        # Verify scanner is the assigned delivery partner
-        if order.delivery_partner_id != scanned_by_user_id:
-            return {'success': False, 'error': 'Unauthorized scan.'}
-        
-        # Update order status based on scan count
-        current_scan_count = order.qr_scan_count
-        delivery_qr_generated = False
-        
-        if current_scan_count == 0:
-            # First scan - Dispatched
-            order.status = 'dispatched'
-            order.dispatched_at = datetime.now(IST)
-            status_message = 'Package dispatched from vendor.'
-            
-        elif current_scan_count == 1:
-            # Second scan - In Transit
-            order.status = 'in_transit'
-            order.in_transit_at = datetime.now(IST)
-            status_message = 'Package is now in transit.'
-            
-        elif current_scan_count == 2:
-            # Third scan - Out for Delivery & Generate Customer Delivery QR
-            order.status = 'out_for_delivery'
-            order.out_for_delivery_at = datetime.now(IST)
-            
-            # Generate customer-specific delivery QR code
-            customer_delivery_qr = generate_customer_delivery_qr(order.id, order.customer_id)
-            order.delivery_qr_code = customer_delivery_qr
-            delivery_qr_generated = True
-            
-            status_message = 'Package is out for delivery. Customer QR generated for final confirmation.'
-            
+        # Customer delivery QR for the third scan, built in SQL so no read is needed
+        if QR_SIGNED_PAYLOADS:
+            customer_delivery_qr = literal(signed_payload('delivery', order_id))
         else:
-            return {'success': False, 'error': 'Package QR already scanned maximum times.'}
-        
-        # Increment scan count
-        order.qr_scan_count += 1
-        
-        # Record the scan
-        scan_record = QRScan(
-            order_id=order.id,
-            scanned_by=scanned_by_user_id,
-            scan_type='package',
-            scan_data=qr_data
-        )
-        
-        db.session.add(scan_record)
-        db.session.commit()
+            _, timestamp, unique_id = delivery_payload(order_id, 0).rsplit('_', 2)
+            customer_delivery_qr = (
+                literal(f"TRACKIT_CUSTOMER_DELIVERY_{order_id}_")
+                + cast(Order.customer_id, String)
+                + literal(f"_{timestamp}_{unique_id}")
+            )
+        
+        values = {
+            'status': case(
+                {
+                    count: literal(after, Order.status.type)
+                    for count, (_, after, _) in PACKAGE_TRANSITIONS.items()
+                },
+                value=Order.qr_scan_count,
+                else_=Order.status
+            ),
+            'qr_scan_count': Order.qr_scan_count + 1,
+            'delivery_qr_code': case(
+                (Order.qr_scan_count == 2, customer_delivery_qr),
+                else_=Order.delivery_qr_code
+            ),
+        }
+        for count, (_, _, timestamp_column) in PACKAGE_TRANSITIONS.items():
+            values[timestamp_column] = case(
+                (Order.qr_scan_count == count, literal(now)),
+                else_=getattr(Order, timestamp_column)
+            )
+        
+        conditions = [
+            Order.package_qr_code == qr_data,
+            Order.delivery_partner_id == scanned_by_user_id,
+            or_(*[
+                and_(Order.qr_scan_count == count, Order.status == before)
+                for count, (before, _, _) in PACKAGE_TRANSITIONS.items()
+            ]),
+        ]
+        
+        order = transition_order(order_id, conditions, values, {
+            'scanned_by': scanned_by_user_id,
+            'scan_type': 'package',
+            'scan_data': qr_data,
+            'scanned_at': now
+        })
+        if order is None:
+            return package_scan_failure(qr_data, order_id, scanned_by_user_id)
         
         logging.info(f"Package QR scanned for order {order.id}, new status: {order.status}")
         
         return {
             'success': True,
-            'message': status_message,
+            'message': PACKAGE_STATUS_MESSAGES[order.status],
             'order': order,
             'new_status': order.status,
             'scan_count': order.qr_scan_count,
-            'delivery_qr_generated': delivery_qr_generated,
+            'delivery_qr_generated': order.status == 'out_for_delivery',
             'scan_type': 'package'
         }
         
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error processing package QR scan: {str(e)}")
         return {'success': False, 'error': 'Error processing scan.'}
 
+def delivery_scan_failure(qr_data, order_id, scanned_by_user_id):
+    """Explain why a customer delivery scan's conditional update matched no row"""
+    order = db.session.get(Order, order_id)
+    if not order:
+        return {'success': False, 'error': 'Order not found.'}
+    
+    # Verify this is the correct customer delivery QR for the order
+    if order.delivery_qr_code != qr_data:
+        return {'success': False, 'error': 'Wrong customer delivery QR code.'}
+    
+    # Verify scanner is the assigned delivery partner
+    if order.delivery_partner_id != scanned_by_user_id:
+        return {'success': False, 'error': 'Unauthorized scan.'}
+    
+    return {'success': False, 'error': 'Order not ready for final delivery.'}
+
 def process_customer_delivery_qr_scan(qr_data, order_id, scanned_by_user_id):
     """Process customer delivery QR code scan for final confirmation"""
     try:
-        # Get order
-        order = Order.query.get(order_id)
-        if not order:
-            return {'success': False, 'error': 'Order not found.'}
-        
-        # Verify this is the correct customer delivery QR for the order
-        if order.delivery_qr_code != qr_data:
-            return {'success': False, 'error': 'Wrong customer delivery QR code.'}
-        
-        # Verify scanner is the assigned delivery partner
-        if order.delivery_partner_id != scanned_by_user_id:
-            return {'success': False, 'error': 'Unauthorized scan.'}
-        
-        # Verify order is in correct status
-        if order.status != 'out_for_delivery':
-            return {'success': False, 'error': 'Order not ready for final delivery.'}
-        
-        # Update order to delivered
-        order.status = 'delivered'
-        order.delivered_at = datetime.now(IST)
-        
-        # Record the scan
-        scan_record = QRScan(
-            order_id=order.id,
-            scanned_by=scanned_by_user_id,
-            scan_type='customer_delivery',
-            scan_data=qr_data
-        )
-        
-        db.session.add(scan_record)
-        db.session.commit()
+        now = datetime.now(IST)
+        
+        order = transition_order(order_id, [
+            Order.delivery_qr_code == qr_data,
+            Order.delivery_partner_id == scanned_by_user_id,
+            Order.status == 'out_for_delivery',
+        ], {
+            'status': 'delivered',
+            'delivered_at': now,
+        }, {
+            'scanned_by': scanned_by_user_id,
+            'scan_type': 'delivery',
+            'scan_data': qr_data,
+            'scanned_at': now
+        }, from_status='out_for_delivery')
+        if order is None:
+            return delivery_scan_failure(qr_data, order_id, scanned_by_user_id)
         
         # Update order history for AI learning
         from ai_predictions import update_order_history
@@ -318,5 +349,141 @@ def process_customer_delivery_qr_scan(qr_data, order_id, scanned_by_user_id):
         }
         
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error processing customer delivery QR scan: {str(e)}")
         return {'success': False, 'error': 'Error processing delivery scan.'}
+
+def process_batch_qr_scan(qr_data_list, scanned_by_user_id):
+    """Apply many package/delivery scans in one transaction.
+
+    All referenced orders are loaded (and row-locked) in one query, the
+    transitions are applied in memory, the QRScan rows are bulk inserted and
+    everything is committed once. Returns ``(results, orders)``: one result
+    dict per payload, in order, and the updated orders keyed by id.
+    """
+    parsed = [parse_qr_code(qr_data) for qr_data in qr_data_list]
+    order_ids = {item['order_id'] for item in parsed if item['valid']}
+    
+    orders = {}
+    if order_ids:
+        orders = {
+            order.id: order
+            for order in Order.query.filter(Order.id.in_(order_ids)).with_for_update().all()
+        }
+    
+    now = datetime.now(IST)
+    results = []
+    scan_rows = []
+    delivered = []
+    counter_deltas = {}
+    seen = set()
+    
+    for qr_data, item in zip(qr_data_list, parsed):
+        if not item['valid']:
+            results.append({'qr_data': qr_data, 'success': False, 'error': item['error']})
+            continue
+        
+        # The same label scanned twice in one batch is a double read, not two steps
+        if qr_data in seen:
+            results.append({'qr_data': qr_data, 'success': False, 'error': 'Duplicate scan in batch.'})
+            continue
+        seen.add(qr_data)
+        
+        order = orders.get(item['order_id'])
+        if order is None:
+            results.append({'qr_data': qr_data, 'success': False, 'error': 'Order not found.'})
+            continue
+        
+        if item['kind'] == 'package':
+            if order.package_qr_code != qr_data:
+                error = 'Wrong package QR code.'
+            elif order.delivery_partner_id != scanned_by_user_id:
+                error = 'Unauthorized scan.'
+            elif order.qr_scan_count not in PACKAGE_TRANSITIONS:
+                error = 'Package QR already scanned maximum times.'
+            elif order.status != PACKAGE_TRANSITIONS[order.qr_scan_count][0]:
+                error = 'Package is not in a scannable state.'
+            else:
+                error = None
+            
+            if error:
+                results.append({'qr_data': qr_data, 'success': False, 'error': error})
+                continue
+            
+            _, new_status, timestamp_column = PACKAGE_TRANSITIONS[order.qr_scan_count]
+            order.status = new_status
+            setattr(order, timestamp_column, now)
+            if new_status == 'out_for_delivery':
+                order.delivery_qr_code = generate_customer_delivery_qr(order.id, order.customer_id)
+            order.qr_scan_count += 1
+            
+            scan_type = 'package'
+            result = {
+                'message': PACKAGE_STATUS_MESSAGES[new_status],
+                'scan_count': order.qr_scan_count,
+                'delivery_qr_generated': new_status == 'out_for_delivery',
+                'scan_type': 'package'
+            }
+        else:
+            if order.delivery_qr_code != qr_data:
+                error = 'Wrong customer delivery QR code.'
+            elif order.delivery_partner_id != scanned_by_user_id:
+                error = 'Unauthorized scan.'
+            elif order.status != 'out_for_delivery':
+                error = 'Order not ready for final delivery.'
+            else:
+                error = None
+            
+            if error:
+                results.append({'qr_data': qr_data, 'success': False, 'error': error})
+                continue
+            
+            order.status = 'delivered'
+            order.delivered_at = now
+            delivered.append(order)
+            transition_deltas(order_parties(order), 'out_for_delivery', order_parties(order), 'delivered',
+                              counter_deltas, amount=order.estimated_amount)
+            
+            scan_type = 'delivery'
+            result = {
+                'message': 'Package delivered successfully to customer!',
+                'scan_type': 'customer_delivery'
+            }
+        
+        scan_rows.append({
+            'order_id': order.id,
+            'scanned_by': scanned_by_user_id,
+            'scan_type': scan_type,
+            'scan_data': qr_data,
+            'scanned_at': now
+        })
+        result.update({'qr_data': qr_data, 'success': True, 'order_id': order.id, 'new_status': order.status})
+        results.append(result)
+    
+    try:
+        if scan_rows and not scan_audit.enabled:
+            db.session.execute(insert(QRScan), scan_rows)
+        apply_counter_deltas(counter_deltas)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error committing batch QR scan: {str(e)}")
+        return [
+            {'qr_data': qr_data, 'success': False, 'error': 'Error processing scan.'}
+            for qr_data in qr_data_list
+        ], {}
+    
+    if scan_audit.enabled:
+        for row in scan_rows:
+            scan_audit.record(row)
+    
+    # Update order history for AI learning
+    if delivered:
+        from ai_predictions import update_order_history
+        for order in delivered:
+            update_order_history(order)
+    
+    logging.info(f"Batch QR scan: {len(scan_rows)} of {len(qr_data_list)} applied")
+    
+    updated_ids = {result['order_id'] for result in results if result['success']}
+    return results, {order_id: orders[order_id] for order_id in updated_ids}
@@ -0,0 +1,123 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+import qrcode
+
+# QR image cache configuration
+QR_IMAGE_CACHE_SIZE = int(os.environ.get('QR_IMAGE_CACHE_SIZE', 2048))
+QR_IMAGE_CACHE_DIR = os.environ.get(
+    'QR_IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'trackit_qr_images')
+)
+
+# Bump when rendering settings change so old cached PNGs are not reused
+QR_RENDER_VERSION = 1
+
+# Rendering styles for each QR kind, matching the original generators
+QR_STYLES = {
+    'package': {'box_size': 10, 'fill_color': 'black'},
+    'delivery': {'box_size': 12, 'fill_color': 'darkblue'},
+}
+
+def render_qr_png(qr_data, kind='package'):
+    """Rasterize QR data to PNG bytes"""
+    style = QR_STYLES[kind]
+    qr = qrcode.QRCode(
+        version=2,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=style['box_size'],
+        border=4,
+    )
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color=style['fill_color'], back_color='white')
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def qr_image_key(qr_data, kind='package'):
+    """Content address of a rendered QR image; also used as its strong ETag"""
+    return hashlib.sha256(f"{QR_RENDER_VERSION}:{kind}:{qr_data}".encode('utf-8')).hexdigest()
+
+class QRImageCache:
+    """In-memory LRU in front of an on-disk content-addressed store of QR PNGs"""
+
+    def __init__(self, max_entries=QR_IMAGE_CACHE_SIZE, directory=QR_IMAGE_CACHE_DIR):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, png):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial PNG
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not persist QR image {key}: {str(e)}")
+
+    def lookup(self, qr_data, kind='package'):
+        """Return cached PNG bytes from memory or disk, or None without rendering"""
+        key = qr_image_key(qr_data, kind)
+
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return png
+
+        png = self._read_disk(key)
+        if png is not None:
+            self.disk_hits += 1
+            self._remember(key, png)
+        return png
+
+    def store(self, qr_data, kind, png):
+        """Add a PNG rendered elsewhere (e.g. in a worker process) to the cache"""
+        key = qr_image_key(qr_data, kind)
+        self._write_disk(key, png)
+        self._remember(key, png)
+        return key
+
+    def get(self, qr_data, kind='package'):
+        """Return ``(key, png_bytes)`` for QR data, rendering it at most once"""
+        png = self.lookup(qr_data, kind)
+        if png is not None:
+            return qr_image_key(qr_data, kind), png
+
+        png = render_qr_png(qr_data, kind)
+        self.renders += 1
+        return self.store(qr_data, kind, png), png
+
+# Global QR image cache
+qr_image_cache = QRImageCache()
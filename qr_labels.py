@@ -0,0 +1,128 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+from qr_images import qr_image_cache, render_qr_png
+
+# Label sheet layout (pixels at LABEL_DPI)
+LABEL_DPI = 150
+LABEL_COLUMNS = 3
+LABEL_ROWS_PER_PAGE = 4
+LABEL_WIDTH = 400
+LABEL_HEIGHT = 440
+LABEL_QR_SIZE = 340
+LABEL_MARGIN = 40
+
+# Most orders one label sheet may hold
+LABEL_SHEET_MAX_ORDERS = int(os.environ.get('LABEL_SHEET_MAX_ORDERS', 240))
+
+# Sheets are rendered and composed in a process pool, off the web worker
+LABEL_POOL_WORKERS = int(os.environ.get('LABEL_POOL_WORKERS', os.cpu_count() or 1))
+LABEL_POLL_INTERVAL = 0.02
+
+# Long-lived render pool, started by the first sheet
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=max(1, LABEL_POOL_WORKERS))
+                logging.info(f"QR label pool started with {LABEL_POOL_WORKERS} workers")
+    return _pool
+
+def shutdown():
+    """Stop the label render processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+atexit.register(shutdown)
+
+def package_qr_images(labels):
+    """Return package QR PNGs for ``(order_id, qr_data)`` labels, using the image cache"""
+    pngs = {}
+    missing = []
+    for _, qr_data in labels:
+        png = qr_image_cache.lookup(qr_data)
+        if png is None:
+            missing.append(qr_data)
+        else:
+            pngs[qr_data] = png
+
+    if missing:
+        logging.info(f"Rendering {len(missing)} package QR labels")
+        for qr_data in missing:
+            png = render_qr_png(qr_data)
+            qr_image_cache.store(qr_data, 'package', png)
+            pngs[qr_data] = png
+
+    return [pngs[qr_data] for _, qr_data in labels]
+
+def _draw_label(page, column, row, order_id, png, font):
+    x = LABEL_MARGIN + column * LABEL_WIDTH
+    y = LABEL_MARGIN + row * LABEL_HEIGHT
+
+    qr_img = Image.open(BytesIO(png)).convert('L').resize((LABEL_QR_SIZE, LABEL_QR_SIZE), Image.NEAREST)
+    page.paste(qr_img, (x + (LABEL_WIDTH - LABEL_QR_SIZE) // 2, y))
+
+    draw = ImageDraw.Draw(page)
+    draw.rectangle([x, y, x + LABEL_WIDTH - 1, y + LABEL_HEIGHT - 1], outline=200)
+    draw.text((x + LABEL_WIDTH // 2, y + LABEL_QR_SIZE + 30), f"Order #TK{order_id}",
+              fill=0, font=font, anchor='mm')
+
+def render_label_sheets(labels):
+    """Tile ``(order_id, qr_data)`` labels onto pages; returns a list of PIL images"""
+    pngs = package_qr_images(labels)
+    font = ImageFont.load_default()
+
+    page_size = (LABEL_COLUMNS * LABEL_WIDTH + 2 * LABEL_MARGIN,
+                 LABEL_ROWS_PER_PAGE * LABEL_HEIGHT + 2 * LABEL_MARGIN)
+    per_page = LABEL_COLUMNS * LABEL_ROWS_PER_PAGE
+
+    pages = []
+    for index, ((order_id, _), png) in enumerate(zip(labels, pngs)):
+        slot = index % per_page
+        if slot == 0:
+            pages.append(Image.new('L', page_size, 255))
+        _draw_label(pages[-1], slot % LABEL_COLUMNS, slot // LABEL_COLUMNS, order_id, png, font)
+    return pages
+
+def render_label_sheet(labels, fmt='pdf'):
+    """Render labels as one multi-page PDF, or one tall PNG with the pages stacked"""
+    pages = render_label_sheets(labels)
+    if not pages:
+        return None
+
+    buffer = BytesIO()
+    if fmt == 'pdf':
+        pages[0].save(buffer, format='PDF', save_all=True, append_images=pages[1:],
+                      resolution=LABEL_DPI)
+    else:
+        width, height = pages[0].size
+        sheet = Image.new('L', (width, height * len(pages)), 255)
+        for number, page in enumerate(pages):
+            sheet.paste(page, (0, number * height))
+        sheet.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+def render_label_sheet_in_pool(labels, fmt='pdf', wait=time.sleep):
+    """Render a label sheet in the pool; the QR images are rendered there too.
+
+    ``wait`` is called between polls of the job so a cooperative sleep
+    (e.g. ``socketio.sleep``) keeps the web worker serving other clients.
+    """
+    future = _get_pool().submit(render_label_sheet, [tuple(label) for label in labels], fmt)
+    while not future.done():
+        wait(LABEL_POLL_INTERVAL)
+    return future.result()
@@ -0,0 +1,111 @@
+import os
+import hmac
+import time
+import uuid
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+import pytz
+
+# Indian Standard Time
+IST = pytz.timezone('Asia/Kolkata')
+
+def _issue_fields(timestamp=None, unique_id=None):
+    if timestamp is None:
+        timestamp = datetime.now(IST).strftime("%Y%m%d%H%M%S")
+    if unique_id is None:
+        unique_id = uuid.uuid4().hex[:8]
+    return timestamp, unique_id
+
+def package_payload(order_id, timestamp=None, unique_id=None):
+    """Build the package QR payload: TRACKIT_PACKAGE_{order_id}_{timestamp}_{unique_id}"""
+    timestamp, unique_id = _issue_fields(timestamp, unique_id)
+    return f"TRACKIT_PACKAGE_{order_id}_{timestamp}_{unique_id}"
+
+def delivery_payload(order_id, customer_id, timestamp=None, unique_id=None):
+    """Build the customer delivery QR payload:
+    TRACKIT_CUSTOMER_DELIVERY_{order_id}_{customer_id}_{timestamp}_{unique_id}"""
+    timestamp, unique_id = _issue_fields(timestamp, unique_id)
+    return f"TRACKIT_CUSTOMER_DELIVERY_{order_id}_{customer_id}_{timestamp}_{unique_id}"
+
+# Signed payloads: TRACKIT_S_{kind}_{order_id}_{issued_at}_{key_id}_{signature}
+# kind is P (package) or D (customer delivery), issued_at is unix seconds and
+# signature is a truncated HMAC-SHA256, so a scan can be verified without the DB.
+SIGNED_PREFIX = 'TRACKIT_S_'
+SIGNED_KINDS = {'P': 'package', 'D': 'delivery'}
+SIGNATURE_LENGTH = 20  # hex characters (80 bits)
+
+QR_SIGNED_PAYLOADS = os.environ.get('QR_SIGNED_PAYLOADS', '1') == '1'
+
+# Maximum age in seconds before a signed code is rejected as expired
+QR_PAYLOAD_MAX_AGE = {
+    'package': int(os.environ.get('QR_PACKAGE_MAX_AGE', 30 * 24 * 3600)),
+    'delivery': int(os.environ.get('QR_DELIVERY_MAX_AGE', 7 * 24 * 3600)),
+}
+
+# Seconds a code's issue time may run ahead of this server's clock
+QR_CLOCK_SKEW = int(os.environ.get('QR_CLOCK_SKEW', 60))
+
+def load_signing_keys():
+    """Read the signing keyring from QR_SIGNING_KEYS ("kid:secret,kid:secret").
+
+    The first key signs new codes; every key is accepted when verifying, so a
+    rotated-out key keeps validating codes already printed with it. The
+    default key ``k0``, derived from SESSION_SECRET, signs when the variable
+    is unset and stays in the keyring for verifying otherwise, so codes
+    printed before rotation was configured keep working. Listing ``k0`` in
+    the variable replaces it.
+    """
+    keys = OrderedDict()
+    for entry in os.environ.get('QR_SIGNING_KEYS', '').split(','):
+        key_id, _, secret = entry.strip().partition(':')
+        if key_id.isalnum() and secret:
+            keys[key_id] = secret.encode('utf-8')
+
+    if 'k0' not in keys:
+        secret = os.environ.get('SESSION_SECRET', 'dev-secret-key')
+        keys['k0'] = hashlib.sha256(f"trackit-qr:{secret}".encode('utf-8')).digest()
+    return keys
+
+SIGNING_KEYS = load_signing_keys()
+
+def _signature(key, kind_code, order_id, issued_at):
+    message = f"{kind_code}:{order_id}:{issued_at}".encode('utf-8')
+    return hmac.new(key, message, hashlib.sha256).hexdigest()[:SIGNATURE_LENGTH]
+
+def signed_payload(kind, order_id, issued_at=None, key_id=None):
+    """Build a signed payload for ``kind`` ('package' or 'delivery')"""
+    kind_code = 'P' if kind == 'package' else 'D'
+    if issued_at is None:
+        issued_at = int(time.time())
+    if key_id is None:
+        key_id = next(iter(SIGNING_KEYS))
+    signature = _signature(SIGNING_KEYS[key_id], kind_code, order_id, issued_at)
+    return f"{SIGNED_PREFIX}{kind_code}_{order_id}_{issued_at}_{key_id}_{signature}"
+
+def verify_signed_payload(qr_data, now=None):
+    """Check a signed payload without touching the database.
+
+    Returns ``{'valid': True, 'kind': ..., 'order_id': ..., 'issued_at': ...}``
+    or ``{'valid': False, 'error': ...}``.
+    """
+    parts = qr_data[len(SIGNED_PREFIX):].split('_')
+    if len(parts) != 5 or parts[0] not in SIGNED_KINDS or not parts[1].isdigit() or not parts[2].isdigit():
+        return {'valid': False, 'error': 'Invalid QR code format.'}
+
+    kind_code, order_id, issued_at, key_id, signature = parts
+    key = SIGNING_KEYS.get(key_id)
+    if key is None:
+        return {'valid': False, 'error': 'Unknown QR signing key.'}
+
+    if not hmac.compare_digest(signature, _signature(key, kind_code, order_id, issued_at)):
+        return {'valid': False, 'error': 'Invalid QR code signature.'}
+
+    kind = SIGNED_KINDS[kind_code]
+    age = (now if now is not None else time.time()) - int(issued_at)
+    if age < -QR_CLOCK_SKEW:
+        return {'valid': False, 'error': 'QR code issued in the future.'}
+    if age > QR_PAYLOAD_MAX_AGE[kind]:
+        return {'valid': False, 'error': 'QR code has expired.'}
+
+    return {'valid': True, 'kind': kind, 'order_id': int(order_id), 'issued_at': int(issued_at)}
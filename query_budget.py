@@ -0,0 +1,42 @@
+import os
+import logging
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+
+# Development check: fail any request that issues more than this many SQL
+# statements (0 disables the check). Catches N+1 relationship loads early.
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 0))
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+def query_budget(limit):
+    """Give one view its own statement budget (None exempts it); apply below ``@app.route``"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.setdefault('sql_statements', []).append(statement)
+
+def check_query_budget(response):
+    statements = g.get('sql_statements', [])
+    view = app.view_functions.get(request.endpoint)
+    limit = getattr(view, 'query_budget', QUERY_BUDGET)
+    if limit is not None and len(statements) > limit:
+        for statement in statements:
+            logging.debug(f"SQL: {statement}")
+        raise QueryBudgetExceeded(
+            f"{request.method} {request.path} issued {len(statements)} SQL statements, budget is {limit}"
+        )
+    return response
+
+if QUERY_BUDGET:
+    event.listen(Engine, 'before_cursor_execute', count_query)
+    app.after_request(check_query_budget)
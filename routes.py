@@ -1,18 +1,36 @@
 
-from flask import render_template, request, redirect, url_for, flash, jsonify
+from flask import render_template, request, redirect, url_for, flash, jsonify, make_response, abort, send_file, get_template_attribute
 from flask_login import login_user, logout_user, login_required, current_user
 from flask_socketio import emit, join_room, leave_room
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from io import BytesIO
 import pytz
-import random
 import logging
+import math
 
 from app import app, db, socketio
-from models import User, Vendor, Order, QRScan, OrderHistory
-from qr_handler import generate_package_qr, generate_customer_delivery_qr, validate_qr_code, process_image_for_qr
+from models import AI_PREDICTION_MIN_ORDERS, User, Vendor, Order, QRScan, OrderHistory
+from order_queries import (
+    vendor_dashboard_orders, vendor_orders_page, customer_dashboard_orders, delivery_dashboard_orders,
+    decode_cursor, load_customer, DASHBOARD_PAGE_SIZE, MAX_PAGE_SIZE
+)
+from query_budget import query_budget
+from order_counters import record_transition, order_parties
+from partner_index import partner_index, assign_partner
+from dispatch_planner import DISPATCH_MODE
+from order_import import OrderImport, read_rows, estimate_amount, validate_order_fields
+from qr_handler import (
+    generate_package_qr, generate_customer_delivery_qr, validate_qr_code, process_batch_qr_scan, is_definitive
+)
+from qr_decoder import decode_base64_image
+from qr_images import qr_image_cache, qr_image_key
+from qr_labels import render_label_sheet_in_pool, LABEL_SHEET_MAX_ORDERS
+from scan_audit import scan_audit
+from scan_dedup import scan_dedup, scan_key, idempotency_key, SCAN_DEDUP_TTL, IDEMPOTENCY_KEY_TTL
+from scan_tracking import decode_tracked_frame, parse_box, parse_size
 from ai_predictions import get_ai_predictions
-from indian_data import get_available_vendors
+from vendor_directory import vendor_directory, VENDOR_SEARCH_LIMIT
 
 # Indian Standard Time
 IST = pytz.timezone('Asia/Kolkata')
@@ -94,6 +112,9 @@ def register():
         db.session.add(user)
         db.session.commit()
         
+        if role == 'delivery_partner':
+            partner_index.add_partner(user.id)
+        
         # If vendor, create vendor profile
         if role == 'vendor':
             business_name = request.form.get('business_name', '')
@@ -131,8 +152,9 @@ def customer_dashboard():
         flash('Unauthorized access.', 'error')
         return redirect(url_for('index'))
     
-    orders = Order.query.filter_by(customer_id=current_user.id).order_by(Order.created_at.desc()).all()
-    return render_template('customer_dashboard.html', orders=orders)
+    orders = customer_dashboard_orders(current_user.id)
+    return render_template('customer_dashboard.html', orders=orders, counts=current_user.order_counts(),
+                           ai_min_orders=AI_PREDICTION_MIN_ORDERS)
 
 @app.route('/vendor_dashboard')
 @login_required
@@ -141,20 +163,41 @@ def vendor_dashboard():
         flash('Unauthorized access.', 'error')
         return redirect(url_for('index'))
     
-    pending_orders = Order.query.filter_by(vendor_id=current_user.id, status='pending').all()
-    active_orders = Order.query.filter(
-        Order.vendor_id == current_user.id,
-        Order.status.in_(['accepted', 'dispatched', 'in_transit', 'out_for_delivery'])
-    ).order_by(Order.created_at.desc()).all()
-    completed_orders = Order.query.filter(
-        Order.vendor_id == current_user.id,
-        Order.status.in_(['delivered', 'rejected'])
-    ).order_by(Order.created_at.desc()).limit(10).all()
+    pages, stats = vendor_dashboard_orders(current_user.id)
     
     return render_template('vendor_dashboard.html', 
-                         pending_orders=pending_orders,
-                         active_orders=active_orders,
-                         completed_orders=completed_orders)
+                         pending_orders=pages['pending'],
+                         active_orders=pages['active'],
+                         completed_orders=pages['completed'],
+                         stats=stats)
+
+@app.route('/vendor/orders')
+@login_required
+def vendor_orders():
+    """Next keyset page of pending or active orders for the dashboard's load more button"""
+    if current_user.role != 'vendor':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    bucket = request.args.get('bucket', 'pending')
+    if bucket not in ('pending', 'active'):
+        return jsonify({'success': False, 'error': 'Invalid bucket'}), 400
+    
+    after = None
+    if request.args.get('after'):
+        after = decode_cursor(request.args['after'])
+        if after is None:
+            return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    limit = min(max(request.args.get('limit', DASHBOARD_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    orders, next_cursor = vendor_orders_page(current_user.id, bucket, after, limit)
+    
+    render_row = get_template_attribute('vendor_order_rows.html', f'{bucket}_row')
+    return jsonify({
+        'success': True,
+        'orders': [{'id': order.id, 'status': order.status} for order in orders],
+        'html': ''.join(str(render_row(order)) for order in orders),
+        'next_cursor': next_cursor
+    })
 
 @app.route('/delivery_dashboard')
 @login_required
@@ -163,14 +206,8 @@ def delivery_dashboard():
         flash('Unauthorized access.', 'error')
         return redirect(url_for('index'))
     
-    assigned_orders = Order.query.filter_by(delivery_partner_id=current_user.id).filter(
-        Order.status.in_(['accepted', 'dispatched', 'in_transit', 'out_for_delivery'])
-    ).order_by(Order.created_at.desc()).all()
-    
-    completed_orders = Order.query.filter_by(delivery_partner_id=current_user.id, status='delivered').order_by(Order.created_at.desc()).limit(10).all()
-    
-    # Get total completed deliveries count for this delivery partner
-    total_completed_deliveries = Order.query.filter_by(delivery_partner_id=current_user.id, status='delivered').count()
+    assigned_orders, completed_orders = delivery_dashboard_orders(current_user.id)
+    total_completed_deliveries = current_user.order_counts().delivered
     
     return render_template('delivery_dashboard.html', 
                          assigned_orders=assigned_orders,
@@ -190,45 +227,15 @@ def create_order():
         window_time = request.form.get('window_time')
         delivery_speed = request.form.get('delivery_speed')
         
-        # Validation
-        if not vendor_id:
-            flash('Please select a vendor.', 'error')
-            vendors = get_available_vendors()
-            predictions = None
-            if current_user.can_use_ai_predictions():
-                predictions = get_ai_predictions(current_user.id)
-            return render_template('create_order.html', vendors=vendors, predictions=predictions)
-        
-        if not order_description:
-            flash('Please provide order description.', 'error')
-            vendors = get_available_vendors()
-            predictions = None
-            if current_user.can_use_ai_predictions():
-                predictions = get_ai_predictions(current_user.id)
-            return render_template('create_order.html', vendors=vendors, predictions=predictions)
-        
-        if not window_time or window_time not in ['9am-12pm', '12pm-4pm', '4pm-9pm', '9pm-9am']:
-            flash('Please select a valid delivery window.', 'error')
-            vendors = get_available_vendors()
-            predictions = None
-            if current_user.can_use_ai_predictions():
-                predictions = get_ai_predictions(current_user.id)
-            return render_template('create_order.html', vendors=vendors, predictions=predictions)
-        
-        if not delivery_speed or delivery_speed not in ['express', 'regular']:
-            flash('Please select a valid delivery speed.', 'error')
-            vendors = get_available_vendors()
-            predictions = None
-            if current_user.can_use_ai_predictions():
-                predictions = get_ai_predictions(current_user.id)
-            return render_template('create_order.html', vendors=vendors, predictions=predictions)
+        error = validate_order_fields(vendor_id, order_description, window_time, delivery_speed)
+        if error is None and (not vendor_id.isdigit() or vendor_directory.get(int(vendor_id)) is None):
+            error = 'Please select a vendor.'
+        if error:
+            flash(error, 'error')
+            return render_order_form()
         
         # Calculate estimated amount
-        base_amount = 100
-        if delivery_speed == 'express':
-            estimated_amount = base_amount + 50
-        else:
-            estimated_amount = base_amount
+        estimated_amount = estimate_amount(delivery_speed)
         
         # Create new order
         order = Order(
@@ -242,6 +249,7 @@ def create_order():
         )
         
         db.session.add(order)
+        record_transition(order, None)
         db.session.commit()
         
         # Emit WebSocket event for real-time update
@@ -257,14 +265,59 @@ def create_order():
         flash('Order placed successfully!', 'success')
         return redirect(url_for('customer_dashboard'))
     
-    vendors = get_available_vendors()
-    
-    # Get AI predictions if eligible
+    return render_order_form()
+
+def render_order_form():
+    """Order form listing the cached vendor directory, with AI predictions if eligible"""
     predictions = None
-    if current_user.can_use_ai_predictions():
+    vendors = vendor_directory.vendors()
+    counts = current_user.order_counts()
+    if current_user.can_use_ai_predictions(counts):
         predictions = get_ai_predictions(current_user.id)
     
-    return render_template('create_order.html', vendors=vendors, predictions=predictions)
+    if predictions:
+        # Vendors the predictions rank come first, in ranked order
+        ranks = {entry['vendor_id']: rank for rank, entry in enumerate(predictions['ranking'])}
+        vendors = sorted(vendors, key=lambda vendor: ranks.get(vendor['id'], len(ranks)))
+    
+    return render_template('create_order.html', vendors=vendors, predictions=predictions, counts=counts,
+                           ai_min_orders=AI_PREDICTION_MIN_ORDERS)
+
+@app.route('/vendors/search')
+@login_required
+def search_vendors():
+    """Typeahead over active vendors by business name or type"""
+    limit = min(max(request.args.get('limit', VENDOR_SEARCH_LIMIT, type=int), 1), 50)
+    return jsonify({'vendors': vendor_directory.search(request.args.get('q', ''), limit)})
+
+# Request content types accepted by the bulk order import
+ORDER_IMPORT_FORMATS = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson', 'application/ndjson': 'ndjson'}
+
+@app.route('/orders/bulk', methods=['POST'])
+@login_required
+@query_budget(None)  # a fixed number of statements per chunk of rows
+def bulk_create_orders():
+    """Create many orders from a streamed CSV or NDJSON body, reporting errors per row"""
+    if current_user.role != 'customer':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    fmt = ORDER_IMPORT_FORMATS.get(request.mimetype)
+    if fmt is None:
+        return jsonify({'error': 'Send text/csv or application/x-ndjson'}), 415
+    
+    result = OrderImport(current_user).run(read_rows(request.stream, fmt))
+    
+    # One event per vendor room for everything imported for that vendor
+    for vendor_id, new_orders in result.new_orders.items():
+        socketio.emit('new_orders', {'orders': new_orders}, room=f'vendor_{vendor_id}')
+    
+    return jsonify({
+        'success': not result.errors,
+        'created': len(result.created),
+        'failed': len(result.errors),
+        'orders': [{'row': row_number, 'order_id': order_id} for row_number, order_id in result.created],
+        'errors': [{'row': row_number, 'error': error} for row_number, error in result.errors]
+    })
 
 @app.route('/order/<int:order_id>/accept', methods=['POST'])
 @login_required
@@ -272,13 +325,16 @@ def accept_order(order_id):
     if current_user.role != 'vendor':
         return jsonify({'error': 'Unauthorized'}), 403
     
-    order = Order.query.get_or_404(order_id)
+    # The customer's name goes into the new_assignment event below
+    order = Order.query.options(load_customer()).get_or_404(order_id)
     if order.vendor_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
     if order.status != 'pending':
         return jsonify({'error': 'Order cannot be accepted'}), 400
     
+    parties = order_parties(order)
+    
     # Update order status
     order.status = 'accepted'
     order.accepted_at = datetime.now(IST)
@@ -287,11 +343,11 @@ def accept_order(order_id):
     qr_code = generate_package_qr(order.id)
     order.package_qr_code = qr_code
     
-    # Auto-assign delivery partner
-    delivery_partners = User.query.filter_by(role='delivery_partner').all()
-    if delivery_partners:
-        order.delivery_partner_id = random.choice(delivery_partners).id
+    # Auto-assign the least-loaded delivery partner, or leave it to the batched planner
+    if DISPATCH_MODE != 'batched':
+        order.delivery_partner_id = assign_partner()
     
+    record_transition(order, 'pending', parties)
     db.session.commit()
     
     # Emit WebSocket events
@@ -326,6 +382,7 @@ def reject_order(order_id):
         return jsonify({'error': 'Order cannot be rejected'}), 400
     
     order.status = 'rejected'
+    record_transition(order, 'pending')
     db.session.commit()
     
     # Emit WebSocket event
@@ -337,6 +394,95 @@ def reject_order(order_id):
     
     return jsonify({'success': True})
 
+@app.route('/qr/<int:order_id>.png')
+@login_required
+def qr_image(order_id):
+    """Serve an order's package (default) or delivery QR as a cacheable PNG"""
+    kind = request.args.get('kind', 'package')
+    if kind not in ('package', 'delivery'):
+        return jsonify({'error': 'Unknown QR kind'}), 400
+    
+    order = Order.query.get_or_404(order_id)
+    
+    # The delivery QR is the customer's proof of receipt, so only they see it
+    if kind == 'delivery':
+        allowed = current_user.id == order.customer_id
+        qr_data = order.delivery_qr_code
+    else:
+        allowed = current_user.id in (order.customer_id, order.vendor_id, order.delivery_partner_id)
+        qr_data = order.package_qr_code
+    
+    if not allowed:
+        return jsonify({'error': 'Unauthorized'}), 403
+    if not qr_data:
+        abort(404)
+    
+    # The ETag is derived from the payload, so a revalidation never renders
+    etag = qr_image_key(qr_data, kind)
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        _, png = qr_image_cache.get(qr_data, kind)
+        response = make_response(png)
+        response.mimetype = 'image/png'
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@app.route('/vendor/labels')
+@login_required
+def vendor_labels():
+    """Print package QR labels as one tiled PDF or PNG sheet.
+
+    Without ``order_ids`` the sheet holds the accepted orders still waiting
+    for pickup, LABEL_SHEET_MAX_ORDERS at a time: the ``X-Next-Sheet`` header
+    links the sheet with the next ones, after the last order on this sheet.
+    """
+    if current_user.role != 'vendor':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    fmt = request.args.get('format', 'pdf')
+    if fmt not in ('pdf', 'png'):
+        return jsonify({'error': 'Unsupported format'}), 400
+    
+    query = Order.query.filter(
+        Order.vendor_id == current_user.id,
+        Order.package_qr_code.isnot(None)
+    )
+    
+    order_ids = [int(order_id) for order_id in request.args.get('order_ids', '').split(',') if order_id.isdigit()]
+    if len(order_ids) > LABEL_SHEET_MAX_ORDERS:
+        return jsonify({'error': f'At most {LABEL_SHEET_MAX_ORDERS} labels per sheet'}), 400
+    if order_ids:
+        query = query.filter(Order.id.in_(order_ids))
+    else:
+        # Default to the accepted orders still waiting for pickup, one sheet at a time
+        query = query.filter(Order.status == 'accepted', Order.id > request.args.get('after', 0, type=int))
+    
+    labels = query.with_entities(Order.id, Order.package_qr_code).order_by(Order.id).limit(LABEL_SHEET_MAX_ORDERS + 1).all()
+    if not labels:
+        flash('No accepted orders to print labels for.', 'info')
+        return redirect(url_for('vendor_dashboard'))
+    
+    next_sheet = None
+    if len(labels) > LABEL_SHEET_MAX_ORDERS:
+        labels = labels[:LABEL_SHEET_MAX_ORDERS]
+        next_sheet = url_for('vendor_labels', format=fmt, after=labels[-1].id)
+    
+    # Rendering and composing the sheet happen in the label pool; socketio.sleep
+    # yields to other clients meanwhile
+    sheet = render_label_sheet_in_pool(labels, fmt, wait=socketio.sleep)
+    response = send_file(
+        BytesIO(sheet),
+        mimetype='application/pdf' if fmt == 'pdf' else 'image/png',
+        as_attachment=True,
+        download_name=f"trackit_labels_{labels[0].id}.{fmt}"
+    )
+    if next_sheet:
+        response.headers['X-Next-Sheet'] = next_sheet
+    return response
+
 @app.route('/qr_scanner')
 @login_required
 def qr_scanner():
@@ -346,33 +492,81 @@ def qr_scanner():
     
     return render_template('qr_scanner.html')
 
+# Content types accepted as a raw binary frame upload
+FRAME_MIMETYPES = ('image/jpeg', 'image/png', 'image/webp', 'application/octet-stream')
+
+def read_frame_bytes():
+    """Read the encoded camera frame from the current request.
+
+    Accepts a raw binary body (``image/jpeg`` etc.), a multipart upload with a
+    ``frame`` file, or the legacy JSON body with a base64 ``image_data`` field.
+    """
+    if request.mimetype in FRAME_MIMETYPES:
+        return request.get_data(cache=False) or None
+    
+    if request.mimetype == 'multipart/form-data':
+        frame = request.files.get('frame')
+        return frame.read() if frame else None
+    
+    data = request.get_json(silent=True) or {}
+    image_data = data.get('image_data')
+    return decode_base64_image(image_data) if image_data else None
+
 @app.route('/process_qr_image', methods=['POST'])
 @login_required
 def process_qr_image():
     """Process camera image for real QR code detection using OpenCV"""
     try:
-        data = request.get_json()
-        image_data = data.get('image_data')
+        image_bytes = read_frame_bytes()
         
-        if not image_data:
+        if not image_bytes:
             return jsonify({'qr_detected': False, 'error': 'No image data provided'})
         
-        # Process image for QR detection
-        result = process_image_for_qr(image_data)
+        # Hand the frame to the decode engine; socketio.sleep yields to other
+        # clients while the worker pool decodes it
+        result = decode_tracked_frame(
+            current_user.id,
+            request.headers.get('X-Scan-Session', ''),
+            image_bytes,
+            frame_size=parse_size(request.headers.get('X-Frame-Size')),
+            region=parse_box(request.headers.get('X-Frame-Region')),
+            wait=socketio.sleep
+        )
+        if result.get('busy'):
+            response = jsonify(result)
+            response.headers['Retry-After'] = str(math.ceil(result['retry_after_ms'] / 1000))
+            return response, 429
         return jsonify(result)
         
     except Exception as e:
         logging.error(f"Error processing QR image: {str(e)}")
         return jsonify({'qr_detected': False, 'error': 'Image processing failed'})
 
-@app.route('/scan_qr', methods=['POST'])
-@login_required
-def scan_qr():
-    qr_data = request.json.get('qr_data')
+def scan_update_data(order, result):
+    """Payload of the order_status_update event sent after a scan"""
+    update_data = {
+        'order_id': order.id,
+        'status': order.status,
+        'timestamp': datetime.now(IST).strftime("%d/%m/%Y %I:%M %p"),
+        'scanned_by': current_user.full_name,
+        'scan_type': result.get('scan_type', 'unknown')
+    }
     
-    if not qr_data:
-        return jsonify({'error': 'No QR data provided'}), 400
+    # Add delivery QR if generated
+    if result.get('delivery_qr_generated'):
+        update_data['delivery_qr_code'] = order.delivery_qr_code
     
+    return update_data
+
+def order_rooms(order):
+    """Socket.IO rooms of the customer, vendor and delivery partner of an order"""
+    rooms = [f'customer_{order.customer_id}', f'vendor_{order.vendor_id}']
+    if order.delivery_partner_id:
+        rooms.append(f'delivery_{order.delivery_partner_id}')
+    return rooms
+
+def process_scan(qr_data):
+    """Validate a scanned QR code, notify the order's rooms and return the JSON result"""
     # Validate and process QR code
     result = validate_qr_code(qr_data, current_user.id)
     
@@ -380,27 +574,9 @@ def scan_qr():
         order = result['order']
         
         # Emit WebSocket event for real-time update to all relevant parties
-        update_data = {
-            'order_id': order.id,
-            'status': order.status,
-            'timestamp': datetime.now(IST).strftime("%d/%m/%Y %I:%M %p"),
-            'scanned_by': current_user.full_name,
-            'scan_type': result.get('scan_type', 'unknown')
-        }
-        
-        # Add delivery QR if generated
-        if result.get('delivery_qr_generated'):
-            update_data['delivery_qr_code'] = order.delivery_qr_code
-        
-        # Broadcast to customer
-        socketio.emit('order_status_update', update_data, room=f'customer_{order.customer_id}')
-        
-        # Broadcast to vendor
-        socketio.emit('order_status_update', update_data, room=f'vendor_{order.vendor_id}')
-        
-        # Broadcast to delivery partner
-        if order.delivery_partner_id:
-            socketio.emit('order_status_update', update_data, room=f'delivery_{order.delivery_partner_id}')
+        update_data = scan_update_data(order, result)
+        for room in order_rooms(order):
+            socketio.emit('order_status_update', update_data, room=room)
         
         # Broadcast to all connected clients for general updates
         socketio.emit('global_order_update', {
@@ -408,9 +584,103 @@ def scan_qr():
             'status': order.status,
             'timestamp': update_data['timestamp']
         }, broadcast=True)
+        
+        # The Order row itself is not JSON serializable
+        result['order'] = {'id': order.id, 'status': order.status}
+    
+    return result
+
+@app.route('/scan_qr', methods=['POST'])
+@login_required
+def scan_qr():
+    qr_data = request.json.get('qr_data')
     
+    if not qr_data:
+        return jsonify({'error': 'No QR data provided'}), 400
+    
+    # Repeat detections of the same code, and retries carrying the same
+    # Idempotency-Key, get the original result without touching the DB
+    keys = [scan_key(current_user.id, qr_data)]
+    ttls = [SCAN_DEDUP_TTL]
+    client_key = request.headers.get('Idempotency-Key')
+    if client_key:
+        keys.append(idempotency_key(current_user.id, client_key, qr_data))
+        ttls.append(IDEMPOTENCY_KEY_TTL)
+    
+    cached = scan_dedup.claim(keys, wait=socketio.sleep)
+    if cached is not None:
+        return jsonify(dict(cached, duplicate=True))
+    
+    try:
+        result = process_scan(qr_data)
+    except Exception:
+        scan_dedup.abandon(keys)
+        raise
+    
+    if is_definitive(result):
+        scan_dedup.complete(keys, result, ttls)
+    else:
+        # A transient failure such as a database error is retried, not replayed
+        scan_dedup.abandon(keys)
     return jsonify(result)
 
+# Largest number of payloads accepted by one batch scan request
+MAX_BATCH_SCAN = 500
+
+@app.route('/scan_qr/batch', methods=['POST'])
+@login_required
+@query_budget(None)  # order history is still written once per scanned order
+def scan_qr_batch():
+    """Apply a list of scanned QR payloads at once (hub sorting)"""
+    qr_data_list = (request.get_json(silent=True) or {}).get('qr_data')
+    
+    if not isinstance(qr_data_list, list) or not qr_data_list:
+        return jsonify({'error': 'No QR data provided'}), 400
+    if len(qr_data_list) > MAX_BATCH_SCAN:
+        return jsonify({'error': f'At most {MAX_BATCH_SCAN} QR codes per batch'}), 400
+    if not all(isinstance(qr_data, str) for qr_data in qr_data_list):
+        return jsonify({'error': 'QR data must be strings'}), 400
+    
+    results, orders = process_batch_qr_scan(qr_data_list, current_user.id)
+    
+    # One event per room carrying all of that room's updates
+    room_updates = {}
+    global_updates = []
+    for result in results:
+        if not result['success']:
+            continue
+        order = orders[result['order_id']]
+        update_data = scan_update_data(order, result)
+        for room in order_rooms(order):
+            room_updates.setdefault(room, []).append(update_data)
+        global_updates.append({
+            'order_id': order.id,
+            'status': order.status,
+            'timestamp': update_data['timestamp']
+        })
+    
+    for room, updates in room_updates.items():
+        socketio.emit('order_status_updates', {'updates': updates}, room=room)
+    if global_updates:
+        socketio.emit('global_order_updates', {'updates': global_updates}, broadcast=True)
+    
+    applied = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': applied == len(results),
+        'applied': applied,
+        'failed': len(results) - applied,
+        'results': results
+    })
+
+@app.route('/metrics/scan_audit')
+@login_required
+def scan_audit_metrics():
+    """Counters of the write-behind QRScan audit buffer"""
+    if not current_user.is_operator():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(dict(scan_audit.metrics, enabled=scan_audit.enabled))
+
 # WebSocket event handlers
 @socketio.on('join_room')
 def on_join(data):
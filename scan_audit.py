@@ -0,0 +1,314 @@
+import os
+import json
+import glob
+import time
+import fcntl
+import atexit
+import logging
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import app, db, socketio
+from models import QRScan
+
+# Write-behind configuration for QRScan audit rows
+QR_SCAN_WRITE_BEHIND = os.environ.get('QR_SCAN_WRITE_BEHIND', '0') == '1'
+SCAN_AUDIT_FLUSH_SIZE = int(os.environ.get('SCAN_AUDIT_FLUSH_SIZE', 200))
+SCAN_AUDIT_FLUSH_INTERVAL = float(os.environ.get('SCAN_AUDIT_FLUSH_INTERVAL', 1.0))
+SCAN_AUDIT_BUFFER_SIZE = int(os.environ.get('SCAN_AUDIT_BUFFER_SIZE', 10000))
+SCAN_AUDIT_SPILL_DIR = os.environ.get(
+    'SCAN_AUDIT_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'trackit_scan_audit')
+)
+# fsync the spill files once per flush interval, in the background flusher
+SCAN_AUDIT_FSYNC = os.environ.get('SCAN_AUDIT_FSYNC', '1') == '1'
+# Longest wait between retries while inserting into the database fails
+SCAN_AUDIT_MAX_BACKOFF = float(os.environ.get('SCAN_AUDIT_MAX_BACKOFF', 60))
+
+class ScanAuditWriter:
+    """Buffers QRScan rows in memory and bulk-inserts them in the background.
+
+    Every buffered row is also appended to a local NDJSON spill file, so rows
+    that were accepted but not yet flushed survive a crash and are replayed on
+    the next start. Delivery is at-least-once: a crash between the insert and
+    removing the spill file replays those rows again. With ``fsync`` the
+    flusher syncs the spill files once per interval, so a power loss can
+    drop at most that interval's rows; a process crash drops none.
+
+    While inserting fails the writer stops buffering in memory: rows go to
+    the spill files only, and the flusher retries from those files with
+    exponential backoff instead of every scan retrying on its own path.
+
+    Each process holds an exclusive flock on its spill files until their rows
+    are inserted and the files removed, so recovery only adopts files whose
+    owner has exited, never the live files of other workers sharing the
+    spill directory.
+    """
+
+    def __init__(self, enabled=QR_SCAN_WRITE_BEHIND, flush_size=SCAN_AUDIT_FLUSH_SIZE,
+                 flush_interval=SCAN_AUDIT_FLUSH_INTERVAL, buffer_size=SCAN_AUDIT_BUFFER_SIZE,
+                 spill_dir=SCAN_AUDIT_SPILL_DIR, fsync=SCAN_AUDIT_FSYNC, max_backoff=SCAN_AUDIT_MAX_BACKOFF):
+        self.enabled = enabled
+        self.fsync = fsync
+        self.max_backoff = max_backoff
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.spill_dir = spill_dir
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._spill = None
+        self._spill_path = None
+        self._pending_files = []  # locked (path, file) spills whose rows are not yet inserted
+        self._unsynced = []  # spill files written since the last sync
+        self._new_spill = False  # a spill file was created since the last sync
+        self._failures = 0  # consecutive failed flushes; while above zero rows are only spilled
+        self._retry_at = 0.0
+        self._started = False
+        self._stopped = False
+        self.metrics = {
+            'buffered': 0,
+            'recorded': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'flush_errors': 0,
+            'spill_only': False,
+            'recovered': 0,
+            'last_flush_rows': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def _open_spill(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._spill_path = os.path.join(self.spill_dir, f"scans-{os.getpid()}-{time.time_ns()}.ndjson")
+        self._spill = open(self._spill_path, 'a', encoding='utf-8')
+        fcntl.flock(self._spill.fileno(), fcntl.LOCK_EX)
+        self._new_spill = True
+
+    def _rotate_spill(self):
+        """Retire the current spill file; its rows are now covered by the snapshot being flushed.
+
+        The file stays open, and so locked, until the flush removes it.
+        """
+        if self._spill is not None:
+            self._pending_files.append((self._spill_path, self._spill))
+            self._spill = None
+            self._spill_path = None
+
+    def _adopt(self, path):
+        """Lock a spill file whose owner has exited, or return None if it is live or gone"""
+        try:
+            f = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # The owner may have removed the file after flushing it while we waited
+            if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                raise FileNotFoundError(path)
+        except OSError:
+            f.close()
+            return None
+        return f
+
+    @staticmethod
+    def _read_spill(path):
+        rows = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    row['scanned_at'] = datetime.fromisoformat(row['scanned_at'])
+                    rows.append(row)
+        return rows
+
+    def _recover(self):
+        """Load rows left in spill files by processes that have exited"""
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, '*.ndjson'))):
+            f = self._adopt(path)
+            if f is None:
+                continue
+            try:
+                rows = self._read_spill(path)
+            except (OSError, ValueError) as e:
+                f.close()
+                logging.error(f"Could not recover scan audit spill file {path}: {str(e)}")
+                continue
+            self._buffer.extend(rows)
+            self.metrics['recovered'] += len(rows)
+            self._pending_files.append((path, f))
+        self.metrics['buffered'] = len(self._buffer)
+        if self.metrics['recovered']:
+            logging.info(f"Recovered {self.metrics['recovered']} buffered scan audit rows")
+
+    def start(self):
+        """Recover spilled rows and start the background flusher (idempotent)"""
+        with self._lock:
+            if self._started or not self.enabled:
+                return
+            self._started = True
+            self._recover()
+        socketio.start_background_task(self._run)
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopped:
+            socketio.sleep(self.flush_interval)
+            self.sync()
+            self.flush()
+
+    def sync(self):
+        """fsync the spill files written since the last call (group commit)"""
+        if not self.fsync:
+            return
+        with self._lock:
+            files, self._unsynced = self._unsynced, []
+            new_spill, self._new_spill = self._new_spill, False
+        for f in files:
+            try:
+                os.fsync(f.fileno())
+            except (OSError, ValueError):
+                # Closed by a flush that already inserted its rows
+                pass
+        if new_spill:
+            # Make new files' directory entries durable too
+            dir_fd = os.open(self.spill_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def record(self, row):
+        """Buffer one QRScan row (order_id, scanned_by, scan_type, scan_data, scanned_at)"""
+        self.start()
+        with self._lock:
+            if self._spill is None:
+                self._open_spill()
+            self._spill.write(json.dumps(dict(row, scanned_at=row['scanned_at'].isoformat())) + '\n')
+            self._spill.flush()
+            if self._spill not in self._unsynced:
+                self._unsynced.append(self._spill)
+            self.metrics['recorded'] += 1
+            if self._failures:
+                # The database is failing: the spill file alone holds the row until the flusher retries
+                return
+            self._buffer.append(row)
+            self.metrics['buffered'] = len(self._buffer)
+            backlog = len(self._buffer)
+
+        # A full buffer flushes on the caller's path instead of growing without bound;
+        # if that flush fails, later rows are only spilled
+        if backlog >= self.buffer_size:
+            self.flush()
+        elif backlog >= self.flush_size:
+            socketio.start_background_task(self.flush)
+
+    def _insert(self, rows):
+        with app.app_context():
+            try:
+                for offset in range(0, len(rows), self.flush_size):
+                    db.session.execute(insert(QRScan), rows[offset:offset + self.flush_size])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _failed(self, e):
+        """Switch to spill-only mode and schedule the next retry"""
+        with self._lock:
+            # Every row is in a spill file; drop the in-memory copies
+            self._buffer.clear()
+            self._failures += 1
+            backoff = min(self.max_backoff, self.flush_interval * 2 ** (self._failures - 1))
+            self._retry_at = time.monotonic() + backoff
+            self.metrics['buffered'] = 0
+            self.metrics['flush_errors'] += 1
+            self.metrics['spill_only'] = True
+        logging.error(f"Error flushing scan audit rows: {str(e)}")
+
+    def _flush_spills(self):
+        """Insert the rows of the pending spill files one file at a time, after a failed flush"""
+        with self._lock:
+            self._rotate_spill()
+            files = list(self._pending_files)
+
+        written = 0
+        for path, f in files:
+            try:
+                rows = self._read_spill(path)
+                self._insert(rows)
+            except Exception as e:
+                self._failed(e)
+                return written
+            os.remove(path)
+            f.close()
+            written += len(rows)
+            with self._lock:
+                self._pending_files.remove((path, f))
+                self.metrics['flushed'] += len(rows)
+
+        with self._lock:
+            self._failures = 0
+            self.metrics['spill_only'] = False
+            self.metrics['flushes'] += 1
+            self.metrics['last_flush_rows'] = written
+        logging.info(f"Scan audit inserts recovered; wrote {written} spilled rows")
+        return written
+
+    def flush(self, retry=False):
+        """Bulk insert everything buffered so far; returns the number of rows written.
+
+        After a failed flush this retries from the spill files once the
+        backoff has passed, or right away with ``retry``.
+        """
+        with self._flush_lock:
+            if self._failures:
+                if not retry and time.monotonic() < self._retry_at:
+                    return 0
+                return self._flush_spills()
+
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                rows = list(self._buffer)
+                self._buffer.clear()
+                self._rotate_spill()
+                files = list(self._pending_files)
+
+            start = time.perf_counter()
+            try:
+                self._insert(rows)
+            except Exception as e:
+                # The rows stay in their spill files for the retries
+                self._failed(e)
+                return 0
+
+            # Remove each file before releasing its lock, so no other process can adopt it
+            for path, f in files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                f.close()
+
+            with self._lock:
+                self._pending_files = [pending for pending in self._pending_files if pending not in files]
+                self.metrics['flushed'] += len(rows)
+                self.metrics['flushes'] += 1
+                self.metrics['last_flush_rows'] = len(rows)
+                self.metrics['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 3)
+                self.metrics['buffered'] = len(self._buffer)
+            return len(rows)
+
+    def close(self):
+        """Stop the flusher and write out whatever is still buffered"""
+        self._stopped = True
+        self.sync()
+        self.flush(retry=True)
+
+# Global scan audit writer
+scan_audit = ScanAuditWriter()
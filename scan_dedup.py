@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Scan dedup configuration
+SCAN_DEDUP_TTL = float(os.environ.get('SCAN_DEDUP_TTL', 2.0))
+IDEMPOTENCY_KEY_TTL = float(os.environ.get('IDEMPOTENCY_KEY_TTL', 300))
+SCAN_DEDUP_MAX_ENTRIES = int(os.environ.get('SCAN_DEDUP_MAX_ENTRIES', 50000))
+SCAN_DEDUP_PENDING_TTL = 30.0
+SCAN_DEDUP_POLL_INTERVAL = 0.01
+
+# Marker for a scan that is still being processed
+PENDING = object()
+
+def scan_key(user_id, qr_data):
+    """Dedup key for the same scanner scanning the same payload"""
+    return ('scan', user_id, qr_data)
+
+def idempotency_key(user_id, client_key, qr_data):
+    """Dedup key for a client-supplied Idempotency-Key, scoped to the user and payload"""
+    return ('idempotency', user_id, client_key, qr_data)
+
+class ScanDedupCache:
+    """Bounded TTL cache of recent scan results.
+
+    ``claim`` either returns a finished result for any of the keys, waits for
+    an in-flight scan with one of the keys to finish, or marks the keys as
+    pending and returns None so the caller processes the scan and then calls
+    ``complete`` (or ``abandon`` on failure).
+    """
+
+    def __init__(self, max_entries=SCAN_DEDUP_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, result or PENDING)
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def _set(self, key, expires_at, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def claim(self, keys, wait=time.sleep, timeout=SCAN_DEDUP_PENDING_TTL):
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                values = [self._get(key, now) for key in keys]
+                for value in values:
+                    if value is not None and value is not PENDING:
+                        self.hits += 1
+                        return value
+
+                if PENDING not in values:
+                    for key in keys:
+                        self._set(key, now + SCAN_DEDUP_PENDING_TTL, PENDING)
+                    return None
+
+            if now >= deadline:
+                return None
+            wait(SCAN_DEDUP_POLL_INTERVAL)
+
+    def complete(self, keys, result, ttls):
+        """Store the result of a claimed scan; ``ttls`` gives each key's lifetime"""
+        now = time.monotonic()
+        with self._lock:
+            for key, ttl in zip(keys, ttls):
+                self._set(key, now + ttl, result)
+
+    def abandon(self, keys):
+        """Release claimed keys without a result so the scan can be retried"""
+        with self._lock:
+            for key in keys:
+                if self._entries.get(key, (None, None))[1] is PENDING:
+                    del self._entries[key]
+
+# Global scan dedup cache
+scan_dedup = ScanDedupCache()
@@ -0,0 +1,265 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from qr_engine import engine as qr_engine
+from frame_cache import FrameCache, frame_hash
+
+# Scan session configuration
+SCAN_SESSION_TTL = float(os.environ.get('SCAN_SESSION_TTL', 300))
+SCAN_SESSION_MAX = int(os.environ.get('SCAN_SESSION_MAX', 10000))
+
+# Admission control: concurrent frames allowed in flight
+SCAN_MAX_IN_FLIGHT = int(os.environ.get('SCAN_MAX_IN_FLIGHT', qr_engine.queue_size))
+# Per user, however many scan sessions the user's clients open
+SCAN_MAX_IN_FLIGHT_PER_USER = int(os.environ.get('SCAN_MAX_IN_FLIGHT_PER_USER', 2))
+SCAN_BASE_POLL_INTERVAL_MS = 100
+SCAN_MAX_POLL_INTERVAL_MS = int(os.environ.get('SCAN_MAX_POLL_INTERVAL_MS', 2000))
+
+# Region-of-interest tuning
+ROI_MARGIN = 0.75           # crop padding around the last QR box, as a fraction of its size
+ROI_TARGET_QR_PX = 200      # QR width (pixels) the client should aim to upload
+ROI_MIN_SCALE = 0.25        # never ask the client to shrink frames further than this
+ROI_MAX_MISSES = 3          # forget the last QR box after this many consecutive misses
+
+class ScanSession:
+    """What the server remembers about one scanner between frames"""
+
+    def __init__(self):
+        self.frame_size = None      # (width, height) of the client's camera frame
+        self.bbox = None            # last QR box in camera frame pixels
+        self.qr_width = None        # last QR width in camera frame pixels
+        self.misses = 0
+        self.last_seen = time.monotonic()
+        self.frame_cache = FrameCache()
+
+class ScanSessionStore:
+    """Bounded, expiring map of scan session key -> ScanSession"""
+
+    def __init__(self, max_sessions=SCAN_SESSION_MAX, ttl=SCAN_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the session for ``key``, creating it if needed"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or now - session.last_seen > self.ttl:
+                session = ScanSession()
+                self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            session.last_seen = now
+
+            # Evict expired sessions first, then the least recently used
+            while self._sessions:
+                oldest_key, oldest = next(iter(self._sessions.items()))
+                if len(self._sessions) <= self.max_sessions and now - oldest.last_seen <= self.ttl:
+                    break
+                del self._sessions[oldest_key]
+            return session
+
+    def __len__(self):
+        return len(self._sessions)
+
+# Global scan session store
+sessions = ScanSessionStore()
+
+class AdmissionController:
+    """Caps frames in flight per user and globally, and suggests poll cadence"""
+
+    def __init__(self, max_in_flight=SCAN_MAX_IN_FLIGHT,
+                 max_per_user=SCAN_MAX_IN_FLIGHT_PER_USER,
+                 base_interval_ms=SCAN_BASE_POLL_INTERVAL_MS,
+                 max_interval_ms=SCAN_MAX_POLL_INTERVAL_MS):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_per_user = max(1, max_per_user)
+        self.base_interval_ms = base_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.in_flight = 0
+        self.rejected = 0
+        self._per_user = {}  # user id -> frames in flight, only while above zero
+        self._lock = threading.Lock()
+
+    def try_acquire(self, user_id):
+        """Admit one frame for ``user_id``; False means the caller should back off"""
+        with self._lock:
+            user_in_flight = self._per_user.get(user_id, 0)
+            if self.in_flight >= self.max_in_flight or user_in_flight >= self.max_per_user:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self._per_user[user_id] = user_in_flight + 1
+            return True
+
+    def release(self, user_id):
+        with self._lock:
+            self.in_flight -= 1
+            if self._per_user[user_id] > 1:
+                self._per_user[user_id] -= 1
+            else:
+                del self._per_user[user_id]
+
+    def poll_interval_ms(self):
+        """Suggested scan cadence; slows down as the server fills up"""
+        utilization = min(self.in_flight / self.max_in_flight, 0.95)
+        interval = self.base_interval_ms / (1 - utilization)
+        return int(min(self.max_interval_ms, interval))
+
+    def retry_after_ms(self):
+        """Suggested wait before the next frame after a rejection"""
+        return max(self.poll_interval_ms(), self.base_interval_ms * 2)
+
+# Global admission controller
+admission = AdmissionController()
+
+def parse_box(value):
+    """Parse an ``x,y,w,h`` header into a tuple of floats, or None"""
+    try:
+        parts = tuple(float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if len(parts) != 4 or parts[2] <= 0 or parts[3] <= 0:
+        return None
+    return parts
+
+def parse_size(value):
+    """Parse a ``WxH`` header into a (width, height) tuple, or None"""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except (AttributeError, ValueError):
+        return None
+    if width <= 0 or height <= 0:
+        return None
+    return width, height
+
+def resolve_region(session, frame_size, region):
+    """Work out which part of the camera frame the uploaded image covers.
+
+    Clients that send no geometry are assumed to upload the whole frame.
+    """
+    if region is not None:
+        return region
+    frame_size = frame_size or session.frame_size
+    if frame_size is None:
+        return None
+    return (0, 0, frame_size[0], frame_size[1])
+
+def plan_roi(session, region):
+    """Return the fractional ROI to decode first for a frame covering ``region``.
+
+    ``region`` is the part of the camera frame the uploaded image shows.
+    """
+    if session.bbox is None or region is None:
+        return None
+
+    bx, by, bw, bh = session.bbox
+    rx, ry, rw, rh = region
+    pad_x, pad_y = bw * ROI_MARGIN, bh * ROI_MARGIN
+
+    x0 = max(rx, bx - pad_x)
+    y0 = max(ry, by - pad_y)
+    x1 = min(rx + rw, bx + bw + pad_x)
+    y1 = min(ry + rh, by + bh + pad_y)
+    if x1 <= x0 or y1 <= y0:
+        return None
+
+    roi = ((x0 - rx) / rw, (y0 - ry) / rh, (x1 - x0) / rw, (y1 - y0) / rh)
+    # Decoding an ROI that is most of the frame saves nothing
+    if roi[2] * roi[3] > 0.6:
+        return None
+    return roi
+
+def capture_hint(session):
+    """Suggest the crop region and downscale factor for the client's next frame"""
+    if session.frame_size is None:
+        return {'region': None, 'scale': 1.0}
+
+    scale = 1.0
+    if session.qr_width:
+        scale = min(1.0, max(ROI_MIN_SCALE, ROI_TARGET_QR_PX / session.qr_width))
+
+    region = None
+    if session.bbox is not None and session.misses == 0:
+        frame_w, frame_h = session.frame_size
+        bx, by, bw, bh = session.bbox
+        pad_x, pad_y = bw * ROI_MARGIN, bh * ROI_MARGIN
+        x0 = max(0, int(bx - pad_x))
+        y0 = max(0, int(by - pad_y))
+        x1 = min(frame_w, int(bx + bw + pad_x))
+        y1 = min(frame_h, int(by + bh + pad_y))
+        region = [x0, y0, x1 - x0, y1 - y0]
+
+    return {'region': region, 'scale': round(scale, 3)}
+
+def update_session(session, result, frame_size, region):
+    """Record a decode result against the session and return the capture hint.
+
+    ``frame_size`` and ``region`` are what the client reported; when they are
+    missing the uploaded image is assumed to be the whole camera frame.
+    """
+    image_size = result.get('image_size')
+    if frame_size is None and session.frame_size is None and image_size:
+        frame_size = tuple(image_size)
+    if frame_size is not None:
+        session.frame_size = frame_size
+    region = resolve_region(session, None, region)
+
+    if result.get('qr_detected') and result.get('bbox') and region is not None:
+        fx, fy, fw, fh = result['bbox']
+        rx, ry, rw, rh = region
+        session.bbox = (rx + fx * rw, ry + fy * rh, fw * rw, fh * rh)
+        session.qr_width = fw * rw
+        session.misses = 0
+    elif not result.get('qr_detected') and not result.get('busy'):
+        session.misses += 1
+        if session.misses >= ROI_MAX_MISSES:
+            session.bbox = None
+
+    return capture_hint(session)
+
+def decode_tracked_frame(user_id, session_id, image_bytes, frame_size=None, region=None, wait=time.sleep):
+    """Decode a frame for one of a user's scan sessions and attach capture and cadence hints.
+
+    ``session_id`` is the client's own scanner id and only keeps apart the
+    tracking state of a user's scanners: the in-flight limit is per user, so
+    a client cannot raise it by sending new ids. Frames over the user or
+    global in-flight limit are rejected with ``busy`` and a
+    ``retry_after_ms`` hint. Near-duplicates of a recent frame are answered
+    from the session's frame cache; everything else goes to the decode
+    engine, ROI first.
+    """
+    session = sessions.get(f"{user_id}:{session_id}")
+    if not admission.try_acquire(user_id):
+        return {
+            'qr_detected': False,
+            'busy': True,
+            'error': 'Scanner busy, please retry',
+            'retry_after_ms': admission.retry_after_ms()
+        }
+
+    try:
+        region = resolve_region(session, frame_size, region)
+
+        # Near-identical recent frames reuse the earlier result
+        fingerprint = frame_hash(image_bytes)
+        result = None
+        if fingerprint is not None:
+            result = session.frame_cache.lookup(fingerprint, region)
+
+        if result is None:
+            result = qr_engine.decode(image_bytes, wait=wait, roi=plan_roi(session, region))
+            if result.get('busy'):
+                result['retry_after_ms'] = admission.retry_after_ms()
+                return result
+            if fingerprint is not None:
+                session.frame_cache.store(fingerprint, region, result)
+
+        result['capture'] = update_session(session, result, frame_size, region)
+        result['poll_interval_ms'] = admission.poll_interval_ms()
+        return result
+    finally:
+        admission.release(user_id)
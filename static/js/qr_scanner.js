@@ -4,6 +4,22 @@ let isScanning = false;
 let currentStream = null;
 let scanningInterval = null;
 
+// How camera frames reach the server: 'http' posts raw JPEG bytes,
+// 'socket' sends them as binary Socket.IO frames
+const FRAME_TRANSPORT = 'http';
+const FRAME_JPEG_QUALITY = 0.8;
+
+// Server-negotiated capture settings: which part of the camera frame to
+// upload and how far to downscale it (see scan_tracking.capture_hint)
+const scanSessionId = Math.random().toString(36).slice(2, 10);
+let captureHint = { region: null, scale: 1.0 };
+let frameGeometry = null;
+
+// Scan cadence, adapted to the server's poll_interval_ms / retry_after_ms hints
+const DEFAULT_SCAN_INTERVAL_MS = 100;
+let scanIntervalMs = DEFAULT_SCAN_INTERVAL_MS;
+let frameInFlight = false;
+
 function initializeQRScanner() {
     console.log('Initializing Real QR Scanner...');
     const video = document.getElementById('qrVideo');
@@ -88,10 +104,20 @@ function startRapidScanLoop() {
     
     // High-frequency scanning for instant detection (Google Pay style)
     scanningInterval = setInterval(() => {
-        if (isScanning) {
+        if (isScanning && !frameInFlight) {
             scanForQRCodeReal();
         }
-    }, 100); // Scan every 100ms for instant detection
+    }, scanIntervalMs); // 100ms by default, slower when the server asks
+}
+
+function setScanInterval(intervalMs) {
+    intervalMs = Math.max(DEFAULT_SCAN_INTERVAL_MS, intervalMs || DEFAULT_SCAN_INTERVAL_MS);
+    if (intervalMs === scanIntervalMs) return;
+    
+    scanIntervalMs = intervalMs;
+    if (scanningInterval) {
+        startRapidScanLoop();
+    }
 }
 
 function scanForQRCodeReal() {
@@ -102,28 +128,88 @@ function scanForQRCodeReal() {
     const context = canvas.getContext('2d');
     
     if (video.readyState === video.HAVE_ENOUGH_DATA) {
-        canvas.height = video.videoHeight;
-        canvas.width = video.videoWidth;
-        context.drawImage(video, 0, 0, canvas.width, canvas.height);
+        // Crop to the suggested region (or the full frame) and downscale
+        const [sx, sy, sw, sh] = captureHint.region ||
+            [0, 0, video.videoWidth, video.videoHeight];
+        const scale = captureHint.scale || 1.0;
         
-        // Get image data for processing
-        const imageData = context.getImageData(0, 0, canvas.width, canvas.height);
+        canvas.width = Math.max(1, Math.round(sw * scale));
+        canvas.height = Math.max(1, Math.round(sh * scale));
+        context.drawImage(video, sx, sy, sw, sh, 0, 0, canvas.width, canvas.height);
+        
+        frameGeometry = {
+            size: `${video.videoWidth}x${video.videoHeight}`,
+            region: `${sx},${sy},${sw},${sh}`
+        };
         
         // Send to backend for real QR processing
-        processImageForQR(imageData);
+        processImageForQR();
     }
 }
 
-function processImageForQR(imageData) {
-    // Convert imageData to base64 for backend processing
+function processImageForQR() {
     const canvas = document.getElementById('qrCanvas');
-    const dataURL = canvas.toDataURL('image/jpeg', 0.8);
     
-    // Send to backend for OpenCV/ZBar processing
+    // Old browsers without toBlob fall back to the base64 JSON endpoint
+    if (!canvas.toBlob) {
+        processImageForQRLegacy(canvas);
+        return;
+    }
+    
+    frameInFlight = true;
+    canvas.toBlob(blob => {
+        if (!blob) {
+            frameInFlight = false;
+            return;
+        }
+        sendFrame(blob)
+            .then(handleFrameResult)
+            .catch(handleFrameError)
+            .finally(() => { frameInFlight = false; });
+    }, 'image/jpeg', FRAME_JPEG_QUALITY);
+}
+
+function sendFrame(blob) {
+    // Binary Socket.IO channel, result comes back as the ack
+    const geometry = frameGeometry || {};
+    
+    if (FRAME_TRANSPORT === 'socket' && window.socket && window.socket.connected) {
+        return blob.arrayBuffer().then(buffer => new Promise(resolve => {
+            window.socket.emit('qr_frame', {
+                frame: buffer,
+                session: scanSessionId,
+                size: geometry.size,
+                region: geometry.region
+            }, resolve);
+        }));
+    }
+    
+    // Raw JPEG body, decoded server side straight from the request buffer
+    const headers = {
+        'Content-Type': 'image/jpeg',
+        'X-Scan-Session': scanSessionId
+    };
+    if (geometry.size) headers['X-Frame-Size'] = geometry.size;
+    if (geometry.region) headers['X-Frame-Region'] = geometry.region;
+    
+    return fetch('/process_qr_image', {
+        method: 'POST',
+        headers: headers,
+        body: blob
+    }).then(response => response.json());
+}
+
+function processImageForQRLegacy(canvas) {
+    const dataURL = canvas.toDataURL('image/jpeg', FRAME_JPEG_QUALITY);
+    
+    frameInFlight = true;
     fetch('/process_qr_image', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            'X-Scan-Session': scanSessionId,
+            'X-Frame-Size': (frameGeometry || {}).size || '',
+            'X-Frame-Region': (frameGeometry || {}).region || ''
         },
         body: JSON.stringify({ 
             image_data: dataURL.split(',')[1], // Remove data:image/jpeg;base64, prefix
@@ -131,20 +217,36 @@ function processImageForQR(imageData) {
         })
     })
     .then(response => response.json())
-    .then(data => {
-        if (data.qr_detected && data.qr_data) {
-            console.log('QR Code detected:', data.qr_data);
-            // Temporarily stop scanning to process
-            isScanning = false;
-            processQRCode(data.qr_data);
-        }
-    })
-    .catch(error => {
-        // Silently handle errors to avoid spam during continuous scanning
-        if (error.message !== 'Failed to fetch') {
-            console.log('QR scan error:', error);
-        }
-    });
+    .then(handleFrameResult)
+    .catch(handleFrameError)
+    .finally(() => { frameInFlight = false; });
+}
+
+function handleFrameResult(data) {
+    // Back off when the server is saturated, speed up again when it recovers
+    if (data.busy) {
+        setScanInterval(data.retry_after_ms);
+        return;
+    }
+    setScanInterval(data.poll_interval_ms);
+    
+    if (data.capture) {
+        captureHint = data.capture;
+    }
+    
+    if (data.qr_detected && data.qr_data && isScanning) {
+        console.log('QR Code detected:', data.qr_data);
+        // Temporarily stop scanning to process
+        isScanning = false;
+        processQRCode(data.qr_data);
+    }
+}
+
+function handleFrameError(error) {
+    // Silently handle errors to avoid spam during continuous scanning
+    if (error.message !== 'Failed to fetch') {
+        console.log('QR scan error:', error);
+    }
 }
 
 function processQRCode(qrData) {
@@ -161,11 +263,16 @@ function processQRCode(qrData) {
     status.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Processing QR code...';
     status.className = 'alert alert-info';
     
+    // One key per detection so a retried request is applied at most once
+    const idempotencyKey = window.crypto && crypto.randomUUID ?
+        crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    
     // Send to server for processing
     fetch('/scan_qr', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            'Idempotency-Key': idempotencyKey,
             'X-CSRFToken': document.querySelector('meta[name=csrf-token]')?.getAttribute('content') || ''
         },
         body: JSON.stringify({ qr_data: qrData })
@@ -318,6 +425,7 @@ function switchCamera() {
         const currentFacingMode = video.getAttribute('data-facing-mode') || 'environment';
         const newFacingMode = currentFacingMode === 'environment' ? 'user' : 'environment';
         video.setAttribute('data-facing-mode', newFacingMode);
+        captureHint = { region: null, scale: 1.0 };
         
         navigator.mediaDevices.getUserMedia({ 
             video: { 
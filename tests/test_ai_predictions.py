@@ -0,0 +1,144 @@
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+import ai_predictions
+from app import db
+from models import OrderHistory
+from order_patterns import backfill_order_patterns, customer_patterns, rebuild_order_patterns
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_predictions, 'AI_MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(ai_predictions, 'AI_PREDICTOR', 'counts')
+    return tmp_path
+
+def add_history(customer, vendor, count, window_time='4pm-9pm', delivery_speed='express', order_hour=18):
+    for _ in range(count):
+        db.session.add(OrderHistory(customer_id=customer.id, vendor_id=vendor.id, window_time=window_time,
+                                    delivery_speed=delivery_speed, order_day='monday', order_hour=order_hour))
+    db.session.commit()
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.05)
+
+def test_stale_model_is_trained_in_the_pool_and_loaded_from_disk(make_user, model_dir, monkeypatch):
+    customer = make_user('customer')
+    vendor = make_user('vendor')
+    add_history(customer, vendor, 6)
+    rebuild_order_patterns()
+
+    # Training must not happen in the web worker
+    monkeypatch.setattr(ai_predictions.CountPredictor, 'train_models',
+                        lambda self, customer_id: pytest.fail('trained in the web worker'))
+    cache = ai_predictions.ModelCache(workers=1)
+    version = ai_predictions.history_version(customer.id)
+    try:
+        assert cache.get(customer.id, version) is None
+        wait_for(lambda: cache.metrics['trained'] == 1)
+        model = cache.get(customer.id, version)
+    finally:
+        cache.shutdown()
+
+    assert model.predict_for(vendor.id, 'monday', 18)['window_time'] == '4pm-9pm'
+    assert cache.metrics['hits'] == 1
+
+class QueuedExecutor:
+    """Holds submitted calls until the test runs them"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.calls.append((fn, args, future))
+        return future
+
+    def run(self):
+        for fn, args, future in self.calls:
+            future.set_result(fn(*args))
+        self.calls = []
+
+def test_incremental_update_is_saved_by_the_pool(model_dir):
+    model = ai_predictions.CountPredictor()
+    model.fit([(1, '4pm-9pm', 'express', 'monday', 18)], [6])
+    cache = ai_predictions.ModelCache()
+    cache.put(7, 6, model)
+    executor = QueuedExecutor()
+    cache._executor = executor
+
+    history = SimpleNamespace(id=8, vendor_id=1, window_time='4pm-9pm', delivery_speed='express',
+                              order_day='tuesday', order_hour=19)
+    cache.record(7, 6, history)
+
+    # Nothing is written during the request
+    assert not (model_dir / 'customer_7.joblib').exists()
+    (fn, (customer_id, version, saved), _), = executor.calls
+    assert (fn, customer_id, version) == (ai_predictions.save_model, 7, 8)
+    assert saved is not model and saved.orders == model.orders == 7
+
+    executor.run()
+    assert ai_predictions.load_model(7)[0] == 8
+
+def test_missing_model_file_is_looked_up_once_per_version(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(ai_predictions, 'load_model', lambda customer_id: lookups.append(customer_id))
+    cache = ai_predictions.ModelCache()
+    monkeypatch.setattr(cache, 'schedule', lambda customer_id: None)
+
+    assert cache.get(7, 3) is None
+    assert cache.get(7, 3) is None
+    assert lookups == [7]
+
+    assert cache.get(7, 4) is None
+    assert lookups == [7, 7]
+
+def test_backfill_adds_patterns_for_history_that_predates_them(make_user):
+    customer = make_user('customer')
+    vendor = make_user('vendor')
+    # Written straight to order_history, as before the pattern table existed
+    add_history(customer, vendor, 3)
+
+    assert customer_patterns(customer.id) == ([], [])
+    assert backfill_order_patterns([customer.id]) == 1
+    assert customer_patterns(customer.id) == ([(vendor.id, '4pm-9pm', 'express', 'monday', 18)], [3])
+    assert backfill_order_patterns([customer.id]) == 0
+
+def test_scheduling_reads_patterns_without_backfilling(make_user):
+    customer = make_user('customer')
+    vendor = make_user('vendor')
+    add_history(customer, vendor, 6)
+    cache = ai_predictions.ModelCache()
+    executor = QueuedExecutor()
+    cache._executor = executor
+
+    cache.schedule(customer.id)
+
+    (fn, (customer_id, version, records, counts), _), = executor.calls
+    assert (fn, customer_id, records, counts) == (ai_predictions.train_and_save, customer.id, [], [])
+    assert version == ai_predictions.history_version(customer.id)
+    assert customer_patterns(customer.id) == ([], [])
+
+def test_svc_trains_on_a_few_heavy_patterns():
+    model = ai_predictions.OrderPredictor()
+    assert model.fit([(1, '4pm-9pm', 'express', 'monday', 18),
+                      (2, '9am-12pm', 'regular', 'sunday', 10)], [30, 20])
+    assert model.predict_for(1, 'monday', 18)['window_time'] == '4pm-9pm'
+
+def test_svc_needs_two_classes_of_each_target():
+    model = ai_predictions.OrderPredictor()
+    assert not model.fit([(1, '4pm-9pm', 'express', 'monday', 18),
+                          (2, '9am-12pm', 'express', 'sunday', 10)], [30, 20])
+
+def test_eligibility_uses_counts_fetched_by_the_view(make_user, monkeypatch):
+    customer = make_user('customer')
+    counts = customer.order_counts()
+    counts.delivered = 5
+    monkeypatch.setattr(type(customer), 'order_counts', lambda self: pytest.fail('counts fetched again'))
+
+    assert customer.can_use_ai_predictions(counts)
@@ -0,0 +1,56 @@
+from app import app, db, socketio
+from models import Order
+from dispatch_planner import DispatchPlanner, dispatch_planner
+from partner_index import assign_partner, partner_index
+
+def test_order_accepted_without_free_partner_is_planned_later(make_user):
+    customer = make_user('customer')
+    vendor = make_user('vendor')
+    partner_index.rebuild({})
+
+    # Immediate mode: no delivery partner is registered when the order is accepted
+    order = Order(customer_id=customer.id, vendor_id=vendor.id, order_description='Groceries',
+                  window_time='9am-12pm', delivery_speed='regular', status='accepted', estimated_amount=100)
+    order.delivery_partner_id = assign_partner()
+    db.session.add(order)
+    db.session.commit()
+    assert order.delivery_partner_id is None
+
+    partner = make_user('delivery_partner')
+    partner_index.add_partner(partner.id)
+
+    assert DispatchPlanner(interval=0).run_once() == {order.id: partner.id}
+    db.session.expire_all()
+    assert db.session.get(Order, order.id).delivery_partner_id == partner.id
+
+def test_planner_starts_with_the_app_in_immediate_mode(app_context, monkeypatch):
+    started = []
+    monkeypatch.setattr(dispatch_planner, '_started', False)
+    monkeypatch.setattr(dispatch_planner, 'interval', 60)
+    monkeypatch.setattr(socketio, 'start_background_task', lambda target, *args: started.append(target))
+
+    client = app.test_client()
+    client.get('/')
+    client.get('/')
+
+    assert started == [dispatch_planner._run]
+
+def test_partner_at_capacity_is_not_assigned_on_accept(make_user):
+    customer = make_user('customer')
+    vendor = make_user('vendor')
+    partner = make_user('delivery_partner')
+    partner_index.rebuild({partner.id: 2})
+
+    # Immediate mode: the only partner already has a full load
+    order = Order(customer_id=customer.id, vendor_id=vendor.id, order_description='Groceries',
+                  window_time='9am-12pm', delivery_speed='regular', status='accepted', estimated_amount=100)
+    order.delivery_partner_id = assign_partner(capacity=2)
+    db.session.add(order)
+    db.session.commit()
+    assert order.delivery_partner_id is None
+    assert partner_index.load_of(partner.id) == 2
+
+    # A delivery frees a slot, and the planner picks the order up
+    partner_index.adjust(partner.id, -1)
+    assert DispatchPlanner(interval=0, capacity=2).run_once() == {order.id: partner.id}
+    assert assign_partner(capacity=2) is None
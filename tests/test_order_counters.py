@@ -0,0 +1,71 @@
+import routes
+from app import db
+from models import Order, Vendor
+from dispatch_planner import DispatchPlanner
+from order_counters import rebuild_order_counters
+from partner_index import partner_index
+
+ORDER_FORM = {'order_description': 'Groceries', 'window_time': '9am-12pm', 'delivery_speed': 'express'}
+
+def assert_no_drift():
+    """The incrementally maintained counters match a rebuild-order-counters recount"""
+    assert rebuild_order_counters() == 0
+
+def make_parties(make_user):
+    customer = make_user('customer')
+    vendor = make_user('vendor')
+    db.session.add(Vendor(user_id=vendor.id, business_name='Corner Store', business_type='Grocery'))
+    db.session.commit()
+    partner = make_user('delivery_partner')
+    partner_index.rebuild({partner.id: 0})
+    return customer, vendor, partner
+
+def order_ids(customer):
+    return [order.id for order in Order.query.filter_by(customer_id=customer.id).order_by(Order.id)]
+
+def test_counters_follow_every_transition_path(make_user, client, monkeypatch):
+    customer, vendor, partner = make_parties(make_user)
+
+    client.login(customer)
+    response = client.post('/create_order', data=dict(ORDER_FORM, vendor_id=vendor.id))
+    assert response.status_code == 302
+    assert_no_drift()
+
+    csv_body = ('vendor_id,order_description,window_time,delivery_speed\n'
+                + ''.join(f'{vendor.id},Order {i},12pm-4pm,regular\n' for i in range(3)))
+    data = client.post('/orders/bulk', data=csv_body, content_type='text/csv').get_json()
+    assert data['created'] == 3
+    assert_no_drift()
+
+    _, accepted, rejected, planned = order_ids(customer)
+
+    client.login(vendor)
+    assert client.post(f'/order/{accepted}/accept').get_json()['success']
+    assert db.session.get(Order, accepted).delivery_partner_id == partner.id
+    assert_no_drift()
+    assert client.post(f'/order/{rejected}/reject').get_json()['success']
+    assert_no_drift()
+
+    # Batched mode leaves the order for the planner
+    monkeypatch.setattr(routes, 'DISPATCH_MODE', 'batched')
+    assert client.post(f'/order/{planned}/accept').get_json()['success']
+    assert_no_drift()
+    assert DispatchPlanner(interval=0).run_once() == {planned: partner.id}
+    assert_no_drift()
+
+    package_qr = db.session.get(Order, accepted).package_qr_code
+    client.login(partner)
+    assert client.post('/scan_qr', json={'qr_data': package_qr}).get_json()['new_status'] == 'dispatched'
+    assert_no_drift()
+    for status in ('in_transit', 'out_for_delivery'):
+        # Separate batches, since a batch applies a payload once
+        data = client.post('/scan_qr/batch', json={'qr_data': [package_qr]}).get_json()
+        assert data['applied'] == 1 and data['results'][0]['new_status'] == status
+        assert_no_drift()
+
+    delivery_qr = db.session.get(Order, accepted).delivery_qr_code
+    assert client.post('/scan_qr', json={'qr_data': delivery_qr}).get_json()['new_status'] == 'delivered'
+    assert_no_drift()
+
+    counts = vendor.order_counts()
+    assert (counts.pending, counts.active, counts.delivered, counts.rejected) == (1, 1, 1, 1)
@@ -0,0 +1,114 @@
+import io
+import json
+
+import order_import
+import routes
+from app import db
+from models import Order, Vendor
+from order_import import OrderImport, read_rows
+
+CSV_HEADER = 'vendor_id,order_description,window_time,delivery_speed\n'
+
+def make_vendor(make_user, business_name):
+    user = make_user('vendor')
+    db.session.add(Vendor(user_id=user.id, business_name=business_name, business_type='Grocery'))
+    db.session.commit()
+    return user
+
+def csv_rows(*lines):
+    return read_rows(io.BytesIO((CSV_HEADER + ''.join(line + '\n' for line in lines)).encode()), 'csv')
+
+def ndjson_rows(*lines):
+    return read_rows(io.BytesIO(''.join(line + '\n' for line in lines).encode()), 'ndjson')
+
+def test_csv_import_reports_invalid_rows_by_number(make_user):
+    vendor = make_vendor(make_user, 'Corner Store')
+    customer = make_user('customer')
+
+    result = OrderImport(customer).run(csv_rows(
+        f'{vendor.id},Milk,9am-12pm,regular',
+        f'{vendor.id},,9am-12pm,regular',
+        f'{vendor.id},Bread,noon,regular',
+        f'{customer.id},Eggs,9am-12pm,express',
+        f'{vendor.id},Rice,4pm-9pm,express',
+    ))
+
+    assert [row_number for row_number, _ in result.created] == [1, 5]
+    assert result.errors == [
+        (2, 'Please provide order description.'),
+        (3, 'Please select a valid delivery window.'),
+        (4, 'Invalid vendor.'),
+    ]
+    assert Order.query.filter_by(customer_id=customer.id).count() == 2
+
+def test_ndjson_import_reports_invalid_rows_by_number(make_user):
+    vendor = make_vendor(make_user, 'Corner Store')
+    customer = make_user('customer')
+    valid = {'vendor_id': vendor.id, 'order_description': 'Milk', 'window_time': '9am-12pm',
+             'delivery_speed': 'regular'}
+
+    result = OrderImport(customer).run(ndjson_rows(
+        json.dumps(valid),
+        '{not json',
+        '[1, 2]',
+        '',
+        json.dumps(dict(valid, delivery_speed='overnight')),
+        json.dumps(dict(valid, order_description='Bread')),
+    ))
+
+    assert [row_number for row_number, _ in result.created] == [1, 6]
+    assert result.errors == [
+        (2, 'Invalid JSON.'),
+        (3, 'Each line must be a JSON object.'),
+        (5, 'Please select a valid delivery speed.'),
+    ]
+
+def test_import_stops_at_max_rows(make_user):
+    vendor = make_vendor(make_user, 'Corner Store')
+    customer = make_user('customer')
+
+    result = OrderImport(customer, max_rows=3).run(csv_rows(*[f'{vendor.id},Order {i},9am-12pm,regular' for i in range(5)]))
+
+    assert [row_number for row_number, _ in result.created] == [1, 2, 3]
+    assert result.errors == [(4, 'At most 3 rows per import')]
+
+def test_failed_chunk_marks_only_its_own_rows(make_user, monkeypatch):
+    vendor = make_vendor(make_user, 'Corner Store')
+    customer = make_user('customer')
+    apply_counter_deltas = order_import.apply_counter_deltas
+    calls = []
+
+    def fail_second_chunk(deltas):
+        calls.append(deltas)
+        if len(calls) == 2:
+            raise RuntimeError('database unavailable')
+        apply_counter_deltas(deltas)
+    monkeypatch.setattr(order_import, 'apply_counter_deltas', fail_second_chunk)
+
+    result = OrderImport(customer, chunk_size=2).run(csv_rows(*[f'{vendor.id},Order {i},9am-12pm,regular' for i in range(5)]))
+
+    assert [row_number for row_number, _ in result.created] == [1, 2, 5]
+    assert result.errors == [(3, 'Error creating order.'), (4, 'Error creating order.')]
+    assert sorted(order.order_description for order in Order.query.filter_by(customer_id=customer.id)) == [
+        'Order 0', 'Order 1', 'Order 4'
+    ]
+
+def test_bulk_route_emits_once_per_vendor(make_user, client, monkeypatch):
+    store = make_vendor(make_user, 'Corner Store')
+    bakery = make_vendor(make_user, 'Bakery')
+    customer = make_user('customer')
+    emitted = []
+    monkeypatch.setattr(routes.socketio, 'emit', lambda event, data, room=None, **kwargs: emitted.append((event, room, data)))
+
+    client.login(customer)
+    body = CSV_HEADER + ''.join(
+        f'{vendor.id},Order {i},9am-12pm,regular\n' for i, vendor in enumerate([store, bakery, store, store, bakery])
+    )
+    data = client.post('/orders/bulk', data=body, content_type='text/csv').get_json()
+
+    assert data['success'] and data['created'] == 5
+    assert [event for event, _, _ in emitted] == ['new_orders', 'new_orders']
+    assert {room: len(payload['orders']) for _, room, payload in emitted} == {
+        f'vendor_{store.id}': 3,
+        f'vendor_{bakery.id}': 2,
+    }
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from app import db
+from models import Order
+from order_counters import rebuild_order_counters
+from order_queries import ORDER_KEY, vendor_dashboard_orders
+
+STATUSES = ['pending'] * 30 + ['accepted', 'dispatched', 'in_transit', 'out_for_delivery'] * 7 + ['delivered', 'rejected'] * 6
+
+def make_orders(make_user):
+    customer = make_user('customer')
+    vendor = make_user('vendor')
+    start = datetime(2025, 1, 1, 9, 0)
+    for i, status in enumerate(STATUSES):
+        # Pairs of orders share a creation time, so paging must break ties on id
+        db.session.add(Order(customer_id=customer.id, vendor_id=vendor.id, order_description=f'Order {i}',
+                             window_time='9am-12pm', delivery_speed='regular', status=status,
+                             estimated_amount=10 + i, created_at=start + timedelta(minutes=i // 2)))
+    db.session.commit()
+    rebuild_order_counters()
+    return vendor
+
+def newest(vendor, statuses):
+    return Order.query.filter(Order.vendor_id == vendor.id, Order.status.in_(statuses)).order_by(*ORDER_KEY).all()
+
+def test_dashboard_pages_each_bucket_and_counts_from_the_counters(make_user):
+    vendor = make_orders(make_user)
+    active_statuses = ['accepted', 'dispatched', 'in_transit', 'out_for_delivery']
+
+    pages, stats = vendor_dashboard_orders(vendor.id, page_size=25, completed_size=10)
+
+    assert pages['pending'] == newest(vendor, ['pending'])[:25]
+    assert pages['active'] == newest(vendor, active_statuses)[:25]
+    assert pages['completed'] == newest(vendor, ['delivered', 'rejected'])[:10]
+    assert {name: stat['count'] for name, stat in stats.items()} == {'pending': 30, 'active': 28, 'completed': 12}
+    assert stats['active']['amount'] == sum(10 + i for i, status in enumerate(STATUSES) if status in active_statuses)
+    assert all(stat['next_cursor'] for stat in stats.values())
+
+def test_next_cursor_round_trips_through_vendor_orders(make_user, client):
+    vendor = make_orders(make_user)
+    client.login(vendor)
+    _, stats = vendor_dashboard_orders(vendor.id, page_size=25)
+
+    seen = [order.id for order in newest(vendor, ['pending'])[:25]]
+    cursor = stats['pending']['next_cursor']
+    while cursor:
+        data = client.get('/vendor/orders', query_string={'bucket': 'pending', 'after': cursor, 'limit': 2}).get_json()
+        assert data['success'] and len(data['orders']) <= 2
+        seen.extend(order['id'] for order in data['orders'])
+        cursor = data['next_cursor']
+
+    assert seen == [order.id for order in newest(vendor, ['pending'])]
+
+    data = client.get('/vendor/orders', query_string={'bucket': 'active', 'after': stats['active']['next_cursor']}).get_json()
+    assert [order['id'] for order in data['orders']] == [order.id for order in newest(vendor, ['accepted', 'dispatched', 'in_transit', 'out_for_delivery'])[25:]]
+    assert data['next_cursor'] is None
+
+    assert client.get('/vendor/orders', query_string={'after': 'not-a-cursor'}).status_code == 400
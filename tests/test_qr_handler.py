@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import qr_handler
+from app import db
+from models import Order, QRScan
+from qr_handler import PACKAGE_TRANSITIONS, is_definitive, transition_order, validate_qr_code
+
+PACKAGE_QR = 'TRACKIT_PACKAGE_{}_20250101120000_abc'
+
+def make_order(make_user, status='accepted', **fields):
+    customer = make_user('customer')
+    vendor = make_user('vendor')
+    partner = make_user('delivery_partner')
+    order = Order(customer_id=customer.id, vendor_id=vendor.id, delivery_partner_id=partner.id,
+                  order_description='Groceries', window_time='9am-12pm', delivery_speed='regular',
+                  status=status, estimated_amount=100, qr_scan_count=0, **fields)
+    db.session.add(order)
+    db.session.flush()
+    order.package_qr_code = PACKAGE_QR.format(order.id)
+    db.session.commit()
+    return order, partner
+
+def scans(order_id):
+    return db.session.query(QRScan).filter_by(order_id=order_id).count()
+
+def test_database_error_is_not_definitive(app_context, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(qr_handler, 'transition_order', fail)
+
+    result = validate_qr_code('TRACKIT_PACKAGE_1_20250101_abc', 1)
+
+    assert result == {'success': False, 'error': 'Error processing scan.'}
+    assert not is_definitive(result)
+
+def test_rejections_and_successes_are_definitive(app_context):
+    assert is_definitive(validate_qr_code('NOT_A_TRACKIT_CODE', 1))
+    assert is_definitive(validate_qr_code('TRACKIT_PACKAGE_1_20250101_abc', 1))  # order not found
+    assert is_definitive({'success': True, 'new_status': 'dispatched'})
+
+def test_stale_from_status_loses_the_race(make_user):
+    order, partner = make_order(make_user, status='dispatched')
+
+    # The scan expected the order still accepted; another scan already moved it on
+    updated = transition_order(order.id, [Order.status == 'accepted'], {'status': 'in_transit'}, {
+        'scanned_by': partner.id, 'scan_type': 'package', 'scan_data': order.package_qr_code,
+        'scanned_at': datetime.now()
+    }, from_status='accepted')
+
+    assert updated is None
+    assert scans(order.id) == 0
+    db.session.expire_all()
+    assert db.session.get(Order, order.id).status == 'dispatched'
+
+def test_losing_delivery_scan_returns_a_failure_without_a_scan_row(make_user):
+    # Another scan of the same delivery code already delivered the order
+    order, partner = make_order(make_user, status='delivered')
+    order.delivery_qr_code = qr_data = f'TRACKIT_CUSTOMER_DELIVERY_{order.id}_{order.customer_id}_20250101120000_abc'
+    db.session.commit()
+
+    assert validate_qr_code(qr_data, partner.id) == {'success': False, 'error': 'Order not ready for final delivery.'}
+    assert scans(order.id) == 0
+
+def test_each_package_scan_applies_one_transition(make_user):
+    order, partner = make_order(make_user)
+
+    for count, (before, after, timestamp_column) in sorted(PACKAGE_TRANSITIONS.items()):
+        assert db.session.get(Order, order.id).status == before
+        result = validate_qr_code(order.package_qr_code, partner.id)
+
+        assert result['success'] and result['new_status'] == after
+        db.session.expire_all()
+        order = db.session.get(Order, order.id)
+        assert (order.status, order.qr_scan_count) == (after, count + 1)
+        assert getattr(order, timestamp_column) is not None
+        assert scans(order.id) == count + 1
+        assert (order.delivery_qr_code is not None) == (after == 'out_for_delivery')
+
+    result = validate_qr_code(order.package_qr_code, partner.id)
+    assert result == {'success': False, 'error': 'Package QR already scanned maximum times.'}
+    assert scans(order.id) == len(PACKAGE_TRANSITIONS)
@@ -0,0 +1,17 @@
+import qr_labels
+
+def test_sheets_are_composed_in_one_reused_pool(monkeypatch):
+    monkeypatch.setattr(qr_labels, 'LABEL_POOL_WORKERS', 1)
+    labels = [(order_id, f'TRACKIT_PACKAGE_{order_id}_20250101120000_abc') for order_id in range(1, 15)]
+    waits = []
+    try:
+        sheet = qr_labels.render_label_sheet_in_pool(labels, 'png', wait=waits.append)
+        pool = qr_labels._pool
+        qr_labels.render_label_sheet_in_pool(labels[:1], 'png', wait=waits.append)
+        assert pool is not None and qr_labels._pool is pool
+    finally:
+        qr_labels.shutdown()
+
+    assert sheet == qr_labels.render_label_sheet(labels, 'png')
+    assert waits and set(waits) == {qr_labels.LABEL_POLL_INTERVAL}
+    assert qr_labels._pool is None
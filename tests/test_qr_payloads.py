@@ -0,0 +1,27 @@
+import qr_payloads
+from qr_payloads import QR_CLOCK_SKEW, load_signing_keys, signed_payload, verify_signed_payload
+
+NOW = 1_760_000_000
+
+def test_code_issued_within_clock_skew_is_valid():
+    result = verify_signed_payload(signed_payload('package', 7, issued_at=NOW + QR_CLOCK_SKEW), now=NOW)
+    assert result == {'valid': True, 'kind': 'package', 'order_id': 7, 'issued_at': NOW + QR_CLOCK_SKEW}
+
+def test_code_issued_beyond_clock_skew_is_rejected():
+    result = verify_signed_payload(signed_payload('delivery', 7, issued_at=NOW + QR_CLOCK_SKEW + 1), now=NOW)
+    assert result == {'valid': False, 'error': 'QR code issued in the future.'}
+
+def test_default_key_keeps_verifying_after_rotation_is_configured(monkeypatch):
+    monkeypatch.delenv('QR_SIGNING_KEYS', raising=False)
+    default_keys = load_signing_keys()
+    monkeypatch.setattr(qr_payloads, 'SIGNING_KEYS', default_keys)
+    printed = signed_payload('package', 7, issued_at=NOW)
+
+    monkeypatch.setenv('QR_SIGNING_KEYS', 'k1:new-secret')
+    rotated_keys = load_signing_keys()
+    monkeypatch.setattr(qr_payloads, 'SIGNING_KEYS', rotated_keys)
+
+    assert list(rotated_keys) == ['k1', 'k0']
+    assert rotated_keys['k0'] == default_keys['k0']
+    assert verify_signed_payload(printed, now=NOW)['valid']
+    assert '_k1_' in signed_payload('package', 7, issued_at=NOW)
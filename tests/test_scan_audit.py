@@ -0,0 +1,79 @@
+import os
+from datetime import datetime
+
+import pytest
+
+import scan_audit
+from app import db, socketio
+from models import QRScan
+from scan_audit import ScanAuditWriter
+
+@pytest.fixture
+def writer_factory(tmp_path, monkeypatch):
+    monkeypatch.setattr(socketio, 'start_background_task', lambda target, *args: None)
+    monkeypatch.setattr(scan_audit.atexit, 'register', lambda func: None)
+
+    def make():
+        return ScanAuditWriter(enabled=True, flush_interval=3600, spill_dir=str(tmp_path))
+    return make
+
+def scan_row():
+    return {'order_id': 1, 'scanned_by': 2, 'scan_type': 'package',
+            'scan_data': 'TRACKIT_PACKAGE_1', 'scanned_at': datetime(2025, 1, 1, 9, 0)}
+
+def test_recovery_skips_live_spill_files_and_adopts_orphans(writer_factory):
+    live = writer_factory()
+    live.record(scan_row())
+
+    # Another worker starting up must leave the live worker's spill file alone
+    other = writer_factory()
+    other.start()
+    assert other.metrics['recovered'] == 0
+
+    # Once its owner is gone (here: its file handle and lock are released) the file is adopted
+    live._spill.close()
+    successor = writer_factory()
+    successor.start()
+    assert successor.metrics['recovered'] == 1
+
+def test_spilled_rows_are_fsynced_by_the_flusher_not_on_record(writer_factory, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(scan_audit.os, 'fsync', lambda fd: synced.append(fd) or real_fsync(fd))
+
+    writer = writer_factory()
+    writer.record(scan_row())
+    writer.record(scan_row())
+    assert synced == []
+
+    writer.sync()
+    assert synced.count(writer._spill.fileno()) == 1
+
+def test_failing_inserts_only_spill_and_retry_from_the_files(app_context, writer_factory, monkeypatch):
+    writer = writer_factory()
+    writer.buffer_size = 2
+    real_insert = writer._insert
+    calls = []
+
+    def failing_insert(rows):
+        calls.append(len(rows))
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(writer, '_insert', failing_insert)
+
+    writer.record(scan_row())
+    writer.record(scan_row())  # full buffer: flushes inline, which fails
+    for _ in range(5):
+        writer.record(scan_row())
+
+    # No more inline flushes, nothing kept in memory, every row spilled
+    assert calls == [2]
+    assert len(writer._buffer) == 0 and writer.metrics['spill_only']
+    assert writer.flush() == 0 and calls == [2]  # still backing off
+
+    monkeypatch.setattr(writer, '_insert', real_insert)
+    assert writer.flush(retry=True) == 7
+    assert db.session.query(QRScan).count() == 7
+    assert not writer.metrics['spill_only'] and os.listdir(writer.spill_dir) == []
+
+    writer.record(scan_row())
+    assert len(writer._buffer) == 1
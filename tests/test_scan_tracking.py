@@ -0,0 +1,17 @@
+import scan_tracking
+from scan_tracking import AdmissionController, decode_tracked_frame
+
+def test_new_session_ids_share_the_user_in_flight_limit(monkeypatch):
+    admission = AdmissionController(max_in_flight=10, max_per_user=2)
+    monkeypatch.setattr(scan_tracking, 'admission', admission)
+    # Hold the user's two slots, as frames still being decoded would
+    assert admission.try_acquire(7) and admission.try_acquire(7)
+
+    result = decode_tracked_frame(7, 'rotated-session-id', b'frame')
+    assert result['busy']
+    assert admission.try_acquire(8)
+
+    admission.release(7)
+    admission.release(7)
+    admission.release(8)
+    assert admission.in_flight == 0 and admission._per_user == {}
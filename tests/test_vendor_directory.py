@@ -0,0 +1,32 @@
+from app import db
+from models import Vendor
+from order_import import OrderImport
+from vendor_directory import VendorDirectory
+
+def make_vendor(make_user, business_name, business_type='Restaurant', active=True):
+    user = make_user('vendor')
+    db.session.add(Vendor(user_id=user.id, business_name=business_name, business_type=business_type,
+                          is_active=active))
+    db.session.commit()
+    return user
+
+def test_search_matches_multi_word_substrings(make_user):
+    pizza = make_vendor(make_user, 'Pizza Hut')
+    make_vendor(make_user, 'Burger King')
+    directory = VendorDirectory()
+
+    assert [vendor['id'] for vendor in directory.search('izza hut')] == [pizza.id]
+    assert [vendor['id'] for vendor in directory.search('pizza  HUT')] == [pizza.id]
+    assert [vendor['id'] for vendor in directory.search('pi')] == [pizza.id]
+    assert directory.search('hut pizza') == []
+
+def test_import_and_directory_share_the_vendor_rule(make_user):
+    active = make_vendor(make_user, 'Pizza Hut')
+    inactive_profile = make_vendor(make_user, 'Pizza Place', active=False)
+    customer = make_user('customer')
+    directory = VendorDirectory()
+
+    assert [vendor['id'] for vendor in directory.search('pizza')] == [active.id]
+    order_import = OrderImport(customer)
+    order_import._check_vendors({active.id, inactive_profile.id, customer.id})
+    assert order_import._vendor_ids == {active.id: True, inactive_profile.id: False, customer.id: False}
@@ -0,0 +1,172 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from collections import defaultdict
+
+from sqlalchemy import event, inspect, select
+
+from app import db
+from models import User, Vendor
+
+# How long a process keeps its vendor directory before reloading it
+VENDOR_DIRECTORY_TTL = float(os.environ.get('VENDOR_DIRECTORY_TTL', 300))
+VENDOR_SEARCH_LIMIT = 10
+
+# Columns whose changes make the directory stale
+VENDOR_FIELDS = ('business_name', 'business_type', 'is_active')
+USER_FIELDS = ('full_name', 'phone', 'address', 'is_active')
+
+def eligible_vendors(*columns):
+    """Select ``columns`` of the vendors that can take orders: active vendor users with an active vendor profile"""
+    return (
+        select(*columns)
+        .select_from(User)
+        .join(Vendor, Vendor.user_id == User.id)
+        .where(User.role == 'vendor', User.is_active.is_(True), Vendor.is_active.is_(True))
+    )
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class VendorDirectory:
+    """Cached list of active vendors with a prefix and substring search index.
+
+    The directory is reloaded after ``ttl`` seconds, and right away once a
+    transaction that registered a vendor or changed one commits (see the
+    session hooks below). Search uses a sorted word list for queries of
+    one or two characters and a trigram index for longer ones, so it never
+    scans every vendor.
+    """
+
+    def __init__(self, ttl=VENDOR_DIRECTORY_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._vendors = []
+        self._by_id = {}
+        self._words = []  # sorted (word, vendor index)
+        self._trigrams = {}  # trigram -> set of vendor indexes
+        self._haystacks = []
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self):
+        rows = db.session.execute(
+            eligible_vendors(User.id, Vendor.business_name, Vendor.business_type, User.address, User.phone)
+            .order_by(Vendor.business_name, User.id)
+        ).all()
+        vendors = [
+            {'id': row.id, 'business_name': row.business_name, 'business_type': row.business_type,
+             'address': row.address, 'phone': row.phone}
+            for row in rows
+        ]
+
+        words = []
+        postings = defaultdict(set)
+        haystacks = []
+        for index, vendor in enumerate(vendors):
+            haystack = f"{vendor['business_name']} {vendor['business_type']}".lower()
+            haystacks.append(haystack)
+            words.extend((word, index) for word in set(haystack.split()))
+            for gram in trigrams(haystack):
+                postings[gram].add(index)
+        words.sort()
+
+        with self._lock:
+            self._vendors = vendors
+            self._by_id = {vendor['id']: vendor for vendor in vendors}
+            self._words = words
+            self._trigrams = dict(postings)
+            self._haystacks = haystacks
+            self._loaded_at = time.monotonic()
+            self.version += 1
+        logging.info(f"Loaded {len(vendors)} vendors into the vendor directory")
+
+    def _fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            self._load()
+
+    def vendors(self):
+        """All active vendors, sorted by business name"""
+        self._fresh()
+        return self._vendors
+
+    def get(self, vendor_id):
+        self._fresh()
+        return self._by_id.get(vendor_id)
+
+    def search(self, query, limit=VENDOR_SEARCH_LIMIT):
+        """Vendors whose business name or type matches ``query``.
+
+        Matches at the start of the name rank first, then matches at the
+        start of any word, then matches anywhere.
+        """
+        query = ' '.join(query.lower().split())
+        if not query:
+            return []
+        self._fresh()
+        with self._lock:
+            vendors, words, haystacks = self._vendors, self._words, self._haystacks
+            postings = self._trigrams
+
+        if len(query) < 3:
+            # Word prefix lookup on the sorted word list
+            start = bisect.bisect_left(words, (query,))
+            candidates = set()
+            for word, index in words[start:]:
+                if not word.startswith(query):
+                    break
+                candidates.add(index)
+        else:
+            # Trigrams of the whole query, spaces included, so multi-word
+            # queries also match inside words
+            grams = sorted((postings.get(gram, set()) for gram in trigrams(query)), key=len)
+            candidates = set.intersection(*grams) if grams else set()
+
+        def rank(index):
+            haystack = haystacks[index]
+            if haystack.startswith(query):
+                return 0
+            if f" {query}" in haystack:
+                return 1
+            return 2
+
+        matches = sorted((rank(index), index) for index in candidates if query in haystacks[index])
+        return [vendors[index] for _, index in matches[:limit]]
+
+# Global vendor directory
+vendor_directory = VendorDirectory()
+
+def _changed(target, fields):
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+@event.listens_for(Vendor, 'after_insert')
+@event.listens_for(Vendor, 'after_delete')
+def vendor_added_or_removed(mapper, connection, target):
+    inspect(target).session.info['vendor_directory_stale'] = True
+
+@event.listens_for(Vendor, 'after_update')
+def vendor_updated(mapper, connection, target):
+    if _changed(target, VENDOR_FIELDS):
+        inspect(target).session.info['vendor_directory_stale'] = True
+
+@event.listens_for(User, 'after_update')
+def vendor_user_updated(mapper, connection, target):
+    if target.role == 'vendor' and _changed(target, USER_FIELDS):
+        inspect(target).session.info['vendor_directory_stale'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def refresh_vendor_directory(session):
+    if session.info.pop('vendor_directory_stale', False):
+        vendor_directory.invalidate()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_vendor_changes(session):
+    session.info.pop('vendor_directory_stale', None)
@@ -2,6 +2,7 @@ import logging
 from flask_login import current_user
 from flask_socketio import emit, join_room, leave_room
 from app import socketio
+from scan_tracking import decode_tracked_frame, parse_box, parse_size
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +47,32 @@ def on_leave(data):
         emit('status', {'msg': f'Left room {room}'})
         logger.info(f'User {current_user.username} left room {room}')
 
+@socketio.on('qr_frame')
+def on_qr_frame(data):
+    """Decode a binary camera frame sent over the socket; the result is the ack.
+
+    ``data`` is either the raw frame bytes or a dict with ``frame`` plus the
+    optional ``session``, ``size`` (``WxH``) and ``region`` (``x,y,w,h``).
+    """
+    if not current_user.is_authenticated:
+        return {'qr_detected': False, 'error': 'Unauthorized'}
+    
+    if not isinstance(data, dict):
+        data = {'frame': data}
+    
+    frame = data.get('frame')
+    if not isinstance(frame, (bytes, bytearray)) or not frame:
+        return {'qr_detected': False, 'error': 'No image data provided'}
+    
+    return decode_tracked_frame(
+        current_user.id,
+        data.get('session', ''),
+        bytes(frame),
+        frame_size=parse_size(data.get('size')),
+        region=parse_box(data.get('region')),
+        wait=socketio.sleep
+    )
+
 @socketio.on_error_default
 def default_error_handler(e):
     """Handle WebSocket errors"""